@@ -0,0 +1,138 @@
+import os
+from collections.abc import Iterable
+from datetime import UTC, date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Select, delete, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import AccountDailyActivity, Diary, Entry, EntryStatus
+
+# 하루의 경계(예: Asia/Seoul). created_at은 UTC로 저장되므로 이 시간대로 바꿔 날짜를 정한다.
+_ACTIVITY_TIMEZONE_NAME = os.getenv("ACTIVITY_TIMEZONE", "UTC")
+ACTIVITY_TIMEZONE = UTC if _ACTIVITY_TIMEZONE_NAME == "UTC" else ZoneInfo(_ACTIVITY_TIMEZONE_NAME)
+ACTIVITY_BACKFILL_BATCH = 1000
+
+
+def activity_day(created_at: datetime) -> date:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=UTC)
+    return created_at.astimezone(ACTIVITY_TIMEZONE).date()
+
+
+def activity_today() -> date:
+    return datetime.now(ACTIVITY_TIMEZONE).date()
+
+
+def _bump(db: Session, account_id: str, day: date, *, entries: int = 0, saved: int = 0, drafts: int = 0) -> None:
+    _bump_days(db, account_id, {day: (entries, saved, drafts)})
+
+
+def _bump_days(db: Session, account_id: str, counts: dict[date, tuple[int, int, int]]) -> None:
+    # 같은 (계정, 날짜)에 동시에 쓰는 요청이 있어도 읽고-쓰기 없이 한 문장으로 더한다.
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = insert(AccountDailyActivity).values(
+        [
+            {"account_id": account_id, "day": day, "entries": entries, "saved": saved, "drafts": drafts}
+            for day, (entries, saved, drafts) in counts.items()
+        ]
+    )
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[AccountDailyActivity.account_id, AccountDailyActivity.day],
+            set_={
+                "entries": AccountDailyActivity.entries + statement.excluded.entries,
+                "saved": AccountDailyActivity.saved + statement.excluded.saved,
+                "drafts": AccountDailyActivity.drafts + statement.excluded.drafts,
+            },
+        )
+    )
+
+
+def record_entry_created(db: Session, account_id: str, entry: Entry) -> None:
+    saved = int(entry.status == EntryStatus.SAVED)
+    _bump(db, account_id, activity_day(entry.created_at), entries=1, saved=saved, drafts=1 - saved)
+
+
+def record_entry_saved(db: Session, account_id: str, entry: Entry) -> None:
+    # DRAFT -> SAVED 전환만 센다. 항목은 만들어진 날짜에 계속 집계된다.
+    _bump(db, account_id, activity_day(entry.created_at), saved=1, drafts=-1)
+
+
+def record_entries_imported(db: Session, account_id: str, rows: Iterable[tuple[datetime, EntryStatus]]) -> None:
+    # 가져오기 배치: (created_at, status)를 날짜별로 모아 배치당 upsert 한 번으로 더한다.
+    counts: dict[date, list[int]] = {}
+    for created_at, status in rows:
+        bucket = counts.setdefault(activity_day(created_at), [0, 0, 0])
+        bucket[0] += 1
+        bucket[1 if status == EntryStatus.SAVED else 2] += 1
+    if counts:
+        _bump_days(db, account_id, {day: tuple(bucket) for day, bucket in counts.items()})
+
+
+def activity_statement(account_id: str) -> Select:
+    return select(AccountDailyActivity).where(AccountDailyActivity.account_id == account_id)
+
+
+def _streaks(active_days: list[date], today: date) -> tuple[int, int]:
+    # (현재 연속 일수, 최장 연속 일수). 오늘 아직 쓰지 않았으면 어제까지 이어진 연속도 현재 연속으로 본다.
+    longest = run = 0
+    previous = None
+    for day in active_days:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous is not None and today - previous <= timedelta(days=1) else 0
+    return current, longest
+
+
+def summarize_activity(rows: Iterable[AccountDailyActivity], *, today: date, days: int) -> dict[str, object]:
+    # 계정이 활동한 날 수만큼만 읽고 계산한다(항목 수와 무관).
+    ordered = sorted((row for row in rows if row.entries > 0), key=lambda row: row.day)
+    current, longest = _streaks([row.day for row in ordered], today)
+    since = today - timedelta(days=days - 1)
+    return {
+        "timezone": _ACTIVITY_TIMEZONE_NAME,
+        "current_streak": current,
+        "longest_streak": longest,
+        "active_days": len(ordered),
+        "total_entries": sum(row.entries for row in ordered),
+        "total_saved": sum(row.saved for row in ordered),
+        "heatmap": [
+            {"date": row.day.isoformat(), "entries": row.entries, "saved": row.saved, "drafts": row.drafts}
+            for row in ordered
+            if row.day >= since
+        ],
+    }
+
+
+def rebuild_activity(db: Session) -> int:
+    # 기존 항목으로 집계 테이블 전체를 다시 만든다(한 트랜잭션): python -m app.activity
+    counts: dict[tuple[str, date], list[int]] = {}
+    rows = db.execute(
+        select(Diary.account_id, Entry.created_at, Entry.status)
+        .join(Diary, Diary.id == Entry.diary_id)
+        .execution_options(yield_per=ACTIVITY_BACKFILL_BATCH)
+    )
+    for account_id, created_at, status in rows:
+        bucket = counts.setdefault((account_id, activity_day(created_at)), [0, 0, 0])
+        bucket[0] += 1
+        bucket[1 if status == EntryStatus.SAVED else 2] += 1
+    db.execute(delete(AccountDailyActivity))
+    db.add_all(
+        AccountDailyActivity(account_id=account_id, day=day, entries=entries, saved=saved, drafts=drafts)
+        for (account_id, day), (entries, saved, drafts) in counts.items()
+    )
+    db.commit()
+    return len(counts)
+
+
+if __name__ == "__main__":
+    from app.bootstrap import bootstrap_database
+    from app.database import SessionLocal
+
+    bootstrap_database()
+    with SessionLocal() as session:
+        print(f"rebuilt {rebuild_activity(session)} account-days")
@@ -0,0 +1,68 @@
+import os
+
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.models import Base, Diary, Entry, User, UserRole
+
+# false면 API 프로세스는 스키마/관리자 계정 생성을 건너뛴다(배포 단계에서 `python -m app.bootstrap`으로 한 번 실행).
+DB_BOOTSTRAP_ON_STARTUP = os.getenv("DB_BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
+
+
+def ensure_admin_user(db: Session) -> None:
+    admin = db.query(User).filter(User.username == "admin").first()
+    if admin:
+        return
+    db.add(User(username="admin", password="admin", role=UserRole.ADMIN))
+    db.commit()
+
+
+def _create_index(conn: Connection, model: type[Base], name: str) -> None:
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def _add_columns(conn: Connection, model: type[Base], names: tuple[str, ...]) -> None:
+    table = model.__table__
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        # Postgres enum 타입(imagestatus 등)은 컬럼보다 먼저 있어야 한다. SQLite에서는 아무것도 하지 않는다.
+        if hasattr(column.type, "create"):
+            column.type.create(conn, checkfirst=True)
+        # 워커 여러 개가 동시에 부트스트랩해도 Postgres에서는 IF NOT EXISTS로 한 번만 추가된다.
+        if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+        ddl = f"{name} {column.type.compile(dialect=conn.dialect)}"
+        # NOT NULL 컬럼은 기존 행을 채울 server_default가 있어야 추가할 수 있다.
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{ddl}"))
+
+
+def upgrade_schema(conn: Connection) -> None:
+    # create_all은 이미 있는 테이블을 바꾸지 않는다. 기존 DB(볼륨)에 나중에 추가된 인덱스/컬럼을 채운다.
+    # 이미 반영된 단계는 건너뛰므로 매 기동마다 실행해도 된다.
+    # keyset 페이지네이션용 복합 인덱스
+    _create_index(conn, Diary, "ix_diaries_account_created_id")
+    _create_index(conn, Entry, "ix_entries_diary_created_id")
+    # 항목 이미지(백그라운드 이미지 작업)
+    _add_columns(conn, Entry, ("image_url", "image_status"))
+    # 토큰 무효화(역할 변경/로그아웃)
+    _add_columns(conn, User, ("token_version",))
+
+
+def bootstrap_database() -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    with SessionLocal() as db:
+        ensure_admin_user(db)
+
+
+if __name__ == "__main__":
+    bootstrap_database()
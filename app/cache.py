@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from prometheus_client import Counter
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.models import DraftCacheEntry
+
+# 만료된 draft_cache 행을 지우는 간격(워커마다). 쓰기 경로에서 같은 트랜잭션으로 지운다.
+DRAFT_CACHE_PRUNE_INTERVAL_SECONDS = float(os.getenv("DRAFT_CACHE_PRUNE_INTERVAL_SECONDS", "300"))
+
+DRAFT_CACHE_LOOKUPS = Counter(
+    "echodiary_draft_cache_lookups_total",
+    "Draft cache lookups by layer and result.",
+    ["layer", "result"],
+)
+
+
+def draft_cache_key(*, source: str, tone: str, model: str, prompt_version: str, scope: str = "") -> str:
+    # 공백 차이만 있는 입력은 같은 키가 되도록 정규화한다.
+    # scope: 초안이 계정의 지난 일기를 참고했으면 계정 id. 다른 계정에 그 초안이 재사용되지 않게 한다.
+    normalized_source = " ".join(source.split())
+    parts = [prompt_version, model, tone.strip(), normalized_source]
+    if scope:
+        parts.append(scope)
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, *, max_bytes: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._items: OrderedDict[str, tuple[str, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at, _size = item
+            if expires_at <= self._clock():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (value, self._clock() + self.ttl_seconds, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _value, _expires_at, size = self._items.pop(key)
+        self._bytes -= size
+
+
+class DraftCache:
+    def __init__(self, *, memory: LRUCache, use_db: bool, clock: Callable[[], float] = time.monotonic) -> None:
+        self.memory = memory
+        self.use_db = use_db
+        self._clock = clock
+        self._pruned_at = float("-inf")
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def get(self, db: Session, key: str) -> str | None:
+        draft = self.memory.get(key)
+        if draft is not None:
+            self._record("memory", "hit")
+            return draft
+        self._record("memory", "miss")
+
+        if not self.use_db:
+            self._stats["misses"] += 1
+            return None
+
+        row = db.get(DraftCacheEntry, key)
+        if row is None or row.created_at.replace(tzinfo=None) < _db_cutoff(self.memory.ttl_seconds):
+            self._record("db", "miss")
+            self._stats["misses"] += 1
+            return None
+        self._record("db", "hit")
+        self.memory.set(key, row.draft)
+        return row.draft
+
+    def set(self, db: Session, key: str, draft: str) -> None:
+        self.memory.set(key, draft)
+        if self.use_db:
+            self._maybe_prune(db)
+            db.merge(DraftCacheEntry(key=key, draft=draft, created_at=datetime.now(UTC)))
+
+    def _maybe_prune(self, db: Session) -> None:
+        # 만료된 행은 get()에서 miss로 보지만 지우지 않으면 서로 다른 프롬프트마다 테이블이 계속 커진다.
+        now = self._clock()
+        if now - self._pruned_at < DRAFT_CACHE_PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = now
+        db.execute(delete(DraftCacheEntry).where(DraftCacheEntry.created_at < _db_cutoff(self.memory.ttl_seconds)))
+
+    def stats(self) -> dict[str, int]:
+        return {**self._stats, "memory_items": len(self.memory), "memory_bytes": self.memory.size_bytes}
+
+    def _record(self, layer: str, result: str) -> None:
+        DRAFT_CACHE_LOOKUPS.labels(layer=layer, result=result).inc()
+        if result == "hit":
+            self._stats[f"{layer}_hits"] += 1
+
+
+def _db_cutoff(ttl_seconds: float) -> datetime:
+    # DateTime 컬럼은 timezone 정보 없이 저장되므로 naive UTC로 비교한다.
+    return (datetime.now(UTC) - timedelta(seconds=ttl_seconds)).replace(tzinfo=None)
+
+
+draft_cache = DraftCache(
+    memory=LRUCache(
+        max_bytes=int(os.getenv("DRAFT_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv("DRAFT_CACHE_TTL_SECONDS", "86400")),
+    ),
+    use_db=os.getenv("DRAFT_CACHE_DB", "false").lower() == "true",
+)
@@ -0,0 +1,184 @@
+import io
+import json
+import logging
+import os
+import zipfile
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime
+from pathlib import PurePosixPath
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.media import iter_image_from_minio, stat_image_in_minio
+from app.models import Diary, DiaryPersona, Entry, Persona
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_VERSION = 1
+# DB는 이 크기 배치로 읽고(Postgres에서는 서버 측 커서), 응답은 이 크기쯤 모아서 내보낸다.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def image_member(kind: str, row_id: str, image_ref: str) -> str:
+    # ZIP 안 이미지 경로. 확장자는 객체 이름에서, 없으면 .png
+    suffix = PurePosixPath(image_ref.split("?", 1)[0]).suffix or ".png"
+    return f"images/{kind}/{row_id}{suffix}"
+
+
+def iter_records(db: Session, account_id: str, *, with_image_paths: bool = False) -> Iterator[dict[str, object]]:
+    # 계정의 페르소나 → 일기 → 일기-페르소나 연결 → 항목 순서. 가져오기(app.importer)도 같은 순서를 기대한다.
+    def stream(statement):
+        return db.scalars(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    def image_fields(kind: str, row_id: str, image_ref: str | None) -> dict[str, object]:
+        fields: dict[str, object] = {"image_url": image_ref}
+        if with_image_paths and image_ref:
+            fields["image_path"] = image_member(kind, row_id, image_ref)
+        return fields
+
+    yield {
+        "type": "export",
+        "version": EXPORT_FORMAT_VERSION,
+        "account_id": account_id,
+        "exported_at": datetime.now(UTC).isoformat(),
+    }
+    for persona in stream(select(Persona).where(Persona.account_id == account_id).order_by(Persona.id)):
+        yield {
+            "type": "persona",
+            "id": persona.id,
+            "name": persona.name,
+            "tone": persona.tone,
+            "description": persona.description,
+            **image_fields("personas", persona.id, persona.image_url),
+            "created_at": _iso(persona.created_at),
+        }
+    for diary in stream(select(Diary).where(Diary.account_id == account_id).order_by(Diary.created_at, Diary.id)):
+        yield {
+            "type": "diary",
+            "id": diary.id,
+            "title": diary.title,
+            "default_persona_id": diary.default_persona_id,
+            "created_at": _iso(diary.created_at),
+        }
+    links = stream(
+        select(DiaryPersona)
+        .join(Diary, Diary.id == DiaryPersona.diary_id)
+        .where(Diary.account_id == account_id)
+        .order_by(DiaryPersona.diary_id, DiaryPersona.persona_id)
+    )
+    for link in links:
+        yield {
+            "type": "diary_persona",
+            "diary_id": link.diary_id,
+            "persona_id": link.persona_id,
+            "is_default": link.is_default,
+        }
+    entries = stream(
+        select(Entry)
+        .join(Diary, Diary.id == Entry.diary_id)
+        .where(Diary.account_id == account_id)
+        .order_by(Entry.diary_id, Entry.created_at, Entry.id)
+    )
+    for entry in entries:
+        yield {
+            "type": "entry",
+            "id": entry.id,
+            "diary_id": entry.diary_id,
+            "persona_id": entry.persona_id,
+            "input_keywords": entry.input_keywords,
+            "input_text": entry.input_text,
+            "draft": entry.draft,
+            "status": entry.status.value,
+            **image_fields("entries", entry.id, entry.image_url),
+            "created_at": _iso(entry.created_at),
+        }
+
+
+def _ndjson_lines(records: Iterator[dict[str, object]]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for record in records:
+        buffer += json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_ndjson_export(session_factory: Callable[[], Session], account_id: str) -> Iterator[bytes]:
+    with session_factory() as db:
+        yield from _ndjson_lines(iter_records(db, account_id))
+
+
+class _ZipSink(io.RawIOBase):
+    # zipfile이 쓰는 바이트를 모아 두었다가 생성기가 꺼내 간다. seek를 지원하지 않으므로
+    # zipfile은 각 항목 뒤에 data descriptor를 붙이는 스트리밍 모드로 쓴다.
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def pending(self) -> int:
+        return self._size
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        return data
+
+
+def _image_refs(db: Session, account_id: str) -> Iterator[tuple[str, str, str]]:
+    personas = select(Persona.id, Persona.image_url).where(
+        Persona.account_id == account_id, Persona.image_url.is_not(None)
+    )
+    entries = (
+        select(Entry.id, Entry.image_url)
+        .join(Diary, Diary.id == Entry.diary_id)
+        .where(Diary.account_id == account_id, Entry.image_url.is_not(None))
+    )
+    for kind, statement in (("personas", personas), ("entries", entries)):
+        for row_id, image_ref in db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+            yield kind, row_id, image_ref
+
+
+def iter_zip_export(session_factory: Callable[[], Session], account_id: str) -> Iterator[bytes]:
+    # archive.ndjson + images/<kind>/<id>.<ext>. 이미지는 MinIO에서 청크 단위로 읽어 그대로(ZIP_STORED) 넣는다.
+    sink = _ZipSink()
+    with session_factory() as db, zipfile.ZipFile(sink, mode="w", allowZip64=True) as archive:
+        member = zipfile.ZipInfo("archive.ndjson", date_time=datetime.now(UTC).timetuple()[:6])
+        member.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(member, mode="w", force_zip64=True) as handle:
+            for chunk in _ndjson_lines(iter_records(db, account_id, with_image_paths=True)):
+                handle.write(chunk)
+                if sink.pending() >= EXPORT_CHUNK_BYTES:
+                    yield sink.drain()
+
+        for kind, row_id, image_ref in _image_refs(db, account_id):
+            info = stat_image_in_minio(image_ref=image_ref)
+            if info is None:
+                logger.warning("Export skipped missing image %s for %s %s", image_ref, kind, row_id)
+                continue
+            member = zipfile.ZipInfo(image_member(kind, row_id, image_ref), date_time=(info["last_modified"] or datetime.now(UTC)).timetuple()[:6])
+            member.compress_type = zipfile.ZIP_STORED
+            with archive.open(member, mode="w", force_zip64=True) as handle:
+                for chunk in iter_image_from_minio(image_ref=str(info["object_name"])):
+                    handle.write(chunk)
+                    if sink.pending() >= EXPORT_CHUNK_BYTES:
+                        yield sink.drain()
+            yield sink.drain()
+    # 중앙 디렉터리
+    yield sink.drain()
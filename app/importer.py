@@ -0,0 +1,279 @@
+import csv
+import json
+import logging
+import os
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+from typing import NamedTuple
+from uuid import uuid4
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.activity import record_entries_imported
+from app.export import EXPORT_FORMAT_VERSION
+from app.models import Diary, DiaryPersona, Entry, EntrySearchDocument, EntryStatus, Persona
+from app.schemas import ImportDiary, ImportDiaryPersona, ImportEntry, ImportPersona
+from app.search import search_terms
+
+logger = logging.getLogger(__name__)
+
+# 한 트랜잭션에 넣는 행 수. 배치마다 커밋하므로 실패한 배치만 되돌아간다.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# 응답에 담는 행 오류 수(실패 건수는 전부 센다).
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+_SCHEMAS: dict[str, type[BaseModel]] = {
+    "persona": ImportPersona,
+    "diary": ImportDiary,
+    "diary_persona": ImportDiaryPersona,
+    "entry": ImportEntry,
+}
+
+
+# (종류, 파일 속 id) 또는 (entry_id, 본문) 목록
+_Keys = list[tuple[str, str]]
+
+
+class RowError(NamedTuple):
+    line: int
+    error: str
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in exc.errors())
+
+
+def _utc(value: datetime | None) -> datetime:
+    # 시간대가 없는 값은 UTC로 본다(다른 created_at과 같은 기준).
+    if value is None:
+        return datetime.now(UTC)
+    return value.astimezone(UTC) if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+class AccountImporter:
+    # 레코드를 종류별 배치로 모아 다중 행 INSERT로 넣는다. 파일 순서(페르소나 → 일기 → 연결 → 항목)를
+    # 따르도록 종류가 바뀌면 모아 둔 배치를 먼저 넣는다. 메모리에는 현재 배치와 일기/페르소나 id 매핑만 남는다.
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        account_id: str,
+        *,
+        diary_id: str | None = None,
+        persona_id: str | None = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self.account_id = account_id
+        self.default_diary_id = diary_id
+        self.default_persona_id = persona_id
+        # (종류, 파일 속 id 또는 기존 id) -> 실제 id
+        self._ids: dict[tuple[str, str], str] = {}
+        self._kind: str | None = None
+        self._batch: list[tuple[int, BaseModel]] = []
+        self.imported = dict.fromkeys(_SCHEMAS, 0)
+        self.failed = 0
+        self.errors: list[RowError] = []
+
+    def add(self, line: int, record: object) -> None:
+        if not isinstance(record, dict):
+            self.reject(line, "record must be an object")
+            return
+        kind = record.get("type", "entry")
+        if kind == "export":
+            if record.get("version") != EXPORT_FORMAT_VERSION:
+                self.reject(line, f"unsupported export version: {record.get('version')}")
+            return
+        schema = _SCHEMAS.get(kind)
+        if schema is None:
+            self.reject(line, f"unknown record type: {kind}")
+            return
+        try:
+            row = schema.model_validate(record)
+        except ValidationError as exc:
+            self.reject(line, _validation_message(exc))
+            return
+        if kind != self._kind or len(self._batch) >= IMPORT_BATCH_SIZE:
+            self.flush()
+            self._kind = kind
+        self._batch.append((line, row))
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        kind, batch = self._kind, self._batch
+        self._batch = []
+        added: _Keys = []
+        saved: _Keys = []
+        failed, errors = self.failed, len(self.errors)
+        with self.session_factory() as db:
+            try:
+                inserted = getattr(self, f"_insert_{kind}")(db, batch, added, saved)
+                db.commit()
+            except SQLAlchemyError as exc:
+                db.rollback()
+                for key in added:
+                    self._ids.pop(key, None)
+                # 배치 안에서 이미 거절한 행도 아래에서 한 번씩만 다시 센다.
+                self.failed = failed
+                del self.errors[errors:]
+                logger.warning("Import batch of %d %s rows failed: %s", len(batch), kind, exc)
+                for line, _row in batch:
+                    self.reject(line, f"database error: {exc.__class__.__name__}")
+                return
+        self.imported[kind] += inserted
+        if saved:
+            from app.similar import index_saved_entries
+
+            index_saved_entries(self.account_id, saved)
+
+    def summary(self) -> dict[str, object]:
+        self.flush()
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": [error._asdict() for error in self.errors],
+        }
+
+    def reject(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(RowError(line, error))
+
+    def _resolve(self, db: Session, kind: str, source_ids: Iterable[str | None]) -> None:
+        # 파일에 없던 id는 같은 계정의 기존 행인지 한 번에 확인해 매핑에 더한다.
+        missing = {source_id for source_id in source_ids if source_id and (kind, source_id) not in self._ids}
+        if not missing:
+            return
+        model = Persona if kind == "persona" else Diary
+        for row_id in db.scalars(select(model.id).where(model.account_id == self.account_id, model.id.in_(missing))):
+            self._ids[(kind, row_id)] = row_id
+
+    def _new_id(self, kind: str, source_id: str | None, added: _Keys) -> str:
+        row_id = str(uuid4())
+        if source_id:
+            self._ids[(kind, source_id)] = row_id
+            added.append((kind, source_id))
+        return row_id
+
+    def _insert_persona(
+        self, db: Session, batch: list[tuple[int, ImportPersona]], added: _Keys, _saved: _Keys
+    ) -> int:
+        rows = [
+            {
+                "id": self._new_id("persona", row.id, added),
+                "account_id": self.account_id,
+                "name": row.name,
+                "tone": row.tone,
+                "description": row.description,
+                "created_at": _utc(row.created_at),
+            }
+            for _line, row in batch
+        ]
+        db.execute(insert(Persona), rows)
+        return len(rows)
+
+    def _insert_diary(
+        self, db: Session, batch: list[tuple[int, ImportDiary]], added: _Keys, _saved: _Keys
+    ) -> int:
+        self._resolve(db, "persona", (row.default_persona_id for _line, row in batch))
+        rows = []
+        for line, row in batch:
+            default_persona_id = self._ids.get(("persona", row.default_persona_id or ""))
+            if row.default_persona_id and default_persona_id is None:
+                self.reject(line, f"unknown default_persona_id: {row.default_persona_id}")
+                continue
+            rows.append(
+                {
+                    "id": self._new_id("diary", row.id, added),
+                    "account_id": self.account_id,
+                    "title": row.title,
+                    "default_persona_id": default_persona_id,
+                    "created_at": _utc(row.created_at),
+                }
+            )
+        if rows:
+            db.execute(insert(Diary), rows)
+        return len(rows)
+
+    def _insert_diary_persona(
+        self, db: Session, batch: list[tuple[int, ImportDiaryPersona]], _added: _Keys, _saved: _Keys
+    ) -> int:
+        self._resolve(db, "diary", (row.diary_id for _line, row in batch))
+        self._resolve(db, "persona", (row.persona_id for _line, row in batch))
+        rows = []
+        for line, row in batch:
+            diary_id, persona_id = self._ids.get(("diary", row.diary_id)), self._ids.get(("persona", row.persona_id))
+            if diary_id is None or persona_id is None:
+                self.reject(line, "unknown diary_id" if diary_id is None else "unknown persona_id")
+                continue
+            rows.append({"id": str(uuid4()), "diary_id": diary_id, "persona_id": persona_id, "is_default": row.is_default})
+        if rows:
+            db.execute(insert(DiaryPersona), rows)
+        return len(rows)
+
+    def _insert_entry(
+        self, db: Session, batch: list[tuple[int, ImportEntry]], _added: _Keys, saved: _Keys
+    ) -> int:
+        refs = [(row.diary_id or self.default_diary_id, row.persona_id or self.default_persona_id) for _line, row in batch]
+        self._resolve(db, "diary", (diary_id for diary_id, _persona_id in refs))
+        self._resolve(db, "persona", (persona_id for _diary_id, persona_id in refs))
+        rows = []
+        for (line, row), (source_diary_id, source_persona_id) in zip(batch, refs, strict=True):
+            diary_id = self._ids.get(("diary", source_diary_id or ""))
+            persona_id = self._ids.get(("persona", source_persona_id or ""))
+            if diary_id is None or persona_id is None:
+                missing = "diary_id" if diary_id is None else "persona_id"
+                self.reject(line, f"unknown {missing}: {source_diary_id if diary_id is None else source_persona_id}")
+                continue
+            rows.append(
+                {
+                    "id": str(uuid4()),
+                    "diary_id": diary_id,
+                    "persona_id": persona_id,
+                    "input_keywords": row.input_keywords,
+                    # 본문만 있는 다른 앱의 일기는 본문을 입력으로 본다(ck_entry_input_required).
+                    "input_text": row.input_text if row.input_keywords or row.input_text else row.draft,
+                    "draft": row.draft,
+                    "status": row.status,
+                    "created_at": _utc(row.created_at),
+                }
+            )
+        if not rows:
+            return 0
+        db.execute(insert(Entry), rows)
+        # 검색 색인과 일별 집계도 같은 트랜잭션에서 배치로 채운다.
+        db.execute(
+            insert(EntrySearchDocument),
+            [
+                {
+                    "entry_id": entry["id"],
+                    "account_id": self.account_id,
+                    "terms": search_terms(entry["input_keywords"], entry["input_text"], entry["draft"]),
+                }
+                for entry in rows
+            ],
+        )
+        record_entries_imported(db, self.account_id, ((entry["created_at"], entry["status"]) for entry in rows))
+        saved.extend((entry["id"], entry["draft"]) for entry in rows if entry["status"] == EntryStatus.SAVED)
+        return len(rows)
+
+
+def import_lines(importer: AccountImporter, lines: Iterable[str], fmt: str) -> dict[str, object]:
+    # lines는 줄바꿈을 포함한 텍스트 줄. CSV는 머리행의 열 이름이 ImportEntry 필드와 같아야 한다.
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            importer.add(reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)})
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                importer.reject(line_number, f"invalid JSON: {exc.msg}")
+                continue
+            importer.add(line_number, record)
+    return importer.summary()
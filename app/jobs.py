@@ -0,0 +1,268 @@
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import SessionLocal
+from app.media import generate_diary_image_png_bytes, upload_image_to_minio
+from app.models import Diary, Entry, ImageJob, ImageJobKind, ImageStatus, JobStatus, Persona
+
+logger = logging.getLogger(__name__)
+
+IMAGE_JOB_CONCURRENCY = int(os.getenv("IMAGE_JOB_CONCURRENCY", "2"))
+IMAGE_JOB_MAX_ATTEMPTS = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", "3"))
+IMAGE_JOB_BACKOFF_SECONDS = float(os.getenv("IMAGE_JOB_BACKOFF_SECONDS", "5"))
+IMAGE_JOB_POLL_SECONDS = float(os.getenv("IMAGE_JOB_POLL_SECONDS", "1"))
+# RUNNING 상태로 이 시간 이상 갱신이 없으면 워커가 죽은 것으로 보고 다시 큐에 넣는다.
+IMAGE_JOB_LEASE_SECONDS = float(os.getenv("IMAGE_JOB_LEASE_SECONDS", "300"))
+
+
+def _load_target(db: Session, kind: ImageJobKind, target_id: str) -> Persona | Entry | None:
+    model = Persona if kind == ImageJobKind.PERSONA else Entry
+    return db.get(model, target_id)
+
+
+def _target_account_id(db: Session, target: Persona | Entry) -> str:
+    if isinstance(target, Persona):
+        return target.account_id
+    diary = db.get(Diary, target.diary_id)
+    return diary.account_id if diary else ""
+
+
+def _image_prompt(target: Persona | Entry) -> str:
+    if isinstance(target, Persona):
+        return f"{target.name} ({target.tone}): {target.description}"
+    return target.draft
+
+
+def enqueue_image_job(
+    db: Session,
+    *,
+    kind: ImageJobKind,
+    target_id: str,
+    max_attempts: int = IMAGE_JOB_MAX_ATTEMPTS,
+) -> ImageJob | None:
+    target = _load_target(db, kind, target_id)
+    if target is None:
+        return None
+
+    # 대기/실행 중이거나 이미 성공한 작업이 있으면 그대로 돌려준다. 실패한 작업만 다시 큐에 넣는다.
+    job = db.query(ImageJob).filter(ImageJob.kind == kind, ImageJob.target_id == target_id).first()
+    if job is not None and job.status != JobStatus.FAILED:
+        return job
+
+    now = datetime.now(UTC)
+    if job is None:
+        job = ImageJob(
+            kind=kind,
+            target_id=target_id,
+            account_id=_target_account_id(db, target),
+            max_attempts=max_attempts,
+        )
+        db.add(job)
+    job.status = JobStatus.QUEUED
+    job.attempts = 0
+    job.last_error = None
+    job.next_run_at = now
+    job.updated_at = now
+    target.image_status = ImageStatus.PENDING
+    try:
+        db.commit()
+    except IntegrityError:
+        # 동시에 같은 대상을 enqueue한 요청이 먼저 커밋한 경우
+        db.rollback()
+        return db.query(ImageJob).filter(ImageJob.kind == kind, ImageJob.target_id == target_id).first()
+    db.refresh(job)
+    return job
+
+
+class ImageJobRunner:
+    def __init__(
+        self,
+        *,
+        session_factory: sessionmaker = SessionLocal,
+        concurrency: int = IMAGE_JOB_CONCURRENCY,
+        backoff_seconds: float = IMAGE_JOB_BACKOFF_SECONDS,
+        poll_seconds: float = IMAGE_JOB_POLL_SECONDS,
+        lease_seconds: float = IMAGE_JOB_LEASE_SECONDS,
+        generate_image: Callable[[str], bytes | None] | None = None,
+        store_image: Callable[[bytes, str], str | None] | None = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.backoff_seconds = backoff_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.generate_image = generate_image or (lambda text: generate_diary_image_png_bytes(diary_text=text))
+        self.store_image = store_image or (
+            lambda image, account_id: upload_image_to_minio(image_bytes=image, account_id=account_id)
+        )
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor: ThreadPoolExecutor | None = None
+        self._dispatcher: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._dispatcher is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="image-job")
+        self._dispatcher = threading.Thread(target=self._loop, name="image-job-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self) -> None:
+        if self._dispatcher is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._dispatcher.join()
+        self._dispatcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_pending(self) -> int:
+        # 디스패처 없이 현재 처리 가능한 작업을 호출 스레드에서 바로 실행한다(테스트/CLI용).
+        processed = 0
+        while job_ids := self._claim_due(self.concurrency):
+            for job_id in job_ids:
+                self._run(job_id)
+            processed += len(job_ids)
+        return processed
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._dispatch()
+            except Exception:  # noqa: BLE001
+                logger.exception("Image job dispatch failed")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _dispatch(self) -> None:
+        free = 0
+        while free < self.concurrency and self._slots.acquire(blocking=False):
+            free += 1
+        if free == 0:
+            return
+        job_ids = self._claim_due(free)
+        for _ in range(free - len(job_ids)):
+            self._slots.release()
+        for job_id in job_ids:
+            self._executor.submit(self._run_in_slot, job_id)
+
+    def _run_in_slot(self, job_id: str) -> None:
+        try:
+            self._run(job_id)
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def _claim_due(self, limit: int) -> list[str]:
+        now = datetime.now(UTC)
+        claimed: list[str] = []
+        with self.session_factory() as db:
+            self._expire_leases(db, now)
+            candidates = (
+                db.query(ImageJob.id)
+                .filter(ImageJob.status == JobStatus.QUEUED, ImageJob.next_run_at <= now)
+                .order_by(ImageJob.next_run_at)
+                .limit(limit)
+                .all()
+            )
+            for (job_id,) in candidates:
+                # 조건부 UPDATE로 선점해 여러 워커 프로세스가 같은 작업을 중복 실행하지 않게 한다.
+                result = db.execute(
+                    update(ImageJob)
+                    .where(ImageJob.id == job_id, ImageJob.status == JobStatus.QUEUED)
+                    .values(status=JobStatus.RUNNING, attempts=ImageJob.attempts + 1, updated_at=now)
+                )
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            db.commit()
+        return claimed
+
+    def _expire_leases(self, db: Session, now: datetime) -> None:
+        # 임대가 끝난 작업은 시도 횟수가 남아 있을 때만 다시 큐에 넣는다. 워커를 계속 죽이는 작업이
+        # 영원히 다시 선점되지 않도록, 다 쓴 작업은 실패로 끝낸다.
+        expired = (ImageJob.status == JobStatus.RUNNING, ImageJob.updated_at < now - timedelta(seconds=self.lease_seconds))
+        db.execute(
+            update(ImageJob).where(*expired, ImageJob.attempts < ImageJob.max_attempts).values(status=JobStatus.QUEUED)
+        )
+        for job in db.query(ImageJob).filter(*expired).all():
+            result = db.execute(
+                update(ImageJob)
+                .where(ImageJob.id == job.id, ImageJob.status == JobStatus.RUNNING, ImageJob.updated_at == job.updated_at)
+                .values(status=JobStatus.FAILED, last_error="lease expired", updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            target = _load_target(db, job.kind, job.target_id) if result.rowcount == 1 else None
+            if target is not None:
+                target.image_status = ImageStatus.FAILED
+
+    def _run(self, job_id: str) -> None:
+        with self.session_factory() as db:
+            job = db.get(ImageJob, job_id)
+            target = _load_target(db, job.kind, job.target_id) if job else None
+            if job is None or target is None:
+                if job is not None:
+                    job.status = JobStatus.FAILED
+                    job.last_error = "target not found"
+                    job.updated_at = datetime.now(UTC)
+                    db.commit()
+                return
+            prompt = _image_prompt(target)
+            account_id = job.account_id
+
+        # 10~30초 걸리는 생성/업로드 동안에는 DB 커넥션을 잡지 않는다.
+        try:
+            image = self.generate_image(prompt)
+            if not image:
+                raise RuntimeError("image generation returned no data")
+            image_ref = self.store_image(image, account_id)
+            if not image_ref:
+                raise RuntimeError("image storage is not configured")
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Image job %s failed: %s", job_id, exc)
+            self._finish(job_id, image_ref=None, error=str(exc))
+            return
+        self._finish(job_id, image_ref=image_ref, error=None)
+
+    def _finish(self, job_id: str, *, image_ref: str | None, error: str | None) -> None:
+        now = datetime.now(UTC)
+        with self.session_factory() as db:
+            job = db.get(ImageJob, job_id)
+            if job is None:
+                return
+            target = _load_target(db, job.kind, job.target_id)
+            job.updated_at = now
+            if error is None:
+                job.status = JobStatus.SUCCEEDED
+                job.image_ref = image_ref
+                job.last_error = None
+                if target is not None:
+                    target.image_url = image_ref
+                    target.image_status = ImageStatus.SUCCESS
+            elif job.attempts < job.max_attempts:
+                job.status = JobStatus.QUEUED
+                job.last_error = error
+                job.next_run_at = now + timedelta(seconds=self.backoff_seconds * 2 ** (job.attempts - 1))
+            else:
+                job.status = JobStatus.FAILED
+                job.last_error = error
+                if target is not None:
+                    target.image_status = ImageStatus.FAILED
+            db.commit()
+
+
+image_job_runner = ImageJobRunner()
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Protocol
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import SessionLocal
+from app.models import RateLimitBucket
+
+# 같은 키에서 첫 행을 만드는 경합이 겹칠 때 다시 시도하는 횟수
+RATE_LIMIT_DB_ATTEMPTS = 3
+# 다 채워진 채 쉬고 있는 버킷을 지우는 간격(워커마다, 키 접두어마다)
+RATE_LIMIT_PRUNE_INTERVAL_SECONDS = float(os.getenv("RATE_LIMIT_PRUNE_INTERVAL_SECONDS", "300"))
+
+ADMISSION_REJECTIONS = Counter(
+    "echodiary_admission_rejections_total",
+    "Requests rejected with 429 by the admission controller.",
+    ["name", "reason"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "echodiary_admission_in_flight",
+    "Requests currently holding a concurrency slot.",
+    ["name"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUED = Gauge(
+    "echodiary_admission_queued",
+    "Requests waiting for a concurrency slot.",
+    ["name"],
+    multiprocess_mode="livesum",
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, *, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucketBackend(Protocol):
+    # 토큰을 cost만큼 꺼낼 수 있으면 0, 아니면 다시 시도할 수 있을 때까지의 초를 돌려준다.
+    def take(self, key: str, *, rate: float, burst: float, cost: float = 1.0) -> float: ...
+
+
+def _refill(tokens: float, elapsed: float, *, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, elapsed) * rate)
+
+
+class MemoryTokenBucketBackend:
+    # 프로세스 하나 안에서만 공유된다. 워커가 여러 개면 DatabaseTokenBucketBackend를 쓴다.
+    def __init__(self, *, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, *, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, now - updated_at, rate=rate, burst=burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._prune(now, rate=rate, burst=burst)
+            self._buckets[key] = (tokens, now)
+        return 0.0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now: float, *, rate: float, burst: float) -> None:
+        # 가득 찬 버킷은 없는 것과 같으므로 버려도 된다.
+        full = [k for k, (t, at) in self._buckets.items() if _refill(t, now - at, rate=rate, burst=burst) >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+class DatabaseTokenBucketBackend:
+    # 여러 워커/인스턴스가 같은 버킷을 공유한다. Postgres에서는 행 잠금으로 직렬화된다.
+    def __init__(self, *, session_factory: sessionmaker = SessionLocal, clock: Callable[[], float] = time.time) -> None:
+        self.session_factory = session_factory
+        self._clock = clock
+        self._pruned_at: dict[str, float] = {}
+
+    def take(self, key: str, *, rate: float, burst: float, cost: float = 1.0) -> float:
+        self._maybe_prune(key, rate=rate, burst=burst)
+        for _ in range(RATE_LIMIT_DB_ATTEMPTS):
+            try:
+                return self._take(key, rate=rate, burst=burst, cost=cost)
+            except IntegrityError:
+                # 같은 키의 첫 행을 다른 워커가 먼저 만든 경우 다시 시도한다.
+                continue
+        # 계속 겹치면 500 대신 한 토큰이 찰 시간 뒤에 다시 오게 한다(429).
+        return cost / rate
+
+    def _maybe_prune(self, key: str, *, rate: float, burst: float) -> None:
+        # 키 접두어(AdmissionController 이름)가 같으면 rate/burst도 같다. burst/rate초 넘게 쉰 버킷은
+        # 이미 가득 찼으므로 지워도 다음 요청에서 burst로 다시 만들어지는 것과 같다.
+        prefix = key.partition(":")[0] + ":"
+        now = self._clock()
+        if now - self._pruned_at.get(prefix, float("-inf")) < RATE_LIMIT_PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at[prefix] = now
+        with self.session_factory() as db:
+            db.execute(
+                delete(RateLimitBucket).where(
+                    RateLimitBucket.key.startswith(prefix, autoescape=True),
+                    RateLimitBucket.updated_at < now - burst / rate,
+                )
+            )
+            db.commit()
+
+    def _take(self, key: str, *, rate: float, burst: float, cost: float) -> float:
+        now = self._clock()
+        with self.session_factory() as db:
+            row = db.scalars(select(RateLimitBucket).where(RateLimitBucket.key == key).with_for_update()).first()
+            if row is None:
+                row = RateLimitBucket(key=key, tokens=burst, updated_at=now)
+                db.add(row)
+            tokens = _refill(row.tokens, now - row.updated_at, rate=rate, burst=burst)
+            allowed = tokens >= cost
+            row.tokens = tokens - cost if allowed else tokens
+            row.updated_at = now
+            db.commit()
+        return 0.0 if allowed else (cost - tokens) / rate
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        *,
+        backend: TokenBucketBackend,
+        rate_per_minute: float,
+        burst: float,
+        max_concurrency: int | None = None,
+        max_queue: int = 0,
+        queue_timeout: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.backend = backend
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._in_flight = 0
+        self._queued = 0
+        # 슬롯 점유 시간의 이동 평균. 큐가 찼을 때 Retry-After 추정에 쓴다.
+        self._avg_hold_seconds = 1.0
+
+    def check_rate(self, user_id: str) -> None:
+        if self.rate <= 0:
+            return
+        retry_after = self.backend.take(f"{self.name}:{user_id}", rate=self.rate, burst=self.burst)
+        if retry_after > 0:
+            self._reject("user_rate", retry_after)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore is None:
+            yield
+            return
+        await self._acquire()
+        started = time.monotonic()
+        self._in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(name=self.name).inc()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            ADMISSION_IN_FLIGHT.labels(name=self.name).dec()
+            self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * (time.monotonic() - started)
+            self._semaphore.release()
+
+    def stats(self) -> dict[str, float]:
+        return {"in_flight": self._in_flight, "queued": self._queued, "avg_hold_seconds": self._avg_hold_seconds}
+
+    async def _acquire(self) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        if self._queued >= self.max_queue:
+            self._reject("queue_full", self._estimated_wait())
+        self._queued += 1
+        ADMISSION_QUEUED.labels(name=self.name).inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except TimeoutError:
+            self._reject("queue_timeout", self._estimated_wait())
+        finally:
+            self._queued -= 1
+            ADMISSION_QUEUED.labels(name=self.name).dec()
+
+    def _estimated_wait(self) -> float:
+        return self._avg_hold_seconds * (self._queued + 1) / self.max_concurrency
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        ADMISSION_REJECTIONS.labels(name=self.name, reason=reason).inc()
+        raise AdmissionRejected(reason=reason, retry_after=retry_after)
+
+
+def _bucket_backend() -> TokenBucketBackend:
+    # memory: 프로세스 내부, db: 여러 워커가 rate_limit_buckets 테이블을 공유
+    if os.getenv("RATE_LIMIT_BACKEND", "memory").lower() == "db":
+        return DatabaseTokenBucketBackend()
+    return MemoryTokenBucketBackend()
+
+
+_backend = _bucket_backend()
+
+# 동시 실행 슬롯과 대기열은 프로세스 단위다(워커 수 x GENERATE_MAX_CONCURRENCY가 전체 상한).
+generation_admission = AdmissionController(
+    "generate_entry",
+    backend=_backend,
+    rate_per_minute=float(os.getenv("GENERATE_RATE_PER_MINUTE", "20")),
+    burst=float(os.getenv("GENERATE_BURST", "5")),
+    max_concurrency=int(os.getenv("GENERATE_MAX_CONCURRENCY", "32")),
+    max_queue=int(os.getenv("GENERATE_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("GENERATE_QUEUE_TIMEOUT_SECONDS", "2")),
+)
+# 이미지 작업은 러너가 동시성을 제한하므로 사용자별 토큰 버킷만 적용한다.
+image_job_admission = AdmissionController(
+    "image_job",
+    backend=_backend,
+    rate_per_minute=float(os.getenv("IMAGE_JOB_RATE_PER_MINUTE", "6")),
+    burst=float(os.getenv("IMAGE_JOB_BURST", "3")),
+)
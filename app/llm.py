@@ -1,17 +1,74 @@
+from __future__ import annotations
+
+import asyncio
 import os
-from typing import TypedDict
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from functools import lru_cache
+from typing import TYPE_CHECKING, TypedDict
 
+import httpx
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-from langgraph.graph import END, StateGraph
+from prometheus_client import Counter, Histogram
+
+from app.models import ModelType
+from app.providers import Route, RouteHealth, llm_router, route_credentials
+from app.resilience import hedged
+
+# langchain/langgraph는 import만으로 1~2초가 걸리므로 첫 생성 요청 때 불러온다.
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_openai import ChatOpenAI
+    from langgraph.graph.state import CompiledStateGraph
 
 load_dotenv()
 
+# 프롬프트(_build_messages)를 바꾸면 올려서 이전 초안 캐시를 무효화한다.
+PROMPT_VERSION = "v1"
+LLM_TIMEOUT_SECONDS = 8
+LLM_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# 첫 호출이 최근 성공 지연의 LLM_HEDGE_PERCENTILE 분위수를 넘기면 같은 요청을 한 번 더 보낸다(비용 2배 가능).
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+# 0보다 크면 계정의 비슷한 지난 일기(app.similar)를 최대 이 개수만큼 프롬프트에 참고로 넣는다.
+LLM_GROUNDING_ENTRIES = int(os.getenv("LLM_GROUNDING_ENTRIES", "0"))
+LLM_GROUNDING_MIN_SCORE = float(os.getenv("LLM_GROUNDING_MIN_SCORE", "0.2"))
+LLM_GROUNDING_MAX_CHARS = int(os.getenv("LLM_GROUNDING_MAX_CHARS", "300"))
+# 초안 생성에 쓰는 모델 타입. 실제 공급자/모델은 app.providers 라우팅이 정한다.
+DRAFT_MODEL_TYPE = ModelType(os.getenv("DRAFT_MODEL_TYPE", ModelType.TEXT_SMALL.value))
+
+LLM_REQUEST_SECONDS = Histogram(
+    "echodiary_llm_request_seconds",
+    "Upstream chat completion latency.",
+    ["model", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30),
+)
+LLM_TOKENS = Counter(
+    "echodiary_llm_tokens_total",
+    "Tokens reported by the upstream model.",
+    ["model", "kind"],
+)
+LLM_ERRORS = Counter(
+    "echodiary_llm_errors_total",
+    "Failed upstream model calls.",
+    ["model", "reason"],
+)
+LLM_FALLBACKS = Counter(
+    "echodiary_llm_fallbacks_total",
+    "Drafts replaced by the local fallback instead of a model completion.",
+    ["model", "reason"],
+)
+
 
 class DraftState(TypedDict):
     tone: str
     source: str
+    # 참고할 지난 일기 본문(비슷한 순)
+    memories: list[str]
     draft: str
 
 
@@ -19,45 +76,194 @@ def _fallback_draft(*, tone: str, source: str) -> str:
     return f"[{tone}] {source}"
 
 
-def _build_graph() -> StateGraph:
-    workflow = StateGraph(DraftState)
+def is_fallback_draft(draft: str, *, tone: str, source: str) -> bool:
+    return draft == _fallback_draft(tone=tone, source=source)
+
+
+def current_model_name() -> str:
+    return llm_router.primary_model(DRAFT_MODEL_TYPE)
+
+
+@lru_cache(maxsize=8)
+def _get_chat_model(model: str, api_key: str, base_url: str | None = None) -> ChatOpenAI:
+    from langchain_openai import ChatOpenAI
 
-    def compose_node(state: DraftState) -> DraftState:
-        api_key = os.getenv("OPENAI_API_KEY")
-        model = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
-
-        if not api_key or os.getenv("ECHODIARY_DISABLE_LLM") == "true":
-            return {**state, "draft": _fallback_draft(tone=state["tone"], source=state["source"])}
-
-        llm = ChatOpenAI(model=model, api_key=api_key, temperature=0.7, timeout=8, max_retries=0)
-        try:
-            response = llm.invoke(
-                [
-                    SystemMessage(content="너는 사용자의 메모를 자연스럽고 짧은 한국어 일기 문장으로 정리한다."),
-                    HumanMessage(
-                        content=(
-                            f"톤: {state['tone']}\n"
-                            f"입력: {state['source']}\n"
-                            "요청: 4~6문장 분량의 자연스러운 한국어 일기 초안을 작성해줘."
-                        )
-                    ),
-                ]
+    # 프로세스 전역으로 재사용되는 클라이언트. httpx 커넥션 풀을 요청 간 공유한다.
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+    return ChatOpenAI(
+        model=model,
+        api_key=api_key,
+        base_url=base_url,
+        temperature=0.7,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=0,
+        # 스트리밍 응답에도 토큰 사용량을 포함시킨다(LLM_TOKENS).
+        stream_usage=True,
+        http_client=httpx.Client(limits=limits, timeout=LLM_TIMEOUT_SECONDS),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT_SECONDS),
+    )
+
+
+def _build_messages(state: DraftState) -> list[BaseMessage]:
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    memories = "".join(f"- {memory[:LLM_GROUNDING_MAX_CHARS]}\n" for memory in state.get("memories") or [])
+    return [
+        SystemMessage(content="너는 사용자의 메모를 자연스럽고 짧은 한국어 일기 문장으로 정리한다."),
+        HumanMessage(
+            content=(
+                f"톤: {state['tone']}\n"
+                f"입력: {state['source']}\n"
+                + (f"참고할 지난 일기(문체와 맥락만 참고하고 내용을 옮기지 말 것):\n{memories}" if memories else "")
+                + "요청: 4~6문장 분량의 자연스러운 한국어 일기 초안을 작성해줘."
             )
-        except Exception:  # noqa: BLE001
-            return {**state, "draft": _fallback_draft(tone=state["tone"], source=state["source"])}
+        ),
+    ]
+
+
+def record_token_usage(model: str, usage: dict | None) -> None:
+    for kind, key in (("input", "input_tokens"), ("output", "output_tokens")):
+        count = (usage or {}).get(key) or 0
+        if count:
+            LLM_TOKENS.labels(model=model, kind=kind).inc(count)
+
+
+def error_reason(exc: Exception) -> str:
+    from openai import APITimeoutError
+
+    if isinstance(exc, TimeoutError | httpx.TimeoutException | APITimeoutError):
+        return "timeout"
+    return type(exc).__name__
+
+
+def _fallback_state(state: DraftState, *, model: str, reason: str) -> DraftState:
+    LLM_FALLBACKS.labels(model=model, reason=reason).inc()
+    return {**state, "draft": _fallback_draft(tone=state["tone"], source=state["source"])}
 
-        content = (response.content or "").strip() if isinstance(response.content, str) else ""
-        return {**state, "draft": content or _fallback_draft(tone=state["tone"], source=state["source"])}
 
-    workflow.add_node("compose", compose_node)
+def _allowed_routes(routes: list[Route]) -> Iterator[tuple[Route, RouteHealth]]:
+    # 브레이커가 열린 경로는 건너뛴다. half-open probe 슬롯을 낭비하지 않도록 실제로 시도할 때만 allow()를 호출한다.
+    for route in routes:
+        health = llm_router.health(DRAFT_MODEL_TYPE, route)
+        if health.breaker.allow():
+            yield route, health
+
+
+def _record_failure(route: Route, health: RouteHealth, *, started: float, exc: Exception) -> str:
+    reason = error_reason(exc)
+    outcome = "timeout" if reason == "timeout" else "error"
+    elapsed = time.perf_counter() - started
+    health.record(success=False, duration=elapsed)
+    LLM_REQUEST_SECONDS.labels(model=route.model, outcome=outcome).observe(elapsed)
+    LLM_ERRORS.labels(model=route.model, reason=reason).inc()
+    return outcome
+
+
+def _finalize_draft(
+    state: DraftState, response: BaseMessage, *, route: Route, health: RouteHealth, started: float
+) -> DraftState:
+    elapsed = time.perf_counter() - started
+    health.record(success=True, duration=elapsed)
+    LLM_REQUEST_SECONDS.labels(model=route.model, outcome="success").observe(elapsed)
+    record_token_usage(route.model, getattr(response, "usage_metadata", None))
+    text = response.content.strip() if isinstance(response.content, str) else ""
+    if not text:
+        return _fallback_state(state, model=route.model, reason="empty")
+    return {**state, "draft": text}
+
+
+def _hedge_delay(health: RouteHealth) -> float | None:
+    if not LLM_HEDGE_ENABLED or len(health.latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_SECONDS, health.latencies.percentile(LLM_HEDGE_PERCENTILE))
+
+
+@lru_cache(maxsize=1)
+def _get_draft_graph() -> CompiledStateGraph:
+    from langchain_core.runnables import RunnableConfig, RunnableLambda
+    from langgraph.graph import END, StateGraph
+
+    workflow = StateGraph(DraftState)
+
+    # 라우터가 고른 순서(건강하고 빠른 경로 우선)로 시도하고, 실패하면 다음 공급자로 넘어간다.
+    # 모든 경로가 실패하거나 열려 있으면 마지막 실패 사유로 폴백한다.
+    async def compose_node(state: DraftState, config: RunnableConfig) -> DraftState:
+        await llm_router.aroutes()
+        routes = llm_router.candidates(DRAFT_MODEL_TYPE)
+        if not routes:
+            return _fallback_state(state, model=current_model_name(), reason="disabled")
+
+        messages = _build_messages(state)
+        # 스트리밍 중에는 두 응답의 토큰이 섞이므로 헤지하지 않는다.
+        hedge = config.get("configurable", {}).get("hedge", True)
+        reason = "circuit_open"
+        for route, health in _allowed_routes(routes):
+            chat_model = _get_chat_model(route.model, *route_credentials(route))
+            started = time.perf_counter()
+            try:
+                response = await hedged(
+                    "llm_draft",
+                    lambda: chat_model.ainvoke(messages),
+                    delay=_hedge_delay(health) if hedge else None,
+                )
+            except Exception as exc:  # noqa: BLE001
+                reason = _record_failure(route, health, started=started, exc=exc)
+                continue
+            except BaseException:
+                # 취소(SSE 클라이언트 연결 끊김 등)는 경로 실패가 아니다. probe 슬롯만 돌려준다.
+                health.breaker.release()
+                raise
+            return _finalize_draft(state, response, route=route, health=health, started=started)
+        return _fallback_state(state, model=routes[0].model, reason=reason)
+
+    # 비동기 노드 하나만 둔다. 동기 API(generate_diary_draft)도 같은 경로를 탄다.
+    workflow.add_node("compose", RunnableLambda(compose_node, name="compose"))
     workflow.set_entry_point("compose")
     workflow.add_edge("compose", END)
     return workflow.compile()
 
 
-_draft_graph = _build_graph()
+async def agenerate_diary_draft(*, tone: str, source: str, memories: list[str] | None = None) -> str:
+    result = await _get_draft_graph().ainvoke({"tone": tone, "source": source, "memories": memories or [], "draft": ""})
+    return result["draft"]
 
 
-def generate_diary_draft(*, tone: str, source: str) -> str:
-    result = _draft_graph.invoke({"tone": tone, "source": source, "draft": ""})
-    return result["draft"]
+@lru_cache(maxsize=1)
+def _sync_loop() -> asyncio.AbstractEventLoop:
+    # 공유 AsyncClient의 커넥션이 한 루프에 묶이도록 호출마다 asyncio.run으로 새 루프를 만들지 않는다.
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-sync-loop", daemon=True).start()
+    return loop
+
+
+def generate_diary_draft(*, tone: str, source: str, memories: list[str] | None = None) -> str:
+    # 스크립트/테스트용 동기 래퍼. 이벤트 루프 안에서는 agenerate_diary_draft를 쓴다.
+    coroutine = agenerate_diary_draft(tone=tone, source=source, memories=memories)
+    return asyncio.run_coroutine_threadsafe(coroutine, _sync_loop()).result()
+
+
+async def astream_diary_draft(
+    *, tone: str, source: str, memories: list[str] | None = None
+) -> AsyncIterator[tuple[str, str]]:
+    # ("token", 조각)을 compose 노드에서 도착하는 즉시 내보내고, 마지막에 ("draft", 최종 초안)을 내보낸다.
+    # 업스트림이 중간에 실패하면 최종 초안은 _fallback_draft 결과가 되어 지금까지의 토큰과 달라진다.
+    from langchain_core.messages import AIMessageChunk
+
+    final_draft = ""
+    async for mode, chunk in _get_draft_graph().astream(
+        {"tone": tone, "source": source, "memories": memories or [], "draft": ""},
+        {"configurable": {"hedge": False}},
+        stream_mode=["messages", "values"],
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != "compose" or not isinstance(message, AIMessageChunk):
+                continue
+            if isinstance(message.content, str) and message.content:
+                yield "token", message.content
+        elif mode == "values":
+            final_draft = chunk.get("draft", "")
+    yield "draft", final_draft or _fallback_draft(tone=tone, source=source)
@@ -1,25 +1,102 @@
+import base64
+import codecs
+import json
 import os
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
 
 import jwt
-from fastapi import Depends, FastAPI, Header, HTTPException
+from anyio import from_thread
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from prometheus_client import multiprocess
 from prometheus_fastapi_instrumentator import Instrumentator
+from starlette.background import BackgroundTask
+from sqlalchemy import Select, select, tuple_
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal, engine
-from app.llm import generate_diary_draft
-from app.models import Base, Diary, DiaryPersona, Entry, EntryStatus, Persona, User, UserRole
-from app.schemas import DiaryCreate, EntryGenerateRequest, EntrySaveRequest, LoginRequest, PersonaCreate, SignupRequest
-
-Base.metadata.create_all(bind=engine)
+from app.activity import (
+    activity_statement,
+    activity_today,
+    record_entry_created,
+    record_entry_saved,
+    summarize_activity,
+)
+from app.bootstrap import DB_BOOTSTRAP_ON_STARTUP, bootstrap_database, ensure_admin_user
+from app.cache import draft_cache, draft_cache_key
+from app.database import AsyncSessionLocal, QueryMetricsMiddleware, ReadSession, SessionLocal
+from app.export import iter_ndjson_export, iter_zip_export
+from app.importer import AccountImporter, import_lines
+from app.jobs import enqueue_image_job, image_job_runner
+from app.limits import AdmissionRejected, generation_admission, image_job_admission
+from app.llm import (
+    LLM_GROUNDING_ENTRIES,
+    LLM_GROUNDING_MIN_SCORE,
+    PROMPT_VERSION,
+    agenerate_diary_draft,
+    astream_diary_draft,
+    current_model_name,
+    is_fallback_draft,
+)
+from app.media import bootstrap_minio, iter_image_from_minio, shutdown_variant_pool, stat_image_in_minio
+from app.models import Diary, DiaryPersona, Entry, EntryStatus, ImageJob, LLMRoutingConfig, Persona, User, UserRole
+from app.providers import Route, llm_router, parse_routes, routing_history, save_routing
+from app.schemas import (
+    DiaryCreate,
+    EntryGenerateRequest,
+    EntrySaveRequest,
+    ImageJobCreate,
+    LLMRoutingUpdate,
+    LoginRequest,
+    PersonaCreate,
+    SignupRequest,
+    UserRoleUpdate,
+)
+from app.search import index_entry, search_statement
+from app.singleflight import SingleFlight
 
 JWT_SECRET = os.getenv("JWT_SECRET", "echodiary-dev-secret")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "120"))
+# claims: 검증된 JWT 클레임 + 짧은 TTL 사용자 캐시로 인증(요청마다 DB 조회 없음), db: 요청마다 사용자 조회
+AUTH_MODE = os.getenv("AUTH_MODE", "claims")
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_USERS = int(os.getenv("AUTH_CACHE_MAX_USERS", "10000"))
+GENERATE_TIMEOUT_SECONDS = float(os.getenv("GENERATE_TIMEOUT_SECONDS", "30"))
+PAGE_LIMIT_DEFAULT = 50
+PAGE_LIMIT_MAX = 200
+
+IMAGE_PROXY_CACHE_CONTROL = os.getenv("IMAGE_PROXY_CACHE_CONTROL", "private, max-age=3600")
+IMAGE_JOB_WORKERS_ENABLED = os.getenv("IMAGE_JOB_WORKERS_ENABLED", "true").lower() == "true"
+
+generation_flights = SingleFlight("generate_entry")
+
 
-app = FastAPI(title="EchoDiary API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    # import 시점에는 DB/스토리지에 접근하지 않는다. 워커가 실제로 뜰 때 한 번만 준비한다.
+    if DB_BOOTSTRAP_ON_STARTUP:
+        await run_in_threadpool(bootstrap_database)
+    await run_in_threadpool(bootstrap_minio)
+    if IMAGE_JOB_WORKERS_ENABLED:
+        image_job_runner.start()
+    try:
+        yield
+    finally:
+        image_job_runner.stop()
+        shutdown_variant_pool()
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            # 종료한 워커의 live* 게이지가 합산에 남지 않게 한다.
+            multiprocess.mark_process_dead(os.getpid())
+
+
+app = FastAPI(title="EchoDiary API", version="0.1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -27,6 +104,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryMetricsMiddleware)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(_request: Request, exc: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests", "reason": exc.reason},
+        headers={"Retry-After": exc.retry_after_header},
+    )
 
 
 @app.get("/")
@@ -47,30 +134,56 @@ def get_db() -> Session:
         db.close()
 
 
-def ensure_admin_user(db: Session) -> None:
-    admin = db.query(User).filter(User.username == "admin").first()
-    if admin:
-        return
-    db.add(User(username="admin", password="admin", role=UserRole.ADMIN))
-    db.commit()
-
-
 def create_access_token(user: User) -> str:
     now = datetime.now(UTC)
     payload = {
         "sub": user.id,
         "username": user.username,
         "role": user.role.value,
+        "ver": user.token_version or 0,
         "iat": int(now.timestamp()),
         "exp": int((now + timedelta(minutes=JWT_EXPIRE_MINUTES)).timestamp()),
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def get_current_user(
-    authorization: str | None = Header(default=None),
-    db: Session = Depends(get_db),
-) -> User:
+# user_id -> (만료 시각, token_version, role). 역할 변경/삭제는 최대 AUTH_CACHE_TTL_SECONDS 안에 반영된다.
+_auth_cache: dict[str, tuple[float, int, UserRole]] = {}
+_auth_cache_lock = threading.Lock()
+
+
+def _cached_user_state(user_id: str) -> tuple[int, UserRole] | None:
+    with _auth_cache_lock:
+        cached = _auth_cache.get(user_id)
+        if cached is None:
+            return None
+        expires_at, token_version, role = cached
+        if expires_at <= time.monotonic():
+            del _auth_cache[user_id]
+            return None
+        return token_version, role
+
+
+def _cache_user_state(user: User) -> None:
+    with _auth_cache_lock:
+        if len(_auth_cache) >= AUTH_CACHE_MAX_USERS:
+            _auth_cache.clear()
+        _auth_cache[user.id] = (time.monotonic() + AUTH_CACHE_TTL_SECONDS, user.token_version or 0, user.role)
+
+
+def invalidate_user_auth(user_id: str) -> None:
+    with _auth_cache_lock:
+        _auth_cache.pop(user_id, None)
+
+
+def revoke_user_tokens(db: Session, user: User) -> None:
+    # 기존에 발급된 토큰을 모두 무효화한다. 다른 워커는 캐시 TTL이 지나면 반영된다.
+    user.token_version = (user.token_version or 0) + 1
+    db.commit()
+    invalidate_user_auth(user.id)
+
+
+def _verify_token(authorization: str | None) -> tuple[str, str, UserRole, int]:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
     token = authorization.split(" ", 1)[1]
@@ -82,23 +195,93 @@ def get_current_user(
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
+    try:
+        token_role = UserRole(payload.get("role"))
+    except ValueError as exc:
+        raise HTTPException(status_code=401, detail="Invalid token payload") from exc
+    return user_id, payload.get("username", ""), token_role, payload.get("ver", 0)
 
-    user = db.get(User, user_id)
+
+def _user_from_cached_claims(claims: tuple[str, str, UserRole, int]) -> User | None:
+    if AUTH_MODE != "claims":
+        return None
+    user_id, username, token_role, token_version = claims
+    cached = _cached_user_state(user_id)
+    if cached is None:
+        return None
+    if cached != (token_version, token_role):
+        # 다른 워커에서 버전/역할이 바뀌었을 수 있다. 캐시로 거절하지 않고 users 행으로 확인한다.
+        return None
+    return User(id=user_id, username=username, role=token_role, token_version=token_version)
+
+
+def _accept_loaded_user(user: User | None, claims: tuple[str, str, UserRole, int]) -> User:
+    user_id, _username, token_role, token_version = claims
     if not user:
+        invalidate_user_auth(user_id)
         raise HTTPException(status_code=401, detail="User not found")
+    if (user.token_version or 0) != token_version or user.role != token_role:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    if AUTH_MODE == "claims":
+        _cache_user_state(user)
     return user
 
 
+def _authenticate(authorization: str | None, db: Session) -> User:
+    claims = _verify_token(authorization)
+    return _user_from_cached_claims(claims) or _accept_loaded_user(db.get(User, claims[0]), claims)
+
+
+def get_current_user(
+    authorization: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+) -> User:
+    return _authenticate(authorization, db)
+
+
+async def get_read_db() -> AsyncIterator[ReadSession]:
+    # DB_ASYNC=true면 AsyncSession, 아니면 동기 세션을 스레드풀에서 사용한다.
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield ReadSession(session)
+        return
+    session = SessionLocal()
+    try:
+        yield ReadSession(session)
+    finally:
+        await run_in_threadpool(session.close)
+
+
+async def get_current_user_async(
+    authorization: str | None = Header(default=None),
+    db: ReadSession = Depends(get_read_db),
+) -> User:
+    claims = _verify_token(authorization)
+    return _user_from_cached_claims(claims) or _accept_loaded_user(await db.get(User, claims[0]), claims)
+
+
+def get_current_user_released(authorization: str | None = Header(default=None)) -> User:
+    # LLM을 오래 기다리는 경로용: 인증 조회가 끝나면 세션을 닫아 커넥션을 즉시 풀에 돌려준다.
+    with SessionLocal() as db:
+        return _authenticate(authorization, db)
+
+
+def generation_rate_limited(current_user: User = Depends(get_current_user_released)) -> User:
+    generation_admission.check_rate(current_user.id)
+    return current_user
+
+
+def image_job_rate_limited(current_user: User = Depends(get_current_user)) -> User:
+    image_job_admission.check_rate(current_user.id)
+    return current_user
+
+
 def require_admin(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin role required")
     return current_user
 
 
-with SessionLocal() as startup_db:
-    ensure_admin_user(startup_db)
-
-
 @app.post("/api/auth/login")
 def login(payload: LoginRequest, db: Session = Depends(get_db)) -> dict[str, str]:
     ensure_admin_user(db)
@@ -126,7 +309,7 @@ def signup(payload: SignupRequest, db: Session = Depends(get_db)) -> dict[str, s
 
 
 @app.get("/api/auth/me")
-def auth_me(current_user: User = Depends(get_current_user)) -> dict[str, str]:
+async def auth_me(current_user: User = Depends(get_current_user_async)) -> dict[str, str]:
     return {"id": current_user.id, "username": current_user.username, "role": current_user.role.value}
 
 
@@ -135,6 +318,84 @@ def admin_page_info(current_user: User = Depends(require_admin)) -> dict[str, st
     return {"title": "관리자 페이지", "message": "추가 기능은 이후 확장 예정입니다."}
 
 
+@app.put("/api/admin/users/{user_id}/role")
+def admin_update_user_role(
+    user_id: str,
+    payload: UserRoleUpdate,
+    db: Session = Depends(get_db),
+    _current_user: User = Depends(require_admin),
+) -> dict[str, str]:
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.role = payload.role
+    revoke_user_tokens(db, user)
+    return {"id": user.id, "username": user.username, "role": user.role.value}
+
+
+@app.get("/api/admin/draft-cache")
+def admin_draft_cache_stats(current_user: User = Depends(require_admin)) -> dict[str, int]:
+    return draft_cache.stats()
+
+
+@app.get("/api/admin/llm-routing")
+def admin_llm_routing(_current_user: User = Depends(require_admin)) -> dict[str, object]:
+    return llm_router.describe()
+
+
+@app.put("/api/admin/llm-routing")
+def admin_update_llm_routing(
+    payload: LLMRoutingUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+) -> dict[str, object]:
+    # 신규 요청부터 적용된다. 다른 워커에는 LLM_ROUTING_REFRESH_SECONDS 안에 반영된다.
+    llm_router.invalidate()
+    routes = llm_router.routes()
+    for model_type, model_routes in payload.routes.items():
+        routes[model_type] = [Route(route.provider, route.model) for route in model_routes]
+    save_routing(db, routes, created_by=current_user.id)
+    return llm_router.describe()
+
+
+@app.delete("/api/admin/llm-routing")
+def admin_reset_llm_routing(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+) -> dict[str, object]:
+    save_routing(db, None, created_by=current_user.id)
+    return llm_router.describe()
+
+
+@app.get("/api/admin/llm-routing/history")
+def admin_llm_routing_history(
+    db: Session = Depends(get_db),
+    _current_user: User = Depends(require_admin),
+) -> list[dict[str, object]]:
+    return [
+        {
+            "version": config.id,
+            "routes": json.loads(config.routes) if config.routes else None,
+            "created_by": config.created_by,
+            "created_at": config.created_at.isoformat(),
+        }
+        for config in routing_history(db)
+    ]
+
+
+@app.post("/api/admin/llm-routing/{version}/restore")
+def admin_restore_llm_routing(
+    version: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin),
+) -> dict[str, object]:
+    config = db.get(LLMRoutingConfig, version)
+    if not config:
+        raise HTTPException(status_code=404, detail="Routing version not found")
+    save_routing(db, parse_routes(config.routes) if config.routes else None, created_by=current_user.id)
+    return llm_router.describe()
+
+
 @app.post("/api/personas")
 def create_persona(
     payload: PersonaCreate,
@@ -154,12 +415,12 @@ def create_persona(
 
 
 @app.get("/api/personas")
-def list_personas(
+async def list_personas(
     account_id: str,
-    db: Session = Depends(get_db),
-    _current_user: User = Depends(get_current_user),
+    db: ReadSession = Depends(get_read_db),
+    _current_user: User = Depends(get_current_user_async),
 ) -> list[dict[str, str]]:
-    personas = db.query(Persona).filter(Persona.account_id == account_id).all()
+    personas = await db.scalars(select(Persona).where(Persona.account_id == account_id))
     return [{"id": p.id, "name": p.name, "tone": p.tone} for p in personas]
 
 
@@ -176,14 +437,48 @@ def create_diary(
     return {"id": diary.id, "title": diary.title}
 
 
+def _encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+def _keyset_statement(
+    statement: Select, model: type[Diary] | type[Entry], cursor: str | None, limit: int
+) -> Select:
+    # (created_at, id) 내림차순 keyset 페이지네이션. 복합 인덱스를 그대로 타므로 N번째 페이지도 첫 페이지와 비용이 같다.
+    if cursor:
+        created_at, row_id = _decode_cursor(cursor)
+        statement = statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    # 다음 페이지 존재 여부를 알기 위해 하나 더 읽는다.
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def _keyset_result(rows: list, limit: int) -> tuple[list, str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
 @app.get("/api/diaries")
-def list_diaries(
+async def list_diaries(
     account_id: str,
-    db: Session = Depends(get_db),
-    _current_user: User = Depends(get_current_user),
-) -> list[dict[str, str]]:
-    diaries = db.query(Diary).filter(Diary.account_id == account_id).order_by(Diary.created_at.desc()).all()
-    return [{"id": d.id, "title": d.title} for d in diaries]
+    cursor: str | None = None,
+    limit: int = Query(default=PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    db: ReadSession = Depends(get_read_db),
+    _current_user: User = Depends(get_current_user_async),
+) -> dict[str, object]:
+    statement = _keyset_statement(select(Diary).where(Diary.account_id == account_id), Diary, cursor, limit)
+    diaries, next_cursor = _keyset_result(await db.scalars(statement), limit)
+    return {"items": [{"id": d.id, "title": d.title} for d in diaries], "next_cursor": next_cursor}
 
 
 @app.post("/api/diaries/{diary_id}/personas/{persona_id}")
@@ -208,27 +503,39 @@ def link_persona(
     return {"status": "linked"}
 
 
-@app.post("/api/entries/generate")
-def generate_entry(
-    payload: EntryGenerateRequest,
-    db: Session = Depends(get_db),
-    _current_user: User = Depends(get_current_user),
-) -> dict[str, str]:
-    if not payload.input_keywords and not payload.input_text:
-        raise HTTPException(status_code=400, detail="input_keywords or input_text is required")
-
+def _load_generation_targets(db: Session, payload: EntryGenerateRequest) -> tuple[Persona, Diary]:
     persona = db.get(Persona, payload.persona_id)
     diary = db.get(Diary, payload.diary_id)
     if not persona or not diary:
         raise HTTPException(status_code=404, detail="Diary or persona not found")
+    return persona, diary
+
 
+def _recall_memories(db: Session, account_id: str, source: str) -> list[str]:
+    if LLM_GROUNDING_ENTRIES <= 0:
+        return []
+    # numpy 색인은 참고 기능을 켠 경우에만 불러온다.
+    from app.similar import similar_drafts
+
+    return similar_drafts(db, account_id, text=source, limit=LLM_GROUNDING_ENTRIES, min_score=LLM_GROUNDING_MIN_SCORE)
+
+
+def _prepare_generation(db: Session, payload: EntryGenerateRequest) -> tuple[str, str, list[str], str, str | None]:
+    persona, diary = _load_generation_targets(db, payload)
     source = payload.input_text or payload.input_keywords or ""
+    memories = _recall_memories(db, diary.account_id, source)
+    cache_key = draft_cache_key(
+        source=source,
+        tone=persona.tone,
+        model=current_model_name(),
+        prompt_version=PROMPT_VERSION,
+        scope=diary.account_id if memories else "",
+    )
+    cached_draft = None if payload.regenerate else draft_cache.get(db, cache_key)
+    return persona.tone, source, memories, cache_key, cached_draft
 
-    try:
-        draft = generate_diary_draft(tone=persona.tone, source=source)
-    except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=502, detail=f"LLM generation failed: {exc}") from exc
 
+def _insert_draft_entry(db: Session, payload: EntryGenerateRequest, draft: str) -> Entry:
     entry = Entry(
         diary_id=payload.diary_id,
         persona_id=payload.persona_id,
@@ -238,9 +545,196 @@ def generate_entry(
         status=EntryStatus.DRAFT,
     )
     db.add(entry)
+    db.flush()
+    account_id = db.scalar(select(Diary.account_id).where(Diary.id == entry.diary_id))
+    index_entry(db, entry, account_id=account_id)
+    record_entry_created(db, account_id, entry)
     db.commit()
     db.refresh(entry)
-    return {"id": entry.id, "draft": entry.draft, "status": entry.status.value}
+    return entry
+
+
+def _find_reusable_draft_entry(db: Session, payload: EntryGenerateRequest, draft: str) -> Entry | None:
+    return (
+        db.query(Entry)
+        .filter(
+            Entry.diary_id == payload.diary_id,
+            Entry.persona_id == payload.persona_id,
+            Entry.input_keywords == payload.input_keywords,
+            Entry.input_text == payload.input_text,
+            Entry.draft == draft,
+            Entry.status == EntryStatus.DRAFT,
+        )
+        .first()
+    )
+
+
+def _store_generated_draft(
+    db: Session,
+    payload: EntryGenerateRequest,
+    *,
+    tone: str,
+    source: str,
+    cache_key: str,
+    draft: str,
+    from_cache: bool,
+) -> Entry:
+    if from_cache:
+        # 캐시 적중 시 같은 입력의 미저장 초안이 있으면 새 DRAFT 행을 만들지 않는다.
+        reusable = _find_reusable_draft_entry(db, payload, draft)
+        if reusable:
+            return reusable
+    elif not is_fallback_draft(draft, tone=tone, source=source):
+        draft_cache.set(db, cache_key, draft)
+    return _insert_draft_entry(db, payload, draft)
+
+
+def _read_generation_inputs(payload: EntryGenerateRequest) -> tuple[str, str, list[str], str, str | None]:
+    with SessionLocal() as db:
+        return _prepare_generation(db, payload)
+
+
+def _write_generated_draft(
+    payload: EntryGenerateRequest,
+    *,
+    tone: str,
+    source: str,
+    cache_key: str,
+    draft: str,
+    from_cache: bool,
+) -> dict[str, str]:
+    with SessionLocal() as db:
+        entry = _store_generated_draft(
+            db,
+            payload,
+            tone=tone,
+            source=source,
+            cache_key=cache_key,
+            draft=draft,
+            from_cache=from_cache,
+        )
+        return {"id": entry.id, "draft": entry.draft, "status": entry.status.value}
+
+
+async def _generate_draft_entry(payload: EntryGenerateRequest) -> dict[str, str]:
+    # 1) 짧은 읽기 트랜잭션 2) 커넥션 없이 LLM 호출 3) 짧은 쓰기 트랜잭션.
+    # LLM 대기 중에는 풀 커넥션을 잡고 있지 않으므로 느린 생성이 다른 엔드포인트의 커넥션을 고갈시키지 않는다.
+    tone, source, memories, cache_key, cached_draft = await run_in_threadpool(_read_generation_inputs, payload)
+
+    if cached_draft is not None:
+        draft = cached_draft
+    else:
+        # 캐시 적중은 슬롯을 쓰지 않는다. 슬롯이 없으면 짧게 대기하다 429로 빠르게 실패한다.
+        async with generation_admission.slot():
+            try:
+                draft = await agenerate_diary_draft(tone=tone, source=source, memories=memories)
+            except Exception as exc:  # noqa: BLE001
+                raise HTTPException(status_code=502, detail=f"LLM generation failed: {exc}") from exc
+
+    return await run_in_threadpool(
+        lambda: _write_generated_draft(
+            payload,
+            tone=tone,
+            source=source,
+            cache_key=cache_key,
+            draft=draft,
+            from_cache=cached_draft is not None,
+        )
+    )
+
+
+@app.post("/api/entries/generate")
+async def generate_entry(
+    payload: EntryGenerateRequest,
+    _current_user: User = Depends(generation_rate_limited),
+) -> dict[str, str]:
+    if not payload.input_keywords and not payload.input_text:
+        raise HTTPException(status_code=400, detail="input_keywords or input_text is required")
+
+    # 더블클릭/재시도/여러 탭에서 온 동일 요청은 하나의 업스트림 호출과 하나의 DRAFT 행을 공유한다.
+    flight_key = (
+        payload.diary_id,
+        payload.persona_id,
+        payload.input_keywords,
+        payload.input_text,
+        payload.regenerate,
+    )
+    try:
+        return await generation_flights.do(
+            flight_key,
+            lambda: _generate_draft_entry(payload),
+            timeout=GENERATE_TIMEOUT_SECONDS,
+        )
+    except TimeoutError as exc:
+        raise HTTPException(status_code=504, detail="LLM generation timed out") from exc
+
+
+def _sse_event(event: str, data: dict[str, str]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/entries/generate/stream")
+async def generate_entry_stream(
+    payload: EntryGenerateRequest,
+    _current_user: User = Depends(generation_rate_limited),
+) -> StreamingResponse:
+    if not payload.input_keywords and not payload.input_text:
+        raise HTTPException(status_code=400, detail="input_keywords or input_text is required")
+
+    tone, source, memories, cache_key, cached_draft = await run_in_threadpool(_read_generation_inputs, payload)
+
+    # 429는 스트림 시작 전에만 보낼 수 있으므로 슬롯을 먼저 잡고, 스트림이 끝나거나 끊기면 돌려준다.
+    slot = AsyncExitStack()
+    if cached_draft is None:
+        await slot.enter_async_context(generation_admission.slot())
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            streamed: list[str] = []
+            draft = ""
+            if cached_draft is not None:
+                draft = cached_draft
+                streamed.append(cached_draft)
+                yield _sse_event("token", {"text": cached_draft})
+            else:
+                try:
+                    async for kind, text in astream_diary_draft(tone=tone, source=source, memories=memories):
+                        if kind == "token":
+                            streamed.append(text)
+                            yield _sse_event("token", {"text": text})
+                        else:
+                            draft = text
+                except Exception as exc:  # noqa: BLE001
+                    yield _sse_event("error", {"detail": f"LLM generation failed: {exc}"})
+                    return
+                await slot.aclose()
+
+            # 스트리밍된 토큰과 최종 초안이 다르면(업스트림 실패 폴백) 클라이언트가 본문을 교체한다.
+            if draft != "".join(streamed).strip():
+                yield _sse_event("fallback", {"draft": draft})
+
+            # 스트림이 끝난 뒤 한 번만 저장한다.
+            saved = await run_in_threadpool(
+                lambda: _write_generated_draft(
+                    payload,
+                    tone=tone,
+                    source=source,
+                    cache_key=cache_key,
+                    draft=draft,
+                    from_cache=cached_draft is not None,
+                )
+            )
+            yield _sse_event("done", saved)
+        finally:
+            await slot.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # 스트림이 시작되기 전에 클라이언트가 끊은 경우에도 슬롯을 돌려준다(두 번 닫아도 안전).
+        background=BackgroundTask(slot.aclose),
+    )
 
 
 @app.post("/api/entries/{entry_id}/save")
@@ -254,28 +748,304 @@ def save_entry(
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
 
+    account_id = entry.diary.account_id
+    if entry.status != EntryStatus.SAVED:
+        record_entry_saved(db, account_id, entry)
     entry.draft = payload.draft
     entry.status = EntryStatus.SAVED
+    index_entry(db, entry, account_id=account_id)
     db.commit()
+
+    from app.similar import index_saved_entry
+
+    # 커밋된 저장본만 유사도 색인에 반영한다(행 하나 추가/덮어쓰기).
+    index_saved_entry(account_id, entry)
     return {"id": entry.id, "status": entry.status.value}
 
 
 @app.get("/api/diaries/{diary_id}/entries")
-def list_entries(
+async def list_entries(
     diary_id: str,
+    cursor: str | None = None,
+    limit: int = Query(default=PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    db: ReadSession = Depends(get_read_db),
+    _current_user: User = Depends(get_current_user_async),
+) -> dict[str, object]:
+    statement = _keyset_statement(select(Entry).where(Entry.diary_id == diary_id), Entry, cursor, limit)
+    entries, next_cursor = _keyset_result(await db.scalars(statement), limit)
+    return {
+        "items": [
+            {
+                "id": e.id,
+                "draft": e.draft,
+                "status": e.status.value,
+                "created_at": e.created_at.isoformat(),
+            }
+            for e in entries
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/api/search/entries")
+async def search_entries(
+    account_id: str,
+    q: str = Query(min_length=1, max_length=200),
+    cursor: str | None = None,
+    limit: int = Query(default=PAGE_LIMIT_DEFAULT, ge=1, le=PAGE_LIMIT_MAX),
+    db: ReadSession = Depends(get_read_db),
+    _current_user: User = Depends(get_current_user_async),
+) -> dict[str, object]:
+    # 색인(GIN/FTS5)으로 후보를 좁힌 뒤 최신순 keyset 페이지로 돌려준다.
+    statement = search_statement(account_id, q)
+    if statement is None:
+        raise HTTPException(status_code=400, detail="Search query has no searchable terms")
+    entries, next_cursor = _keyset_result(await db.scalars(_keyset_statement(statement, Entry, cursor, limit)), limit)
+    return {
+        "items": [
+            {
+                "id": e.id,
+                "diary_id": e.diary_id,
+                "draft": e.draft,
+                "status": e.status.value,
+                "created_at": e.created_at.isoformat(),
+            }
+            for e in entries
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/api/stats/activity")
+async def activity_stats(
+    account_id: str,
+    days: int = Query(default=365, ge=1, le=3660),
+    db: ReadSession = Depends(get_read_db),
+    _current_user: User = Depends(get_current_user_async),
+) -> dict[str, object]:
+    # 항목이 아니라 일별 집계(account_daily_activity)만 읽는다.
+    rows = await db.scalars(activity_statement(account_id))
+    return summarize_activity(rows, today=activity_today(), days=days)
+
+
+@app.get("/api/search/similar")
+async def similar_entries(
+    account_id: str,
+    entry_id: str | None = None,
+    text: str | None = Query(default=None, min_length=1, max_length=2000),
+    limit: int = Query(default=5, ge=1, le=20),
+    db: ReadSession = Depends(get_read_db),
+    _current_user: User = Depends(get_current_user_async),
+) -> dict[str, object]:
+    # 저장된 지난 일기 중 entry_id(또는 text)와 비슷한 항목. 코사인 유사도 내림차순.
+    from app.similar import similar_entry_ids
+
+    if (entry_id is None) == (text is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of entry_id or text")
+    if entry_id is not None:
+        entry = await db.get(Entry, entry_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Entry not found")
+        text = entry.draft
+
+    matches = await run_in_threadpool(
+        lambda: similar_entry_ids(account_id, text=text, entry_id=entry_id, limit=limit)
+    )
+    entries = {
+        e.id: e for e in await db.scalars(select(Entry).where(Entry.id.in_([match_id for match_id, _ in matches])))
+    }
+    return {
+        "items": [
+            {
+                "id": entries[match_id].id,
+                "diary_id": entries[match_id].diary_id,
+                "draft": entries[match_id].draft,
+                "created_at": entries[match_id].created_at.isoformat(),
+                "score": round(score, 4),
+            }
+            for match_id, score in matches
+            if match_id in entries
+        ]
+    }
+
+
+@app.get("/api/export")
+def export_account(
+    account_id: str,
+    format: str = Query(default="ndjson", pattern=r"^(ndjson|zip)$"),
+    _current_user: User = Depends(get_current_user_released),
+) -> StreamingResponse:
+    # 인증 세션은 바로 돌려주고, 본문 생성기가 자체 세션으로 배치 단위로 읽는다.
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+    if format == "zip":
+        body, media_type, filename = iter_zip_export(SessionLocal, account_id), "application/zip", f"echodiary-{stamp}.zip"
+    else:
+        body, media_type, filename = (
+            iter_ndjson_export(SessionLocal, account_id),
+            "application/x-ndjson",
+            f"echodiary-{stamp}.ndjson",
+        )
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _request_lines(request: Request) -> Iterator[str]:
+    # 워커 스레드에서 요청 본문을 청크 단위로 받아 줄(줄바꿈 포함)로 돌려준다. 본문 전체를 메모리에 올리지 않는다.
+    chunks = request.stream().__aiter__()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    while True:
+        try:
+            chunk = from_thread.run(chunks.__anext__)
+        except StopAsyncIteration:
+            break
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        yield from (line + "\n" for line in lines)
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+@app.post("/api/import")
+async def import_account(
+    request: Request,
+    account_id: str,
+    format: str = Query(default="ndjson", pattern=r"^(ndjson|csv)$"),
+    diary_id: str | None = None,
+    persona_id: str | None = None,
+    _current_user: User = Depends(get_current_user_released),
+) -> dict[str, object]:
+    # NDJSON(내보내기 형식 또는 항목만) 또는 CSV(항목만)를 IMPORT_BATCH_SIZE 행씩 다중 행 INSERT로 넣는다.
+    # diary_id/persona_id는 항목 행에 값이 없을 때 쓰는 기본값이다. 실패한 행은 줄 번호와 함께 돌려준다.
+    importer = AccountImporter(SessionLocal, account_id, diary_id=diary_id, persona_id=persona_id)
+    return await run_in_threadpool(lambda: import_lines(importer, _request_lines(request), format))
+
+
+def _image_job_response(job: ImageJob) -> dict[str, object]:
+    return {
+        "id": job.id,
+        "kind": job.kind.value,
+        "target_id": job.target_id,
+        "status": job.status.value,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "image_ref": job.image_ref,
+        "last_error": job.last_error,
+    }
+
+
+@app.post("/api/images/jobs", status_code=202)
+def create_image_job(
+    payload: ImageJobCreate,
+    db: Session = Depends(get_db),
+    _current_user: User = Depends(image_job_rate_limited),
+) -> dict[str, object]:
+    job = enqueue_image_job(db, kind=payload.kind, target_id=payload.target_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job target not found")
+    image_job_runner.wake()
+    return _image_job_response(job)
+
+
+@app.get("/api/images/jobs/{job_id}")
+def get_image_job(
+    job_id: str,
     db: Session = Depends(get_db),
     _current_user: User = Depends(get_current_user),
-) -> list[dict[str, str]]:
-    entries = db.query(Entry).filter(Entry.diary_id == diary_id).order_by(Entry.created_at.desc()).all()
-    return [
-        {
-            "id": e.id,
-            "draft": e.draft,
-            "status": e.status.value,
-            "created_at": e.created_at.isoformat(),
-        }
-        for e in entries
-    ]
+) -> dict[str, object]:
+    job = db.get(ImageJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return _image_job_response(job)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    # 단일 "bytes=" 범위만 지원한다. 해석할 수 없거나 다중 범위면 None(전체 응답)을 돌려주고,
+    # 만족할 수 없는 범위면 ValueError를 던진다.
+    unit, _, spec = header.partition("=")
+    start_text, sep, end_text = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or "," in spec or not sep:
+        return None
+    if not all(part == "" or part.isdigit() for part in (start_text, end_text)) or not (start_text or end_text):
+        return None
+
+    if not start_text:
+        suffix = int(end_text)
+        if suffix == 0 or size == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - suffix, 0), size - 1
+
+    start = int(start_text)
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+@app.get("/api/images/files/{image_ref:path}")
+async def stream_image(
+    image_ref: str,
+    size: int | None = Query(default=None, ge=1),
+    range_header: str | None = Header(default=None, alias="Range"),
+    if_range: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+    if_modified_since: str | None = Header(default=None),
+    _current_user: User = Depends(get_current_user_released),
+) -> Response:
+    info = await run_in_threadpool(lambda: stat_image_in_minio(image_ref=image_ref, size=size))
+    if info is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    size = info["size"]
+    etag = f'"{info["etag"]}"'
+    last_modified = info["last_modified"]
+    headers = {"ETag": etag, "Cache-Control": IMAGE_PROXY_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(UTC), usegmt=True)
+
+    # 조건부 요청은 객체 본문을 내려받지 않고 stat 결과만으로 304를 응답한다.
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since and last_modified is not None:
+        try:
+            if last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    byte_range = None
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        body = iter_image_from_minio(image_ref=info["object_name"])
+        return StreamingResponse(
+            body,
+            media_type=info["content_type"],
+            headers={**headers, "Content-Length": str(size)},
+        )
+
+    start, end = byte_range
+    body = iter_image_from_minio(image_ref=info["object_name"], offset=start, length=end - start + 1)
+    return StreamingResponse(
+        body,
+        status_code=206,
+        media_type=info["content_type"],
+        headers={**headers, "Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"},
+    )
 
 
 Instrumentator().instrument(app).expose(app)
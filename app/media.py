@@ -1,19 +1,76 @@
 import base64
 import io
 import logging
+import multiprocessing
 import os
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 from datetime import UTC, datetime, timedelta
 from urllib.request import urlopen
 from urllib.parse import urlparse, urlunparse
 from uuid import uuid4
 
+import certifi
+import urllib3
 from minio import Minio
-from openai import OpenAI
+from PIL import Image
+from prometheus_client import Counter, Histogram
+
+from app.cache import LRUCache
+from app.llm import error_reason, record_token_usage
+from app.models import ModelType
+from app.providers import Route, llm_router, route_credentials
 
 logger = logging.getLogger(__name__)
 
 
-def _get_minio_client() -> tuple[Minio, str, bool] | tuple[None, str, bool]:
+MinioConfig = tuple[str, str, str, str, bool]
+
+MINIO_POOL_MAXSIZE = int(os.getenv("MINIO_POOL_MAXSIZE", "32"))
+MINIO_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MINIO_CONNECT_TIMEOUT_SECONDS", "5"))
+MINIO_READ_TIMEOUT_SECONDS = float(os.getenv("MINIO_READ_TIMEOUT_SECONDS", "60"))
+
+# 프로세스 전역 MinIO 클라이언트. 환경변수 설정이 바뀌면 새로 만든다.
+_minio_lock = threading.Lock()
+_minio_client: tuple[MinioConfig, Minio, urllib3.PoolManager] | None = None
+_ready_buckets: set[tuple[MinioConfig, str]] = set()
+
+PRESIGNED_URL_SAFETY_MARGIN_SECONDS = int(os.getenv("PRESIGNED_URL_SAFETY_MARGIN_SECONDS", "60"))
+_presigned_url_cache = LRUCache(
+    max_bytes=int(os.getenv("PRESIGNED_URL_CACHE_MAX_BYTES", str(4 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("PRESIGNED_URL_CACHE_TTL_SECONDS", "86400")),
+)
+_clock = time.time
+
+IMAGE_REQUEST_SECONDS = Histogram(
+    "echodiary_image_request_seconds",
+    "Upstream image generation latency.",
+    ["model", "outcome"],
+    buckets=(1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90),
+)
+IMAGE_ERRORS = Counter(
+    "echodiary_image_errors_total",
+    "Failed image generations.",
+    ["model", "reason"],
+)
+
+IMAGE_STREAM_CHUNK_BYTES = int(os.getenv("IMAGE_STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+# 업로드 시 원본 옆에 "<원본>@<size>.<format>" 이름으로 긴 변 기준 축소본을 함께 저장한다.
+IMAGE_VARIANT_SIZES = sorted(int(v) for v in os.getenv("IMAGE_VARIANT_SIZES", "256,768").split(",") if v.strip())
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp").lower()
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+# 0이면 프로세스 풀 없이 호출 스레드에서 바로 변환한다.
+IMAGE_VARIANT_PROCESSES = int(os.getenv("IMAGE_VARIANT_PROCESSES", "2"))
+_VARIANT_CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+_variant_pool: ProcessPoolExecutor | None = None
+_variant_pool_lock = threading.Lock()
+
+
+def _minio_config() -> tuple[MinioConfig | None, str, bool]:
     endpoint = os.getenv("MINIO_ENDPOINT")
     access_key = os.getenv("MINIO_ACCESS_KEY")
     secret_key = os.getenv("MINIO_SECRET_KEY")
@@ -22,29 +79,192 @@ def _get_minio_client() -> tuple[Minio, str, bool] | tuple[None, str, bool]:
 
     if not endpoint or not access_key or not secret_key:
         return None, bucket, secure
+    return (endpoint, access_key, secret_key, bucket, secure), bucket, secure
 
-    client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
-    return client, bucket, secure
 
+def _build_http_client() -> urllib3.PoolManager:
+    return urllib3.PoolManager(
+        maxsize=MINIO_POOL_MAXSIZE,
+        timeout=urllib3.Timeout(connect=MINIO_CONNECT_TIMEOUT_SECONDS, read=MINIO_READ_TIMEOUT_SECONDS),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.getenv("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
 
-def generate_diary_image_png_bytes(*, diary_text: str) -> bytes | None:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or os.getenv("ECHODIARY_DISABLE_LLM") == "true":
-        return None
 
-    client = OpenAI(api_key=api_key)
+def _get_minio_client() -> tuple[Minio, str, bool] | tuple[None, str, bool]:
+    global _minio_client
+
+    config, bucket, secure = _minio_config()
+    if config is None:
+        return None, bucket, secure
+
+    with _minio_lock:
+        if _minio_client is None or _minio_client[0] != config:
+            if _minio_client is not None:
+                _minio_client[2].clear()
+            endpoint, access_key, secret_key, _bucket, _secure = config
+            http_client = _build_http_client()
+            client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure, http_client=http_client)
+            _minio_client = (config, client, http_client)
+        return _minio_client[1], bucket, secure
+
+
+def _ensure_bucket(client: Minio, bucket: str) -> None:
+    config, _bucket, _secure = _minio_config()
+    key = (config, bucket)
+    if key in _ready_buckets:
+        return
+    if not client.bucket_exists(bucket):
+        client.make_bucket(bucket)
+    _ready_buckets.add(key)
+
+
+def bootstrap_minio() -> bool:
+    # 앱 시작 시 한 번 호출한다. 실패하면 첫 업로드 때 다시 시도한다.
+    client, bucket, _secure = _get_minio_client()
+    if client is None:
+        return False
     try:
-        response = client.images.generate(
-            model=os.getenv("OPENAI_IMAGE_MODEL", "gpt-image-1"),
-            prompt=(
-                "다음 한국어 일기 내용을 기반으로, 따뜻하고 일상적인 분위기의 장면 1개를 묘사한 이미지 생성:\n"
-                f"{diary_text}\n"
-                "요구: 인물 식별이 가능한 실존 인물 스타일 금지, 안전하고 일반적인 일상 장면, 텍스트 오버레이 없음"
-            ),
-            # 2026-02 기준 OpenAI Images API 지원값: 1024x1024 | 1024x1536 | 1536x1024 | auto
-            size=os.getenv("OPENAI_IMAGE_SIZE", "1024x1024"),
+        _ensure_bucket(client, bucket)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("MinIO bucket bootstrap failed: %s", exc)
+        return False
+    return True
+
+
+def variant_object_name(object_name: str, size: int, fmt: str = IMAGE_VARIANT_FORMAT) -> str:
+    stem, _dot, _ext = object_name.rpartition(".")
+    return f"{stem or object_name}@{size}.{fmt}"
+
+
+def _resolve_object_name(object_name: str, size: int | None) -> str:
+    # 요청 크기 이상인 가장 작은 변환본을 고르고, 없으면 원본을 쓴다.
+    if size is None:
+        return object_name
+    for variant_size in IMAGE_VARIANT_SIZES:
+        if variant_size >= size:
+            return variant_object_name(object_name, variant_size)
+    return object_name
+
+
+def render_image_variants(image_bytes: bytes, sizes: list[int], fmt: str, quality: int) -> dict[int, bytes]:
+    # CPU 작업이므로 프로세스 풀에서 실행된다(모듈 최상위 함수여야 pickle 가능).
+    variants: dict[int, bytes] = {}
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source.load()
+        for size in sizes:
+            image = source.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, format=fmt.upper(), quality=quality)
+            variants[size] = buffer.getvalue()
+    return variants
+
+
+def _get_variant_pool() -> ProcessPoolExecutor:
+    global _variant_pool
+
+    with _variant_pool_lock:
+        if _variant_pool is None:
+            # 스레드가 여러 개 도는 uvicorn 워커에서 fork하면 다른 스레드가 잡고 있던 잠금째 복사되어 멈출 수 있다.
+            # 단일 스레드인 forkserver에서 자식을 만들고, 자식마다 import하지 않도록 이 모듈을 미리 올려 둔다.
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+            _variant_pool = ProcessPoolExecutor(max_workers=IMAGE_VARIANT_PROCESSES, mp_context=context)
+        return _variant_pool
+
+
+def shutdown_variant_pool() -> None:
+    global _variant_pool
+
+    with _variant_pool_lock:
+        if _variant_pool is not None:
+            _variant_pool.shutdown(wait=True)
+            _variant_pool = None
+
+
+def build_image_variants(image_bytes: bytes) -> dict[int, bytes]:
+    args = (image_bytes, IMAGE_VARIANT_SIZES, IMAGE_VARIANT_FORMAT, IMAGE_VARIANT_QUALITY)
+    if IMAGE_VARIANT_PROCESSES <= 0:
+        return render_image_variants(*args)
+    return _get_variant_pool().submit(render_image_variants, *args).result()
+
+
+def _upload_image_variants(client: Minio, bucket: str, object_name: str, image_bytes: bytes) -> None:
+    if not IMAGE_VARIANT_SIZES:
+        return
+    try:
+        variants = build_image_variants(image_bytes)
+    except Exception as exc:  # noqa: BLE001
+        # 변환본이 없어도 원본은 사용할 수 있으므로 업로드는 실패로 처리하지 않는다.
+        logger.warning("Image variant rendering failed for %s: %s", object_name, exc)
+        return
+    for size, data in variants.items():
+        client.put_object(
+            bucket,
+            variant_object_name(object_name, size),
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=_VARIANT_CONTENT_TYPES.get(IMAGE_VARIANT_FORMAT, "application/octet-stream"),
         )
+
+
+def generate_diary_image_png_bytes(*, diary_text: str) -> bytes | None:
+    # 라우터가 고른 순서로 이미지 공급자를 시도한다. 모두 실패하면 작업 러너가 백오프 후 재시도한다.
+    for route in llm_router.candidates(ModelType.IMAGE):
+        health = llm_router.health(ModelType.IMAGE, route)
+        if not health.breaker.allow():
+            IMAGE_ERRORS.labels(model=route.model, reason="circuit_open").inc()
+            continue
+        started = time.perf_counter()
+        try:
+            response = _request_image(route, diary_text)
+        except Exception as exc:  # noqa: BLE001
+            reason = error_reason(exc)
+            outcome = "timeout" if reason == "timeout" else "error"
+            elapsed = time.perf_counter() - started
+            health.record(success=False, duration=elapsed)
+            IMAGE_REQUEST_SECONDS.labels(model=route.model, outcome=outcome).observe(elapsed)
+            IMAGE_ERRORS.labels(model=route.model, reason=reason).inc()
+            logger.warning("Image generation failed on %s/%s: %s", route.provider.value, route.model, exc)
+            continue
+        except BaseException:
+            health.breaker.release()
+            raise
+        elapsed = time.perf_counter() - started
+        health.record(success=True, duration=elapsed)
+        IMAGE_REQUEST_SECONDS.labels(model=route.model, outcome="success").observe(elapsed)
+        usage = getattr(response, "usage", None)
+        record_token_usage(route.model, usage.model_dump() if usage is not None else None)
+        return _read_image_response(response, model=route.model)
+    return None
+
+
+def _request_image(route: Route, diary_text: str):
+    # openai SDK는 import 비용이 커서 실제 이미지 생성 시에만 불러온다.
+    from openai import OpenAI
+
+    api_key, base_url = route_credentials(route)
+    client = OpenAI(api_key=api_key, base_url=base_url)
+    return client.images.generate(
+        model=route.model,
+        prompt=(
+            "다음 한국어 일기 내용을 기반으로, 따뜻하고 일상적인 분위기의 장면 1개를 묘사한 이미지 생성:\n"
+            f"{diary_text}\n"
+            "요구: 인물 식별이 가능한 실존 인물 스타일 금지, 안전하고 일반적인 일상 장면, 텍스트 오버레이 없음"
+        ),
+        # 2026-02 기준 OpenAI Images API 지원값: 1024x1024 | 1024x1536 | 1536x1024 | auto
+        size=os.getenv("OPENAI_IMAGE_SIZE", "1024x1024"),
+    )
+
+
+def _read_image_response(response, *, model: str) -> bytes | None:
+    try:
         if not response.data:
+            IMAGE_ERRORS.labels(model=model, reason="empty").inc()
             return None
 
         first = response.data[0]
@@ -57,9 +277,11 @@ def generate_diary_image_png_bytes(*, diary_text: str) -> bytes | None:
             with urlopen(image_url, timeout=20) as res:
                 return res.read()
 
+        IMAGE_ERRORS.labels(model=model, reason="empty").inc()
         return None
     except Exception as exc:  # noqa: BLE001
-        logger.warning("Image generation failed: %s", exc)
+        IMAGE_ERRORS.labels(model=model, reason=error_reason(exc)).inc()
+        logger.warning("Image download failed: %s", exc)
         return None
 
 
@@ -68,9 +290,7 @@ def upload_image_to_minio(*, image_bytes: bytes, account_id: str) -> str | None:
     if client is None:
         return None
 
-    found = client.bucket_exists(bucket)
-    if not found:
-        client.make_bucket(bucket)
+    _ensure_bucket(client, bucket)
 
     date_prefix = datetime.now(UTC).strftime("%Y/%m/%d")
     object_name = f"diary-images/{account_id}/{date_prefix}/{uuid4()}.png"
@@ -81,6 +301,7 @@ def upload_image_to_minio(*, image_bytes: bytes, account_id: str) -> str | None:
         length=len(image_bytes),
         content_type="image/png",
     )
+    _upload_image_variants(client, bucket, object_name, image_bytes)
 
     # Store object path only. URL is issued per-request as presigned URL.
     return object_name
@@ -117,34 +338,112 @@ def _apply_public_base_url(url: str) -> str:
     )
 
 
-def create_presigned_image_url(*, image_ref: str, expires_seconds: int = 300) -> str | None:
+def _presign_window(expires_seconds: int) -> tuple[int, int]:
+    margin = min(PRESIGNED_URL_SAFETY_MARGIN_SECONDS, expires_seconds // 2)
+    window = max(expires_seconds - margin, 1)
+    bucket_start = int(_clock()) // window * window
+    return bucket_start, window
+
+
+def create_presigned_image_url(*, image_ref: str, expires_seconds: int = 300, size: int | None = None) -> str | None:
     client, bucket, _secure = _get_minio_client()
     if client is None or not image_ref:
         return None
 
-    object_name = _normalize_object_name(image_ref, bucket)
+    original = _normalize_object_name(image_ref, bucket)
+    # 서명 시각을 만료 구간 시작으로 맞춰, 같은 구간 안에서는 (워커가 달라도) 항상 같은 URL을 돌려준다.
+    # 구간 길이가 expires - margin 이므로 돌려준 URL은 최소 margin 초 이상 유효하다.
+    bucket_start, _window = _presign_window(expires_seconds)
+    endpoint = os.getenv("MINIO_ENDPOINT", "")
+    public_base = os.getenv("MINIO_PUBLIC_BASE_URL", "")
+    cache_key = f"{endpoint}|{public_base}|{bucket}|{original}|{size}|{expires_seconds}|{bucket_start}"
+    cached = _presigned_url_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    object_name = original
+    if _resolve_object_name(original, size) != original:
+        # 변환본이 없는 이미지(변환본 도입 전 업로드 등)는 원본을 서명한다. HEAD는 캐시가 빌 때만 보낸다.
+        info = stat_image_in_minio(image_ref=original, size=size)
+        object_name = str(info["object_name"]) if info else original
+
     try:
-        signed = client.presigned_get_object(bucket, object_name, expires=timedelta(seconds=expires_seconds))
-        return _apply_public_base_url(signed)
+        signed = client.presigned_get_object(
+            bucket,
+            object_name,
+            expires=timedelta(seconds=expires_seconds),
+            request_date=datetime.fromtimestamp(bucket_start, UTC),
+        )
     except Exception:  # noqa: BLE001
         return None
+    url = _apply_public_base_url(signed)
+    _presigned_url_cache.set(cache_key, url)
+    return url
 
 
-def get_image_from_minio(*, image_ref: str) -> tuple[bytes, str] | tuple[None, None]:
+def get_image_from_minio(*, image_ref: str, size: int | None = None) -> tuple[bytes, str] | tuple[None, None]:
     client, bucket, _secure = _get_minio_client()
     if client is None or not image_ref:
         return None, None
 
+    original = _normalize_object_name(image_ref, bucket)
+    # 변환본이 없으면 원본으로 한 번 더 시도한다.
+    for object_name in dict.fromkeys([_resolve_object_name(original, size), original]):
+        response = None
+        try:
+            response = client.get_object(bucket, object_name)
+            content_type = response.headers.get("Content-Type", "application/octet-stream")
+            data = response.read()
+            return data, content_type
+        except Exception:  # noqa: BLE001
+            continue
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+    return None, None
+
+
+def stat_image_in_minio(*, image_ref: str, size: int | None = None) -> dict[str, object] | None:
+    # 본문을 내려받지 않고 HEAD만으로 크기/ETag/Last-Modified를 얻는다.
+    # size 변환본이 없으면(이전에 업로드된 이미지 등) 원본 정보를 돌려준다.
+    client, bucket, _secure = _get_minio_client()
+    if client is None or not image_ref:
+        return None
+
+    original = _normalize_object_name(image_ref, bucket)
+    candidates = dict.fromkeys([_resolve_object_name(original, size), original])
+    for object_name in candidates:
+        try:
+            stat = client.stat_object(bucket, object_name)
+        except Exception:  # noqa: BLE001
+            continue
+        return {
+            "object_name": object_name,
+            "size": stat.size,
+            "etag": stat.etag,
+            "last_modified": stat.last_modified,
+            "content_type": stat.content_type or "application/octet-stream",
+        }
+    return None
+
+
+def iter_image_from_minio(
+    *,
+    image_ref: str,
+    offset: int = 0,
+    length: int = 0,
+    chunk_size: int = IMAGE_STREAM_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    # 객체 전체를 메모리에 올리지 않고 chunk_size 단위로 흘려보낸다. length=0이면 끝까지 읽는다.
+    client, bucket, _secure = _get_minio_client()
+    if client is None:
+        return
+
     object_name = _normalize_object_name(image_ref, bucket)
-    response = None
+    response = client.get_object(bucket, object_name, offset=offset, length=length)
     try:
-        response = client.get_object(bucket, object_name)
-        content_type = response.headers.get("Content-Type", "application/octet-stream")
-        data = response.read()
-        return data, content_type
-    except Exception:  # noqa: BLE001
-        return None, None
+        yield from response.stream(chunk_size)
     finally:
-        if response is not None:
-            response.close()
-            response.release_conn()
+        response.close()
+        response.release_conn()
@@ -1,10 +1,26 @@
 from __future__ import annotations
 
 import enum
-from datetime import UTC, datetime
+from datetime import UTC, date, datetime
 from uuid import uuid4
 
-from sqlalchemy import Boolean, CheckConstraint, DateTime, Enum, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    CheckConstraint,
+    Date,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    event,
+    text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -23,11 +39,34 @@ class EntryStatus(str, enum.Enum):
     SAVED = "saved"
 
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class ImageJobKind(str, enum.Enum):
+    PERSONA = "persona"
+    ENTRY = "entry"
+
+
 class UserRole(str, enum.Enum):
     USER = "user"
     ADMIN = "admin"
 
 
+class LLMProvider(str, enum.Enum):
+    OPENAI = "openai"
+    GEMINI = "gemini"
+
+
+class ModelType(str, enum.Enum):
+    TEXT_SMALL = "text-small"
+    TEXT_LARGE = "text-large"
+    IMAGE = "image"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -35,6 +74,8 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(100), unique=True, index=True)
     password: Mapped[str] = mapped_column(String(255))
     role: Mapped[UserRole] = mapped_column(Enum(UserRole), default=UserRole.USER)
+    # 역할 변경/강제 로그아웃 시 증가시켜 이전에 발급된 토큰을 무효화한다.
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
 
 
@@ -55,9 +96,10 @@ class Persona(Base):
 
 class Diary(Base):
     __tablename__ = "diaries"
+    __table_args__ = (Index("ix_diaries_account_created_id", "account_id", "created_at", "id"),)
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
-    account_id: Mapped[str] = mapped_column(String(36), index=True)
+    account_id: Mapped[str] = mapped_column(String(36))
     title: Mapped[str] = mapped_column(String(120))
     default_persona_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("personas.id"), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
@@ -83,15 +125,119 @@ class Entry(Base):
     __tablename__ = "entries"
     __table_args__ = (
         CheckConstraint("input_keywords IS NOT NULL OR input_text IS NOT NULL", name="ck_entry_input_required"),
+        Index("ix_entries_diary_created_id", "diary_id", "created_at", "id"),
     )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
-    diary_id: Mapped[str] = mapped_column(String(36), ForeignKey("diaries.id", ondelete="CASCADE"), index=True)
+    diary_id: Mapped[str] = mapped_column(String(36), ForeignKey("diaries.id", ondelete="CASCADE"))
     persona_id: Mapped[str] = mapped_column(String(36), ForeignKey("personas.id"), index=True)
     input_keywords: Mapped[str | None] = mapped_column(Text, nullable=True)
     input_text: Mapped[str | None] = mapped_column(Text, nullable=True)
     draft: Mapped[str] = mapped_column(Text)
     status: Mapped[EntryStatus] = mapped_column(Enum(EntryStatus), default=EntryStatus.DRAFT)
+    image_url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    image_status: Mapped[ImageStatus | None] = mapped_column(Enum(ImageStatus), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
 
     diary: Mapped[Diary] = relationship(back_populates="entries")
+
+
+class DraftCacheEntry(Base):
+    __tablename__ = "draft_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    draft: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float)
+    # epoch 초. 워커 간 비교를 위해 monotonic이 아닌 벽시계를 쓴다.
+    updated_at: Mapped[float] = mapped_column(Float)
+
+
+class ImageJob(Base):
+    __tablename__ = "image_jobs"
+    __table_args__ = (
+        # 대상(persona/entry)당 작업 행은 하나만 둔다(enqueue 멱등성).
+        UniqueConstraint("kind", "target_id", name="uq_image_job_target"),
+        Index("ix_image_jobs_status_next_run", "status", "next_run_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
+    kind: Mapped[ImageJobKind] = mapped_column(Enum(ImageJobKind))
+    target_id: Mapped[str] = mapped_column(String(36))
+    account_id: Mapped[str] = mapped_column(String(36))
+    status: Mapped[JobStatus] = mapped_column(Enum(JobStatus), default=JobStatus.QUEUED)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3)
+    next_run_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    image_ref: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+
+
+class LLMRoutingConfig(Base):
+    # 추가만 하는 변경 이력. 가장 최근 행이 현재 라우팅이며 routes가 NULL이면 환경변수 기본값을 쓴다.
+    __tablename__ = "llm_routing_configs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    routes: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_by: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+
+
+class AccountDailyActivity(Base):
+    # 계정별 하루 단위 집계(app.activity). 항목 생성/저장 트랜잭션 안에서 증감되며 entries = saved + drafts를 유지한다.
+    __tablename__ = "account_daily_activity"
+
+    account_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    entries: Mapped[int] = mapped_column(Integer, default=0)
+    saved: Mapped[int] = mapped_column(Integer, default=0)
+    drafts: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class EntrySearchDocument(Base):
+    # 검색용으로 토큰화한 본문(app.search.search_terms). 한국어는 음절 bigram이라 공백 구분 파서로 그대로 색인된다.
+    __tablename__ = "entry_search_documents"
+    __table_args__ = (
+        # Postgres: 'simple' 사전 tsvector 표현식 GIN 인덱스. app.search의 검색 조건이 같은 표현식을 쓴다.
+        Index(
+            "ix_entry_search_documents_terms",
+            text("to_tsvector('simple'::regconfig, terms)"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    # SQLite FTS5 외부 콘텐츠 테이블이 rowid로 참조하므로 정수 PK(rowid 별칭)를 쓴다.
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    entry_id: Mapped[str] = mapped_column(String(36), ForeignKey("entries.id", ondelete="CASCADE"), unique=True)
+    account_id: Mapped[str] = mapped_column(String(36), index=True)
+    terms: Mapped[str] = mapped_column(Text)
+
+
+# SQLite: entry_search_documents를 콘텐츠로 쓰는 FTS5 색인과 동기화 트리거
+for _statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS entry_search_fts USING fts5(terms, content='entry_search_documents', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS entry_search_documents_ai AFTER INSERT ON entry_search_documents BEGIN
+        INSERT INTO entry_search_fts(rowid, terms) VALUES (new.id, new.terms);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entry_search_documents_ad AFTER DELETE ON entry_search_documents BEGIN
+        INSERT INTO entry_search_fts(entry_search_fts, rowid, terms) VALUES ('delete', old.id, old.terms);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entry_search_documents_au AFTER UPDATE ON entry_search_documents BEGIN
+        INSERT INTO entry_search_fts(entry_search_fts, rowid, terms) VALUES ('delete', old.id, old.terms);
+        INSERT INTO entry_search_fts(rowid, terms) VALUES (new.id, new.terms);
+    END""",
+):
+    event.listen(EntrySearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    EntrySearchDocument.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS entry_search_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import SessionLocal
+from app.models import LLMProvider, LLMRoutingConfig, ModelType
+from app.resilience import OPEN, CircuitBreaker, LatencyWindow, breaker_from_env
+
+logger = logging.getLogger(__name__)
+
+# Gemini는 OpenAI 호환 엔드포인트로 호출해 같은 클라이언트(ChatOpenAI/OpenAI SDK)를 재사용한다.
+GEMINI_OPENAI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+# 관리자가 바꾼 라우팅은 다른 워커에도 이 주기 안에 반영된다.
+LLM_ROUTING_REFRESH_SECONDS = float(os.getenv("LLM_ROUTING_REFRESH_SECONDS", "5"))
+# 최근 오류율이 점수에 주는 가중치: 점수 = p50 지연 x (1 + 가중치 x 오류율)
+LLM_ROUTE_ERROR_PENALTY = float(os.getenv("LLM_ROUTE_ERROR_PENALTY", "4"))
+
+
+class Route(NamedTuple):
+    provider: LLMProvider
+    model: str
+
+
+Routes = dict[ModelType, list[Route]]
+
+
+def route_credentials(route: Route) -> tuple[str, str | None] | None:
+    # (api_key, base_url). base_url이 None이면 클라이언트가 OPENAI_API_BASE/OPENAI_BASE_URL을 따른다.
+    if route.provider == LLMProvider.GEMINI:
+        api_key = os.getenv("GEMINI_API_KEY")
+        base_url = os.getenv("GEMINI_BASE_URL", GEMINI_OPENAI_BASE_URL)
+    else:
+        api_key = os.getenv("OPENAI_API_KEY")
+        base_url = None
+    return (api_key, base_url) if api_key else None
+
+
+def default_routes() -> Routes:
+    # 관리자 설정이 없을 때: LLM_PROVIDER(기본 openai)를 1순위, 다른 공급자를 장애 시 후순위로 둔다.
+    models = {
+        LLMProvider.OPENAI: {
+            ModelType.TEXT_SMALL: os.getenv("OPENAI_MODEL", "gpt-4.1-mini"),
+            ModelType.TEXT_LARGE: os.getenv("OPENAI_LARGE_MODEL", "gpt-4.1"),
+            ModelType.IMAGE: os.getenv("OPENAI_IMAGE_MODEL", "gpt-image-1"),
+        },
+        LLMProvider.GEMINI: {
+            ModelType.TEXT_SMALL: os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+            ModelType.TEXT_LARGE: os.getenv("GEMINI_LARGE_MODEL", "gemini-2.5-pro"),
+            ModelType.IMAGE: os.getenv("GEMINI_IMAGE_MODEL", "imagen-4.0-generate-001"),
+        },
+    }
+    primary = LLMProvider(os.getenv("LLM_PROVIDER", LLMProvider.OPENAI.value))
+    order = [primary, *(provider for provider in LLMProvider if provider != primary)]
+    return {model_type: [Route(provider, models[provider][model_type]) for provider in order] for model_type in ModelType}
+
+
+def dump_routes(routes: Routes) -> str:
+    return json.dumps(
+        {
+            model_type.value: [{"provider": route.provider.value, "model": route.model} for route in model_routes]
+            for model_type, model_routes in routes.items()
+        },
+        ensure_ascii=False,
+    )
+
+
+def parse_routes(raw: str) -> Routes:
+    data = json.loads(raw)
+    routes = default_routes()
+    for model_type in ModelType:
+        if data.get(model_type.value):
+            routes[model_type] = [Route(LLMProvider(item["provider"]), item["model"]) for item in data[model_type.value]]
+    return routes
+
+
+class RouteHealth:
+    def __init__(self, breaker: CircuitBreaker, *, window: int = 50) -> None:
+        self.breaker = breaker
+        self.latencies = LatencyWindow(size=window)
+        self._outcomes: deque[bool] = deque(maxlen=window)
+
+    @property
+    def error_rate(self) -> float:
+        outcomes = list(self._outcomes)
+        return sum(1 for ok in outcomes if not ok) / len(outcomes) if outcomes else 0.0
+
+    def record(self, *, success: bool, duration: float) -> None:
+        self.breaker.record(success=success, duration=duration)
+        self._outcomes.append(success)
+        if success:
+            self.latencies.add(duration)
+
+    def score(self) -> float:
+        p50 = self.latencies.percentile(50)
+        if p50 is None:
+            # 측정 전인 경로는 측정된 경로 뒤에 설정 순서대로 둔다.
+            return math.inf
+        return p50 * (1 + LLM_ROUTE_ERROR_PENALTY * self.error_rate)
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        *,
+        session_factory: sessionmaker = SessionLocal,
+        refresh_seconds: float = LLM_ROUTING_REFRESH_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.session_factory = session_factory
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        # (읽은 시각, 설정 버전, 저장된 라우팅). 저장된 라우팅이 None이면 default_routes()를 쓴다.
+        self._stored: tuple[float, int | None, Routes | None] | None = None
+        self._health: dict[tuple[ModelType, Route], RouteHealth] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._stored = None
+
+    def needs_refresh(self) -> bool:
+        stored = self._stored
+        return stored is None or self._clock() - stored[0] >= self.refresh_seconds
+
+    def version(self) -> int | None:
+        return self._load()[1]
+
+    def routes(self) -> Routes:
+        return self._load()[2] or default_routes()
+
+    async def aroutes(self) -> Routes:
+        # 이벤트 루프에서 DB를 직접 읽지 않도록 갱신이 필요할 때만 스레드로 넘긴다.
+        if self.needs_refresh():
+            await asyncio.to_thread(self._load)
+        return self.routes()
+
+    def candidates(self, model_type: ModelType) -> list[Route]:
+        # 자격 증명이 있는 경로를 (open 여부, 점수, 설정 순서)로 정렬한다. 호출 시점의 스냅샷이라 실행 중 요청은 기존 설정으로 끝난다.
+        if os.getenv("ECHODIARY_DISABLE_LLM") == "true":
+            return []
+        configured = [route for route in self.routes()[model_type] if route_credentials(route) is not None]
+
+        def rank(item: tuple[int, Route]) -> tuple[bool, float, int]:
+            index, route = item
+            health = self.health(model_type, route)
+            return health.breaker.state == OPEN, health.score(), index
+
+        return [route for _index, route in sorted(enumerate(configured), key=rank)]
+
+    def primary_model(self, model_type: ModelType) -> str:
+        candidates = self.candidates(model_type)
+        return (candidates or self.routes()[model_type])[0].model
+
+    def health(self, model_type: ModelType, route: Route) -> RouteHealth:
+        key = (model_type, route)
+        health = self._health.get(key)
+        if health is None:
+            with self._lock:
+                health = self._health.get(key)
+                if health is None:
+                    prefix = "IMAGE" if model_type == ModelType.IMAGE else "LLM"
+                    breaker = breaker_from_env(
+                        prefix,
+                        f"{route.provider.value}:{route.model}",
+                        slow_call_seconds=60.0 if model_type == ModelType.IMAGE else 5.0,
+                    )
+                    health = self._health[key] = RouteHealth(breaker)
+        return health
+
+    def describe(self) -> dict[str, object]:
+        routes = self.routes()
+        return {
+            "version": self.version(),
+            "routes": {
+                model_type.value: [
+                    {
+                        "provider": route.provider.value,
+                        "model": route.model,
+                        "configured": route_credentials(route) is not None,
+                        "state": self.health(model_type, route).breaker.state,
+                        "p50_ms": _ms(self.health(model_type, route).latencies.percentile(50)),
+                        "error_rate": round(self.health(model_type, route).error_rate, 4),
+                    }
+                    for route in model_routes
+                ]
+                for model_type, model_routes in routes.items()
+            },
+        }
+
+    def _load(self) -> tuple[float, int | None, Routes | None]:
+        if not self.needs_refresh():
+            return self._stored
+        try:
+            with self.session_factory() as db:
+                row = db.scalars(select(LLMRoutingConfig).order_by(LLMRoutingConfig.id.desc()).limit(1)).first()
+                version, raw = (row.id, row.routes) if row else (None, None)
+        except SQLAlchemyError as exc:
+            # 설정 테이블을 읽지 못해도 생성은 계속돼야 하므로 기본 라우팅으로 동작한다.
+            logger.warning("Failed to load LLM routing: %s", exc)
+            version, raw = None, None
+        routes = parse_routes(raw) if raw else None
+        previous, self._stored = self._stored, (self._clock(), version, routes)
+        if previous is None or previous[2] != routes:
+            self._prune_health(routes or default_routes())
+        return self._stored
+
+    def _prune_health(self, routes: Routes) -> None:
+        # 설정에서 빠진 경로의 브레이커/지연 기록은 버린다. 다시 추가되면 측정 전 상태로 시작한다.
+        active = {(model_type, route) for model_type, model_routes in routes.items() for route in model_routes}
+        with self._lock:
+            for key in [key for key in self._health if key not in active]:
+                del self._health[key]
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def save_routing(db: Session, routes: Routes | None, *, created_by: str | None) -> LLMRoutingConfig:
+    config = LLMRoutingConfig(routes=dump_routes(routes) if routes else None, created_by=created_by)
+    db.add(config)
+    db.commit()
+    db.refresh(config)
+    llm_router.invalidate()
+    return config
+
+
+def routing_history(db: Session, *, limit: int = 20) -> list[LLMRoutingConfig]:
+    return list(db.scalars(select(LLMRoutingConfig).order_by(LLMRoutingConfig.id.desc()).limit(limit)))
+
+
+llm_router = LLMRouter()
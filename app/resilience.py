@@ -0,0 +1,196 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from prometheus_client import Counter, Gauge
+
+T = TypeVar("T")
+
+CIRCUIT_STATE = Gauge(
+    "echodiary_circuit_state",
+    "Circuit breaker state (0=closed, 1=half_open, 2=open).",
+    ["name"],
+    # 브레이커는 워커마다 따로 있으므로 가장 나쁜 워커의 상태를 노출한다.
+    multiprocess_mode="livemax",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "echodiary_circuit_transitions_total",
+    "Circuit breaker state changes.",
+    ["name", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "echodiary_circuit_rejections_total",
+    "Calls short-circuited while the breaker was open.",
+    ["name"],
+)
+HEDGED_CALLS = Counter(
+    "echodiary_hedged_calls_total",
+    "Hedged (duplicate) upstream calls by which call finished first.",
+    ["name", "winner"],
+)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    # 최근 window개 호출 중 실패 비율 또는 느린 호출 비율이 임계치를 넘으면 open.
+    # open_seconds가 지나면 half-open으로 probe 호출만 통과시키고, probe가 모두 성공하면 closed로 돌아간다.
+    # allow()가 True를 돌려준 호출은 끝날 때 record() 또는 release() 중 하나를 반드시 부른다.
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_call_rate: float = 0.8,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._calls: deque[tuple[bool, bool]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        CIRCUIT_STATE.labels(name=name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+        CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+        return False
+
+    def record(self, *, success: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not success or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+            if self._state == OPEN:
+                # open 직전에 시작된 호출의 결과는 무시한다.
+                return
+            self._calls.append((success, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for ok, _slow in self._calls if not ok) / len(self._calls)
+            slow_calls = sum(1 for _ok, is_slow in self._calls if is_slow) / len(self._calls)
+            if failures >= self.failure_rate or slow_calls >= self.slow_call_rate:
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        # 결과 없이 끝난 호출(취소, 클라이언트 연결 끊김)의 half-open probe 슬롯을 돌려준다.
+        # 업스트림 탓이 아니므로 성공/실패로 세지 않는다. record()를 부르지 않으면 반드시 불러야 한다.
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = self._clock()
+        if state == CLOSED:
+            self._calls.clear()
+        CIRCUIT_STATE.labels(name=self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(name=self.name, state=state).inc()
+
+
+def breaker_from_env(prefix: str, name: str, *, slow_call_seconds: float) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_rate=float(os.getenv(f"{prefix}_BREAKER_FAILURE_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv(f"{prefix}_BREAKER_SLOW_CALL_SECONDS", str(slow_call_seconds))),
+        slow_call_rate=float(os.getenv(f"{prefix}_BREAKER_SLOW_CALL_RATE", "0.8")),
+        window=int(os.getenv(f"{prefix}_BREAKER_WINDOW", "20")),
+        min_calls=int(os.getenv(f"{prefix}_BREAKER_MIN_CALLS", "10")),
+        open_seconds=float(os.getenv(f"{prefix}_BREAKER_OPEN_SECONDS", "30")),
+        half_open_probes=int(os.getenv(f"{prefix}_BREAKER_HALF_OPEN_PROBES", "1")),
+    )
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+async def hedged(name: str, call: Callable[[], Awaitable[T]], *, delay: float | None) -> T:
+    # delay 안에 첫 호출이 끝나지 않으면 같은 호출을 한 번 더 보내 먼저 성공한 결과를 쓴다.
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        if delay is None:
+            return await tasks[0]
+        done, _pending = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result()
+
+        tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    HEDGED_CALLS.labels(name=name, winner="primary" if task is tasks[0] else "hedge").inc()
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -1,5 +1,10 @@
+from datetime import datetime
+from typing import Annotated
+
 from pydantic import BaseModel, Field
 
+from app.models import EntryStatus, ImageJobKind, LLMProvider, ModelType, UserRole
+
 
 class LoginRequest(BaseModel):
     username: str = Field(min_length=1, max_length=100)
@@ -11,6 +16,10 @@ class SignupRequest(BaseModel):
     password: str = Field(min_length=1, max_length=100)
 
 
+class UserRoleUpdate(BaseModel):
+    role: UserRole
+
+
 class PersonaCreate(BaseModel):
     account_id: str
     name: str = Field(min_length=1, max_length=100)
@@ -28,7 +37,57 @@ class EntryGenerateRequest(BaseModel):
     persona_id: str
     input_keywords: str | None = None
     input_text: str | None = None
+    regenerate: bool = False
 
 
 class EntrySaveRequest(BaseModel):
     draft: str = Field(min_length=1)
+
+
+class ImageJobCreate(BaseModel):
+    kind: ImageJobKind
+    target_id: str
+
+
+class LLMRouteIn(BaseModel):
+    provider: LLMProvider
+    model: str = Field(min_length=1, max_length=100, pattern=r"^[A-Za-z0-9._:/-]+$")
+
+
+class LLMRoutingUpdate(BaseModel):
+    # 지정하지 않은 모델 타입은 현재 설정을 유지한다. 목록 순서가 기본 우선순위다.
+    routes: dict[ModelType, Annotated[list[LLMRouteIn], Field(min_length=1, max_length=4)]]
+
+
+# 가져오기(/api/import) 레코드. id는 파일 안에서의 참조용이며 새 id로 바뀐다.
+# 다른 레코드가 가리키는 id가 파일에 없으면 같은 계정의 기존 일기/페르소나 id로 본다.
+class ImportPersona(BaseModel):
+    id: str | None = None
+    name: str = Field(min_length=1, max_length=100)
+    tone: str = Field(min_length=1, max_length=100)
+    description: str = Field(min_length=1)
+    created_at: datetime | None = None
+
+
+class ImportDiary(BaseModel):
+    id: str | None = None
+    title: str = Field(min_length=1, max_length=120)
+    default_persona_id: str | None = None
+    created_at: datetime | None = None
+
+
+class ImportDiaryPersona(BaseModel):
+    diary_id: str
+    persona_id: str
+    is_default: bool = False
+
+
+class ImportEntry(BaseModel):
+    # diary_id/persona_id가 없으면 요청의 기본값을 쓴다. 다른 앱에서 옮겨 오는 항목은 저장본으로 본다.
+    diary_id: str | None = None
+    persona_id: str | None = None
+    input_keywords: str | None = None
+    input_text: str | None = None
+    draft: str = Field(min_length=1)
+    status: EntryStatus = EntryStatus.SAVED
+    created_at: datetime | None = None
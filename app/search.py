@@ -0,0 +1,115 @@
+import operator
+import re
+import unicodedata
+
+from sqlalchemy import Select, column, func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models import Diary, Entry, EntrySearchDocument
+
+SEARCH_REINDEX_BATCH = 500
+
+# 밑줄은 Postgres 'simple' 파서가 단어 구분자로 보므로 토큰에서 뺀다.
+# 한글 음절/자모, 한자, 가나는 공백 없이 이어지므로 음절 bigram으로 자른다.
+_CJK_CHARS = "[ᄀ-ᇿ぀-ヿㄱ-ㆎ㐀-鿿가-힣]"
+# (CJK 조각) 또는 (CJK가 아닌 단어 조각)을 한 번에 찾는다.
+_SEGMENT = re.compile(rf"({_CJK_CHARS}+)|((?:(?!{_CJK_CHARS})[^\W_])+)")
+
+
+def _segments(text_value: str) -> list[tuple[str, bool]]:
+    # (조각, CJK 여부). "커피2잔" -> [("커피", True), ("2", False), ("잔", True)]
+    normalized = unicodedata.normalize("NFKC", text_value).lower()
+    return [(cjk, True) if cjk else (word, False) for cjk, word in _SEGMENT.findall(normalized)]
+
+
+def search_terms(*texts: str | None) -> str:
+    # 색인용 토큰 문자열(공백 구분, 중복 제거). 한 글자짜리 CJK 조각은 그대로 둔다.
+    tokens: list[str] = []
+    for text_value in texts:
+        for segment, cjk in _segments(text_value or ""):
+            if cjk and len(segment) > 1:
+                tokens += map(operator.add, segment, segment[1:])
+            else:
+                tokens.append(segment)
+    return " ".join(dict.fromkeys(tokens))
+
+
+def query_terms(query: str) -> list[tuple[str, bool]]:
+    # (토큰, 접두 일치 여부). 한 글자 CJK와 영문/숫자 단어는 접두 일치로 찾는다("산" -> "산책", "walk" -> "walking").
+    terms: dict[tuple[str, bool], None] = {}
+    for segment, cjk in _segments(query):
+        if cjk and len(segment) > 1:
+            terms.update(dict.fromkeys((segment[i : i + 2], False) for i in range(len(segment) - 1)))
+        else:
+            terms[(segment, True)] = None
+    return list(terms)
+
+
+def _match_clause(terms: list[tuple[str, bool]]):
+    if engine.dialect.name == "postgresql":
+        tsquery = " & ".join(f"{token}:*" if prefix else token for token, prefix in terms)
+        # 표현식이 ix_entry_search_documents_terms와 같아야 GIN 인덱스를 탄다.
+        tsvector = func.to_tsvector(literal_column("'simple'::regconfig"), EntrySearchDocument.terms)
+        return tsvector.op("@@")(func.to_tsquery(literal_column("'simple'::regconfig"), tsquery))
+    match = " ".join(f'"{token}"*' if prefix else f'"{token}"' for token, prefix in terms)
+    matched = text("SELECT rowid FROM entry_search_fts WHERE entry_search_fts MATCH :match").bindparams(match=match)
+    return EntrySearchDocument.id.in_(matched.columns(column("rowid")))
+
+
+def search_statement(account_id: str, query: str) -> Select | None:
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return (
+        select(Entry)
+        .join(EntrySearchDocument, EntrySearchDocument.entry_id == Entry.id)
+        .where(EntrySearchDocument.account_id == account_id, _match_clause(terms))
+    )
+
+
+def index_entry(db: Session, entry: Entry, *, account_id: str | None = None) -> None:
+    # 호출한 쪽의 트랜잭션 안에서 색인을 갱신한다(커밋은 호출한 쪽이 한다).
+    if account_id is None:
+        account_id = db.scalar(select(Diary.account_id).where(Diary.id == entry.diary_id))
+    terms = search_terms(entry.input_keywords, entry.input_text, entry.draft)
+    document = db.scalar(select(EntrySearchDocument).where(EntrySearchDocument.entry_id == entry.id))
+    if document is None:
+        db.add(EntrySearchDocument(entry_id=entry.id, account_id=account_id, terms=terms))
+    else:
+        document.account_id = account_id
+        document.terms = terms
+
+
+def reindex_missing(db: Session, *, batch_size: int = SEARCH_REINDEX_BATCH) -> int:
+    # 검색 테이블이 생기기 전에 저장된 항목을 색인한다. 배치마다 커밋하므로 중간에 끊겨도 이어서 실행할 수 있다.
+    indexed = 0
+    while True:
+        rows = db.execute(
+            select(Entry, Diary.account_id)
+            .join(Diary, Diary.id == Entry.diary_id)
+            .outerjoin(EntrySearchDocument, EntrySearchDocument.entry_id == Entry.id)
+            .where(EntrySearchDocument.id.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return indexed
+        db.add_all(
+            EntrySearchDocument(
+                entry_id=entry.id,
+                account_id=account_id,
+                terms=search_terms(entry.input_keywords, entry.input_text, entry.draft),
+            )
+            for entry, account_id in rows
+        )
+        db.commit()
+        indexed += len(rows)
+
+
+if __name__ == "__main__":
+    from app.bootstrap import bootstrap_database
+    from app.database import SessionLocal
+
+    bootstrap_database()
+    with SessionLocal() as session:
+        print(f"indexed {reindex_missing(session)} entries")
@@ -0,0 +1,54 @@
+# 운영 진입점: python -m app.serve
+# WEB_CONCURRENCY(기본 1)개의 uvicorn 워커로 띄운다. 워커가 여러 개면
+# - 스키마/관리자 계정 준비는 여기서 한 번만 하고 워커는 건너뛴다(DB_BOOTSTRAP_ON_STARTUP=false).
+# - 지표는 PROMETHEUS_MULTIPROC_DIR에 워커별로 기록하고 /metrics가 모든 워커를 합산한다.
+# prometheus_client는 import 시점에 PROMETHEUS_MULTIPROC_DIR을 보고 저장 방식을 정하므로
+# 디렉터리를 준비하기 전에는 app 모듈을 import하지 않는다.
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+
+def prepare_multiprocess_dir(path: str | None) -> str:
+    # 이전 실행이 남긴 .db 파일이 섞이면 카운터가 부풀려지므로 기동할 때마다 비운다.
+    path = path or os.path.join(tempfile.gettempdir(), "echodiary-prometheus")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args()
+
+    if args.workers > 1 or os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = prepare_multiprocess_dir(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+    if args.workers > 1:
+        from app.bootstrap import DB_BOOTSTRAP_ON_STARTUP, bootstrap_database
+
+        if DB_BOOTSTRAP_ON_STARTUP:
+            bootstrap_database()
+        os.environ["DB_BOOTSTRAP_ON_STARTUP"] = "false"
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        access_log=args.access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import fcntl
+import functools
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Protocol
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Diary, Entry, EntryStatus
+from app.search import search_terms
+
+logger = logging.getLogger(__name__)
+
+# hashing: 오프라인 결정적 임베딩(기본), openai: OpenAI 호환 embeddings API
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hashing").lower()
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_INDEX_DIR = Path(os.getenv("EMBEDDING_INDEX_DIR", "./data/embeddings"))
+EMBEDDING_REBUILD_BATCH = 500
+# 워커마다 열어 두는 계정 색인(memmap) 수. 넘으면 가장 오래 안 쓴 계정부터 닫는다.
+EMBEDDING_CACHE_ACCOUNTS = int(os.getenv("EMBEDDING_CACHE_ACCOUNTS", "256"))
+
+
+class Embedder(Protocol):
+    # name은 색인 디렉터리 이름으로 쓰인다. 모델/차원이 바뀌면 새 디렉터리에 다시 색인된다.
+    name: str
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    # 검색 색인과 같은 토큰(한국어 음절 bigram)을 부호 있는 feature hashing으로 dim차원에 모은다.
+    # Python hash()는 프로세스마다 달라지므로 blake2b를 쓴다.
+    def __init__(self, dim: int = EMBEDDING_DIM) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows, slots, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in search_terms(text).split():
+                slot, sign = _token_slot(token, self.dim)
+                rows.append(row)
+                slots.append(slot)
+                signs.append(sign)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (rows, slots), np.array(signs, dtype=np.float32))
+        return _normalize(matrix)
+
+
+@functools.lru_cache(maxsize=65536)
+def _token_slot(token: str, dim: int) -> tuple[int, float]:
+    # 음절 bigram은 종류가 많지 않아 같은 토큰이 계속 나온다(대량 색인/가져오기에서 해시를 다시 계산하지 않는다).
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+class OpenAIEmbedder:
+    def __init__(self, model: str = EMBEDDING_MODEL, dim: int = EMBEDDING_DIM) -> None:
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+        self._client = None
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI()
+        response = self._client.embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return _normalize(np.array([item.embedding for item in response.data], dtype=np.float32))
+
+
+def _embedder() -> Embedder:
+    if EMBEDDING_BACKEND == "openai":
+        return OpenAIEmbedder()
+    return HashingEmbedder()
+
+
+class EmbeddingIndex:
+    # 계정마다 <key>.f32(행 = 항목, float32, L2 정규화)와 <key>.ids(행 순서대로 entry id)를 둔다.
+    # 벡터 파일은 memmap으로 읽고, 쓰기는 파일 잠금 아래 행 추가/제자리 덮어쓰기만 하므로 워커 간에 공유된다.
+    # 벡터를 먼저 쓰고 id를 나중에 쓰므로 읽는 쪽은 id 수와 벡터 행 수 중 작은 쪽까지만 본다.
+    def __init__(self, root: Path, embedder: Embedder, *, max_accounts: int = EMBEDDING_CACHE_ACCOUNTS) -> None:
+        self.root = root
+        self.embedder = embedder
+        self.max_accounts = max_accounts
+        self._cache: OrderedDict[str, tuple[tuple[int, ...], list[str], np.ndarray]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embedder.embed([text])[0]
+
+    def upsert(self, account_id: str, entry_id: str, text: str) -> None:
+        vector = self.embed(text).astype(np.float32)
+        vectors_path, ids_path = self._paths(account_id)
+        with self._locked(account_id):
+            ids = self._read_ids(ids_path)
+            if entry_id in ids:
+                row = ids.index(entry_id)
+                matrix = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(len(ids), self.embedder.dim))
+                matrix[row] = vector
+                matrix.flush()
+                return
+            self._append(account_id, len(ids), vector[np.newaxis, :], [entry_id])
+
+    def extend(self, account_id: str, items: list[tuple[str, str]]) -> int:
+        # (entry_id, text) 여러 개를 잠금 한 번으로 추가한다(가져오기). 이미 색인된 항목은 건너뛴다.
+        with self._locked(account_id):
+            ids = self._read_ids(self._paths(account_id)[1])
+            known = set(ids)
+            items = [(entry_id, text) for entry_id, text in items if entry_id not in known]
+            count = len(ids)
+            for start in range(0, len(items), EMBEDDING_REBUILD_BATCH):
+                batch = items[start : start + EMBEDDING_REBUILD_BATCH]
+                matrix = self.embedder.embed([text for _id, text in batch]).astype(np.float32)
+                self._append(account_id, count, matrix, [entry_id for entry_id, _text in batch])
+                count += len(batch)
+            return len(items)
+
+    def _append(self, account_id: str, count: int, matrix: np.ndarray, entry_ids: list[str]) -> None:
+        # 잠금 안에서만 호출한다. count는 현재 id 수다.
+        vectors_path, ids_path = self._paths(account_id)
+        with vectors_path.open("ab") as handle:
+            # id를 쓰기 전에 끊긴 이전 추가가 남긴 벡터 행은 버린다.
+            handle.truncate(count * self.embedder.dim * 4)
+            handle.write(matrix.tobytes())
+        with ids_path.open("a", encoding="ascii") as handle:
+            handle.writelines(f"{entry_id}\n" for entry_id in entry_ids)
+
+    def rebuild(self, account_id: str, items: list[tuple[str, str]]) -> None:
+        # (entry_id, text) 전체로 색인을 새로 만들고 원자적으로 교체한다.
+        vectors_path, ids_path = self._paths(account_id)
+        with self._locked(account_id):
+            vectors_tmp, ids_tmp = vectors_path.with_suffix(".f32.tmp"), ids_path.with_suffix(".ids.tmp")
+            with vectors_tmp.open("wb") as vectors, ids_tmp.open("w", encoding="ascii") as ids:
+                for start in range(0, len(items), EMBEDDING_REBUILD_BATCH):
+                    batch = items[start : start + EMBEDDING_REBUILD_BATCH]
+                    vectors.write(self.embedder.embed([text for _id, text in batch]).astype(np.float32).tobytes())
+                    ids.writelines(f"{entry_id}\n" for entry_id, _text in batch)
+            os.replace(vectors_tmp, vectors_path)
+            os.replace(ids_tmp, ids_path)
+
+    def vector(self, account_id: str, entry_id: str) -> np.ndarray | None:
+        ids, matrix = self._load(account_id)
+        if entry_id not in ids:
+            return None
+        return np.array(matrix[ids.index(entry_id)])
+
+    def search(
+        self, account_id: str, query: np.ndarray, *, limit: int, exclude: set[str] | None = None
+    ) -> list[tuple[str, float]]:
+        exclude = exclude or set()
+        ids, matrix = self._load(account_id)
+        if not ids:
+            return []
+        scores = matrix @ query.astype(np.float32)
+        # 제외할 항목 수만큼 더 뽑은 뒤 부분 정렬한다(전체 정렬 없이 O(n)).
+        take = min(len(ids), limit + len(exclude))
+        top = np.argpartition(-scores, take - 1)[:take]
+        ranked = top[np.argsort(-scores[top], kind="stable")]
+        return [(ids[row], float(scores[row])) for row in ranked if ids[row] not in exclude][:limit]
+
+    def _paths(self, account_id: str) -> tuple[Path, Path]:
+        # 계정 id를 그대로 파일명에 쓰지 않는다.
+        key = hashlib.sha256(account_id.encode("utf-8")).hexdigest()[:32]
+        directory = self.root / self.embedder.name
+        return directory / f"{key}.f32", directory / f"{key}.ids"
+
+    @contextmanager
+    def _locked(self, account_id: str) -> Iterator[None]:
+        vectors_path, _ids_path = self._paths(account_id)
+        vectors_path.parent.mkdir(parents=True, exist_ok=True)
+        with vectors_path.with_suffix(".lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                with self._cache_lock:
+                    self._cache.pop(account_id, None)
+
+    @staticmethod
+    def _read_ids(path: Path) -> list[str]:
+        if not path.exists():
+            return []
+        return path.read_text(encoding="ascii").splitlines()
+
+    def _load(self, account_id: str) -> tuple[list[str], np.ndarray]:
+        vectors_path, ids_path = self._paths(account_id)
+        try:
+            # 다른 워커가 행을 추가했거나(크기) 색인을 교체했으면(inode) 다시 연다.
+            # 제자리 덮어쓰기는 공유 매핑이라 다시 열지 않아도 보인다.
+            vectors_stat, ids_stat = vectors_path.stat(), ids_path.stat()
+            signature = (vectors_stat.st_ino, vectors_stat.st_size, ids_stat.st_ino, ids_stat.st_size)
+        except FileNotFoundError:
+            return [], np.zeros((0, self.embedder.dim), dtype=np.float32)
+        with self._cache_lock:
+            cached = self._cache.get(account_id)
+            if cached is not None and cached[0] == signature:
+                self._cache.move_to_end(account_id)
+                return cached[1], cached[2]
+        ids = self._read_ids(ids_path)
+        rows = min(len(ids), vectors_stat.st_size // (4 * self.embedder.dim))
+        matrix = (
+            np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, self.embedder.dim))
+            if rows
+            else np.zeros((0, self.embedder.dim), dtype=np.float32)
+        )
+        with self._cache_lock:
+            self._cache[account_id] = (signature, ids[:rows], matrix)
+            self._cache.move_to_end(account_id)
+            # 밀려난 memmap은 참조가 없어지면 매핑과 파일 디스크립터가 닫힌다.
+            while len(self._cache) > self.max_accounts:
+                self._cache.popitem(last=False)
+        return ids[:rows], matrix
+
+
+def index_saved_entry(account_id: str, entry: Entry) -> None:
+    # 저장 트랜잭션이 커밋된 뒤 호출된다. 색인은 DB에서 다시 만들 수 있는 파생 데이터라 실패해도 저장은 유지한다.
+    try:
+        similar_index.upsert(account_id, entry.id, entry.draft)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Failed to update embedding index for entry %s: %s", entry.id, exc)
+
+
+def index_saved_entries(account_id: str, items: list[tuple[str, str]]) -> None:
+    # 가져오기 배치가 커밋된 뒤 호출된다. 실패하면 python -m app.similar로 다시 만들 수 있다.
+    try:
+        similar_index.extend(account_id, items)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Failed to update embedding index for %d imported entries: %s", len(items), exc)
+
+
+def similar_entry_ids(
+    account_id: str, *, text: str | None = None, entry_id: str | None = None, limit: int = 5
+) -> list[tuple[str, float]]:
+    # entry_id가 색인에 있으면 저장된 벡터를, 아니면 text를 임베딩해 찾는다. 기준 항목 자신은 제외한다.
+    query = similar_index.vector(account_id, entry_id) if entry_id else None
+    if query is None:
+        if not text:
+            return []
+        query = similar_index.embed(text)
+    return similar_index.search(account_id, query, limit=limit, exclude={entry_id} if entry_id else None)
+
+
+def similar_drafts(db: Session, account_id: str, *, text: str, limit: int, min_score: float = 0.0) -> list[str]:
+    # 초안 생성 시 참고용(compose 노드의 state["memories"]). 비슷한 순서를 유지한다.
+    matches = [(entry_id, score) for entry_id, score in similar_entry_ids(account_id, text=text, limit=limit) if score >= min_score]
+    if not matches:
+        return []
+    drafts = dict(db.execute(select(Entry.id, Entry.draft).where(Entry.id.in_([entry_id for entry_id, _ in matches]))).all())
+    return [drafts[entry_id] for entry_id, _score in matches if entry_id in drafts]
+
+
+def rebuild_all(db: Session) -> int:
+    # 저장된(SAVED) 항목으로 모든 계정의 색인을 다시 만든다: python -m app.similar
+    rows = db.execute(
+        select(Diary.account_id, Entry.id, Entry.draft)
+        .join(Diary, Diary.id == Entry.diary_id)
+        .where(Entry.status == EntryStatus.SAVED)
+        .order_by(Diary.account_id, Entry.created_at, Entry.id)
+        .execution_options(yield_per=EMBEDDING_REBUILD_BATCH)
+    )
+    account_id, items, total = None, [], 0
+    for row_account_id, entry_id, draft in rows:
+        if row_account_id != account_id and items:
+            similar_index.rebuild(account_id, items)
+            items = []
+        account_id = row_account_id
+        items.append((entry_id, draft))
+        total += 1
+    if items:
+        similar_index.rebuild(account_id, items)
+    return total
+
+
+similar_index = EmbeddingIndex(EMBEDDING_INDEX_DIR, _embedder())
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    with SessionLocal() as session:
+        print(f"indexed {rebuild_all(session)} entries")
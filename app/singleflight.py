@@ -0,0 +1,42 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+COALESCED_CALLS = Counter(
+    "echodiary_singleflight_coalesced_total",
+    "Calls that joined an identical in-flight call instead of starting a new one.",
+    ["name"],
+)
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], *, timeout: float | None = None) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED_CALLS.labels(name=self.name).inc()
+
+        # shield: 한 대기자가 취소되거나 타임아웃돼도 공유 호출은 나머지 대기자를 위해 계속 진행한다.
+        # 공유 호출의 예외는 모든 대기자에게 그대로 전달된다.
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # 모든 대기자가 떠난 뒤 실패한 경우 "exception was never retrieved" 경고를 막는다.
+            task.exception()
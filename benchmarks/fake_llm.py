@@ -0,0 +1,116 @@
+# 부하 테스트용 OpenAI 호환 스텁 서버(네트워크/과금 없이 LLM 지연을 재현한다).
+#   python benchmarks/fake_llm.py --port 8100 --latency-ms 300 --token-delay-ms 20
+# 앱에는 OPENAI_API_BASE(langchain) / OPENAI_BASE_URL(openai SDK)=http://127.0.0.1:8100/v1 로 연결한다.
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import time
+from collections.abc import AsyncIterator
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from PIL import Image
+
+
+def _tiny_png() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 180, 160)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _reply_tokens(messages: list[dict], tokens: int) -> list[str]:
+    # 마지막 사용자 메시지를 잘라 토큰처럼 흘려보낸다. 입력마다 응답이 달라 캐시 영향이 없다.
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    words = (prompt.split() or ["오늘"]) * tokens
+    return [f"{word} " for word in words[:tokens]]
+
+
+def create_app(*, latency_ms: float = 300, token_delay_ms: float = 20, tokens: int = 24) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    stats = {"chat_completions": 0, "image_generations": 0}
+    png = _tiny_png()
+
+    @app.get("/stats")
+    def get_stats() -> dict[str, int]:
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["chat_completions"] += 1
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid4().hex}"
+        created = int(time.time())
+        pieces = _reply_tokens(body.get("messages", []), tokens)
+        usage = {"prompt_tokens": tokens, "completion_tokens": len(pieces), "total_tokens": tokens + len(pieces)}
+
+        await asyncio.sleep(latency_ms / 1000)
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(pieces).strip()},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish_reason: str | None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            yield chunk({"role": "assistant", "content": ""}, None)
+            for piece in pieces:
+                await asyncio.sleep(token_delay_ms / 1000)
+                yield chunk({"content": piece}, None)
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+                yield f"data: {json.dumps({**payload, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/images/generations")
+    async def image_generations() -> dict:
+        stats["image_generations"] += 1
+        await asyncio.sleep(latency_ms / 1000)
+        return {"created": int(time.time()), "data": [{"b64_json": png}]}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=300, help="첫 응답(첫 토큰)까지의 지연")
+    parser.add_argument("--token-delay-ms", type=float, default=20, help="스트리밍 토큰 간 지연")
+    parser.add_argument("--tokens", type=int, default=24)
+    args = parser.parse_args()
+
+    app = create_app(latency_ms=args.latency_ms, token_delay_ms=args.token_delay_ms, tokens=args.tokens)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# signup → login → persona → diary → generate → save → list 흐름 부하 테스트.
+#   python benchmarks/load_test.py --users 20 --iterations 10 --output results.json
+# 기본값은 임시 SQLite + 로컬 스텁 LLM(benchmarks/fake_llm.py)으로 API 서버를 직접 띄운다.
+# --database-url로 로컬 Postgres를, --base-url로 이미 떠 있는 서버를 대상으로 할 수 있다.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+
+@contextmanager
+def _serve(command: list[str], ready_url: str, env: dict[str, str]):
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        _wait_ready(ready_url, process)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    # nearest-rank 방식. 커밋 간 비교가 목적이라 보간하지 않는다.
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: dict[str, list[tuple[float, bool]]], elapsed: float) -> dict:
+    endpoints = {}
+    total = errors = 0
+    for name in sorted(samples):
+        latencies = [seconds * 1000 for seconds, _ok in samples[name]]
+        failed = sum(1 for _seconds, ok in samples[name] if not ok)
+        total += len(latencies)
+        errors += failed
+        endpoints[name] = {
+            "count": len(latencies),
+            "errors": failed,
+            "error_rate": round(failed / len(latencies), 4) if latencies else 0.0,
+            "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies, default=0.0), 2),
+        }
+    return {
+        "duration_seconds": round(elapsed, 3),
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, samples: dict[str, list[tuple[float, bool]]]) -> None:
+        self.client = client
+        self.samples = samples
+        self.headers: dict[str, str] = {}
+
+    async def call(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.samples.setdefault(name, []).append((time.perf_counter() - started, False))
+            return None
+        self.samples.setdefault(name, []).append((time.perf_counter() - started, response.is_success))
+        return response if response.is_success else None
+
+    async def generate_stream(self, payload: dict) -> str | None:
+        # 첫 token 이벤트까지(TTFT)와 done 이벤트까지를 따로 기록한다.
+        started = time.perf_counter()
+        first_token = None
+        entry_id = None
+        ok = False
+        try:
+            async with self.client.stream(
+                "POST", "/api/entries/generate/stream", json=payload, headers=self.headers
+            ) as response:
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line.removeprefix("event: ")
+                        if first_token is None and event == "token":
+                            first_token = time.perf_counter() - started
+                    elif line.startswith("data: ") and event == "done":
+                        entry_id = json.loads(line.removeprefix("data: "))["id"]
+                ok = response.is_success and entry_id is not None
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - started
+        self.samples.setdefault("generate_stream", []).append((elapsed, ok))
+        self.samples.setdefault("generate_stream_first_token", []).append(
+            (first_token if first_token is not None else elapsed, first_token is not None)
+        )
+        return entry_id
+
+    async def run(self, *, iterations: int, stream: bool) -> None:
+        username = f"bench-{uuid4().hex[:12]}"
+        credentials = {"username": username, "password": "bench-pass"}
+        if await self.call("signup", "POST", "/api/auth/signup", json=credentials) is None:
+            return
+        login = await self.call("login", "POST", "/api/auth/login", json=credentials)
+        if login is None:
+            return
+        self.headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        persona = await self.call(
+            "create_persona",
+            "POST",
+            "/api/personas",
+            json={"account_id": username, "name": "벤치", "tone": "담백", "description": "load test"},
+        )
+        diary = await self.call("create_diary", "POST", "/api/diaries", json={"account_id": username, "title": "벤치"})
+        if persona is None or diary is None:
+            return
+        persona_id, diary_id = persona.json()["id"], diary.json()["id"]
+        await self.call("link_persona", "POST", f"/api/diaries/{diary_id}/personas/{persona_id}")
+
+        for index in range(iterations):
+            # 입력을 매번 다르게 해 초안 캐시가 아닌 LLM 경로를 측정한다.
+            payload = {
+                "diary_id": diary_id,
+                "persona_id": persona_id,
+                "input_text": f"{index}번째 메모 {uuid4().hex[:8]} 산책하고 커피를 마셨다",
+            }
+            if stream:
+                entry_id = await self.generate_stream(payload)
+            else:
+                generated = await self.call("generate", "POST", "/api/entries/generate", json=payload)
+                entry_id = generated.json()["id"] if generated is not None else None
+            if entry_id is not None:
+                await self.call("save_entry", "POST", f"/api/entries/{entry_id}/save", json={"draft": "저장된 문장"})
+            await self.call("list_entries", "GET", f"/api/diaries/{diary_id}/entries", params={"limit": 20})
+        await self.call("list_diaries", "GET", "/api/diaries", params={"account_id": username})
+
+
+async def run_load(*, base_url: str, users: int, iterations: int, stream: bool) -> dict:
+    samples: dict[str, list[tuple[float, bool]]] = {}
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(VirtualUser(client, samples).run(iterations=iterations, stream=stream) for _ in range(users)))
+        elapsed = time.perf_counter() - started
+    return summarize(samples, elapsed)
+
+
+@contextmanager
+def running_stack(
+    *,
+    database_url: str | None,
+    llm_latency_ms: float,
+    llm_token_delay_ms: float,
+    api_command: list[str] | None = None,
+    extra_env: dict[str, str] | None = None,
+):
+    # 스텁 LLM과 API 서버를 빈 포트에 띄우고 API 주소를 돌려준다.
+    with tempfile.TemporaryDirectory() as tmp:
+        llm_port, api_port = _free_port(), _free_port()
+        llm_url = f"http://127.0.0.1:{llm_port}"
+        api_url = f"http://127.0.0.1:{api_port}"
+        env = {
+            # 사용자별 토큰 버킷은 기본으로 끄고(처리량 측정 목적) 환경변수로 켤 수 있게 한다.
+            "GENERATE_RATE_PER_MINUTE": "0",
+            **os.environ,
+            "DATABASE_URL": database_url or f"sqlite:///{tmp}/bench.db",
+            "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_API_BASE": f"{llm_url}/v1",
+            "OPENAI_BASE_URL": f"{llm_url}/v1",
+            "ECHODIARY_DISABLE_LLM": "false",
+            "IMAGE_JOB_WORKERS_ENABLED": "false",
+            **(extra_env or {}),
+        }
+        llm_command = [
+            sys.executable,
+            "benchmarks/fake_llm.py",
+            "--port",
+            str(llm_port),
+            "--latency-ms",
+            str(llm_latency_ms),
+            "--token-delay-ms",
+            str(llm_token_delay_ms),
+        ]
+        api_command = [
+            *(api_command or [sys.executable, "-m", "uvicorn", "app.main:app", "--log-level", "warning", "--no-access-log"]),
+            "--port",
+            str(api_port),
+        ]
+        with _serve(llm_command, f"{llm_url}/stats", env), _serve(api_command, f"{api_url}/health", env):
+            yield api_url
+
+
+def _git_commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10, help="동시 가상 사용자 수")
+    parser.add_argument("--iterations", type=int, default=5, help="사용자당 generate→save→list 반복 횟수")
+    parser.add_argument("--stream", action="store_true", help="/api/entries/generate/stream 사용")
+    parser.add_argument("--database-url", help="기본값: 임시 SQLite 파일")
+    parser.add_argument("--base-url", help="이미 실행 중인 API 서버(지정 시 서버/스텁을 띄우지 않는다)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-token-delay-ms", type=float, default=20)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+
+    if args.base_url:
+        results = asyncio.run(run_load(base_url=args.base_url, users=args.users, iterations=args.iterations, stream=args.stream))
+    else:
+        with running_stack(
+            database_url=args.database_url,
+            llm_latency_ms=args.llm_latency_ms,
+            llm_token_delay_ms=args.llm_token_delay_ms,
+        ) as api_url:
+            results = asyncio.run(run_load(base_url=api_url, users=args.users, iterations=args.iterations, stream=args.stream))
+
+    report = {"commit": _git_commit(), "config": config, **results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
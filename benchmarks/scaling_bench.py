@@ -0,0 +1,67 @@
+# 워커 수에 따른 처리량 측정: python -m benchmarks.scaling_bench --workers 1 2 4 --output scaling.json
+# 워커 수마다 `python -m app.serve --workers N`을 새로 띄우고 load_test와 같은 흐름을 실행한다.
+# LLM 스텁 지연을 작게 두어(기본 20ms) API 프로세스의 CPU가 병목이 되게 한다.
+# SQLite는 쓰기가 파일 잠금으로 직렬화되므로 워커 확장을 보려면 --database-url로 Postgres를 지정한다.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+from benchmarks.load_test import _git_commit, run_load, running_stack
+
+
+def scaling_table(runs: list[dict]) -> list[dict]:
+    # 워커 1개 대비 처리량 배수와 워커당 효율(선형 확장이면 1.0)
+    baseline = next((run["rps"] for run in runs if run["workers"] == 1), None) or runs[0]["rps"]
+    table = []
+    for run in runs:
+        speedup = run["rps"] / baseline if baseline else 0.0
+        table.append(
+            {
+                "workers": run["workers"],
+                "rps": run["rps"],
+                "error_rate": run["error_rate"],
+                "speedup": round(speedup, 2),
+                "efficiency": round(speedup / run["workers"], 2),
+                "generate_p95_ms": run["endpoints"].get("generate", {}).get("p95_ms"),
+            }
+        )
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--database-url", help="기본값: 임시 SQLite 파일")
+    parser.add_argument("--llm-latency-ms", type=float, default=20)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    runs = []
+    for workers in args.workers:
+        command = [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--workers", str(workers)]
+        command += ["--log-level", "warning", "--no-access-log"]
+        with running_stack(
+            database_url=args.database_url,
+            llm_latency_ms=args.llm_latency_ms,
+            llm_token_delay_ms=0,
+            api_command=command,
+        ) as api_url:
+            results = asyncio.run(run_load(base_url=api_url, users=args.users, iterations=args.iterations, stream=False))
+        runs.append({"workers": workers, **results})
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    report = {"commit": _git_commit(), "cpu_count": os.cpu_count(), "config": config, "scaling": scaling_table(runs), "runs": runs}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# import/기동 시간 측정: python benchmarks/startup_bench.py --runs 5 --output startup.json
+# 매 측정은 새 인터프리터에서 실행한다(모듈 캐시 영향 제거). DB는 임시 SQLite를 쓴다.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+# lifespan(스키마/관리자 계정 준비 포함) + 첫 /health 응답까지
+FIRST_REQUEST_SNIPPET = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+with TestClient(app) as client:
+    assert client.get("/health").status_code == 200
+    print(time.perf_counter() - started)
+"""
+
+
+def _run(snippet: str, env: dict[str, str]) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{tmp}/startup.db",
+            "ECHODIARY_DISABLE_LLM": "true",
+            "IMAGE_JOB_WORKERS_ENABLED": "false",
+        }
+        import_times = [_run(IMPORT_SNIPPET, env) for _ in range(args.runs)]
+        first_request_times = [_run(FIRST_REQUEST_SNIPPET, env) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "import_seconds": _summary(import_times),
+        "first_request_seconds": _summary(first_request_times),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from datetime import date
+
+from app.activity import summarize_activity
+from app.models import AccountDailyActivity
+
+
+def _day(day: date, entries: int, saved: int = 0) -> AccountDailyActivity:
+    return AccountDailyActivity(account_id="acc", day=day, entries=entries, saved=saved, drafts=entries - saved)
+
+
+def test_streaks_and_heatmap_come_from_daily_rows() -> None:
+    rows = [
+        _day(date(2026, 3, 1), 1),
+        _day(date(2026, 3, 2), 2, saved=1),
+        _day(date(2026, 3, 3), 1),
+        _day(date(2026, 3, 4), 0),
+        _day(date(2026, 3, 9), 1, saved=1),
+        _day(date(2026, 3, 10), 3, saved=2),
+    ]
+
+    stats = summarize_activity(rows, today=date(2026, 3, 11), days=3)
+
+    assert stats["current_streak"] == 2
+    assert stats["longest_streak"] == 3
+    assert stats["active_days"] == 5
+    assert stats["total_entries"] == 8
+    assert stats["total_saved"] == 4
+    assert [cell["date"] for cell in stats["heatmap"]] == ["2026-03-09", "2026-03-10"]
+
+
+def test_streak_is_broken_after_a_missed_day() -> None:
+    stats = summarize_activity([_day(date(2026, 3, 1), 1)], today=date(2026, 3, 3), days=30)
+
+    assert stats["current_streak"] == 0
+    assert stats["longest_streak"] == 1
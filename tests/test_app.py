@@ -1,14 +1,21 @@
+import json
 import os
+import subprocess
+import sys
+import tempfile
 from uuid import uuid4
 
 os.environ["DATABASE_URL"] = "sqlite:///./test.db"
 os.environ["ECHODIARY_DISABLE_LLM"] = "true"
+os.environ["EMBEDDING_INDEX_DIR"] = tempfile.mkdtemp(prefix="echodiary-embeddings-")
 
 from fastapi.testclient import TestClient
 
+from app.bootstrap import bootstrap_database
 from app.main import app
 
 
+bootstrap_database()
 client = TestClient(app)
 
 
@@ -114,10 +121,731 @@ def test_diary_and_entries_list_flow() -> None:
 
     diaries_resp = client.get(f"/api/diaries?account_id={username}", headers=headers)
     assert diaries_resp.status_code == 200
-    assert len(diaries_resp.json()) >= 1
+    assert len(diaries_resp.json()["items"]) >= 1
 
     entries_resp = client.get(f"/api/diaries/{diary['id']}/entries", headers=headers)
     assert entries_resp.status_code == 200
-    entries = entries_resp.json()
+    entries = entries_resp.json()["items"]
     assert len(entries) >= 1
     assert "created_at" in entries[0]
+
+
+def test_generate_stream_flow() -> None:
+    username = f"stream-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "스트림"}, headers=headers).json()
+
+    with client.stream(
+        "POST",
+        "/api/entries/generate/stream",
+        json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": "비가 왔다"},
+        headers=headers,
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names[-2:] == ["fallback", "done"]
+
+    done = json.loads(events[-1][1].removeprefix("data: "))
+    assert done["draft"] == "[담백] 비가 왔다"
+    entries = client.get(f"/api/diaries/{diary['id']}/entries", headers=headers).json()["items"]
+    assert [e["id"] for e in entries] == [done["id"]]
+
+
+def test_generate_uses_draft_cache_unless_regenerate(monkeypatch) -> None:
+    import app.main as main_module
+
+    calls: list[str] = []
+
+    async def fake_generate(*, tone: str, source: str, memories: list[str] | None = None) -> str:
+        calls.append(source)
+        return f"생성된 초안 {len(calls)}"
+
+    monkeypatch.setattr(main_module, "agenerate_diary_draft", fake_generate)
+    username = f"cache-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "캐시"}, headers=headers).json()
+    request = {"diary_id": diary["id"], "persona_id": persona["id"], "input_text": f"캐시 {uuid4()}"}
+
+    first = client.post("/api/entries/generate", json=request, headers=headers).json()
+    second = client.post("/api/entries/generate", json=request, headers=headers).json()
+    regenerated = client.post("/api/entries/generate", json={**request, "regenerate": True}, headers=headers).json()
+
+    assert len(calls) == 2
+    assert second == first
+    assert regenerated["draft"] == "생성된 초안 2"
+    entries = client.get(f"/api/diaries/{diary['id']}/entries", headers=headers).json()["items"]
+    assert len(entries) == 2
+
+
+def test_entries_keyset_pagination() -> None:
+    username = f"page-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "페이지"}, headers=headers).json()
+    for i in range(5):
+        client.post(
+            "/api/entries/generate",
+            json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": f"입력 {i}"},
+            headers=headers,
+        )
+
+    seen: list[str] = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get(f"/api/diaries/{diary['id']}/entries", params=params, headers=headers).json()
+        seen.extend(e["id"] for e in page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 5
+
+    bad = client.get(f"/api/diaries/{diary['id']}/entries", params={"cursor": "nope"}, headers=headers)
+    assert bad.status_code == 400
+
+
+def test_role_change_revokes_existing_tokens() -> None:
+    username = f"role-user-{uuid4()}"
+    signup(username, "pw")
+    user_headers = login(username, "pw")
+    me = client.get("/api/auth/me", headers=user_headers).json()
+    assert me["role"] == "user"
+
+    admin_headers = login("admin", "admin")
+    update = client.put(f"/api/admin/users/{me['id']}/role", json={"role": "admin"}, headers=admin_headers)
+    assert update.status_code == 200
+
+    assert client.get("/api/auth/me", headers=user_headers).status_code == 401
+    new_headers = login(username, "pw")
+    assert client.get("/api/admin/page", headers=new_headers).status_code == 200
+
+
+def test_claims_auth_skips_user_lookup_while_cached(monkeypatch) -> None:
+    import app.main as main_module
+
+    username = f"claims-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    lookups: list[str] = []
+    original_get = main_module.Session.get
+
+    def counting_get(self, entity, ident, *args, **kwargs):
+        if entity is main_module.User:
+            lookups.append(ident)
+        return original_get(self, entity, ident, *args, **kwargs)
+
+    monkeypatch.setattr(main_module.Session, "get", counting_get)
+    for _ in range(3):
+        assert client.get("/api/auth/me", headers=headers).json()["username"] == username
+
+    assert lookups == []
+
+
+def test_claims_auth_rechecks_database_when_cached_version_is_stale(monkeypatch) -> None:
+    import app.main as main_module
+    from app.database import SessionLocal
+    from app.models import User, UserRole
+
+    monkeypatch.setattr(main_module, "AUTH_MODE", "claims")
+    username = f"stale-cache-user-{uuid4()}"
+    signup(username, "pw")
+    old_headers = login(username, "pw")
+    user_id = client.get("/api/auth/me", headers=old_headers).json()["id"]
+
+    # 다른 워커가 역할을 바꾸고 버전을 올린 상황: 이 워커의 캐시는 그대로 남아 있다.
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        user.role = UserRole.ADMIN
+        user.token_version += 1
+        db.commit()
+        new_headers = {"Authorization": f"Bearer {main_module.create_access_token(user)}"}
+
+    assert client.get("/api/admin/page", headers=new_headers).status_code == 200
+    assert client.get("/api/auth/me", headers=old_headers).status_code == 401
+
+
+def test_concurrent_identical_generate_requests_share_one_llm_call(monkeypatch) -> None:
+    import asyncio
+
+    import httpx
+
+    import app.main as main_module
+    from app.database import SessionLocal
+    from app.models import Entry
+
+    calls: list[str] = []
+
+    async def slow_generate(*, tone: str, source: str, memories: list[str] | None = None) -> str:
+        calls.append(source)
+        await asyncio.sleep(0.2)
+        return f"한 번만 생성된 초안: {source}"
+
+    monkeypatch.setattr(main_module, "agenerate_diary_draft", slow_generate)
+    username = f"flight-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "중복"}, headers=headers).json()
+    payload = {"diary_id": diary["id"], "persona_id": persona["id"], "input_text": f"더블클릭 {uuid4()}"}
+
+    async def send_together() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(
+                *(async_client.post("/api/entries/generate", json=payload, headers=headers) for _ in range(3))
+            )
+
+    responses = asyncio.run(send_together())
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert calls == [payload["input_text"]]
+    with SessionLocal() as db:
+        assert db.query(Entry).filter(Entry.diary_id == diary["id"]).count() == 1
+
+
+def test_generate_holds_no_db_connection_during_llm_call(monkeypatch) -> None:
+    import app.main as main_module
+    from app.database import engine
+
+    checked_out: list[int] = []
+
+    async def fake_generate(*, tone: str, source: str, memories: list[str] | None = None) -> str:
+        checked_out.append(engine.pool.checkedout())
+        return "커넥션 없이 생성"
+
+    monkeypatch.setattr(main_module, "agenerate_diary_draft", fake_generate)
+    monkeypatch.setattr(main_module, "AUTH_MODE", "db")
+    username = f"pool-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "풀"}, headers=headers).json()
+
+    response = client.post(
+        "/api/entries/generate",
+        json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": f"풀 {uuid4()}"},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert checked_out == [0]
+
+
+def test_image_proxy_streams_ranges_and_revalidates(monkeypatch) -> None:
+    from datetime import UTC, datetime
+
+    import app.main as main_module
+
+    blob = bytes(range(256)) * 4
+    reads: list[tuple[int, int]] = []
+
+    stat_sizes: list[int | None] = []
+
+    def fake_stat(*, image_ref: str, size: int | None = None) -> dict[str, object] | None:
+        stat_sizes.append(size)
+        if image_ref != "diary-images/a1/x.png":
+            return None
+        return {
+            "object_name": image_ref,
+            "size": len(blob),
+            "etag": "abc123",
+            "last_modified": datetime(2026, 10, 1, tzinfo=UTC),
+            "content_type": "image/png",
+        }
+
+    def fake_iter(*, image_ref: str, offset: int = 0, length: int = 0):
+        reads.append((offset, length))
+        data = blob[offset : offset + length] if length else blob[offset:]
+        for i in range(0, len(data), 100):
+            yield data[i : i + 100]
+
+    monkeypatch.setattr(main_module, "stat_image_in_minio", fake_stat)
+    monkeypatch.setattr(main_module, "iter_image_from_minio", fake_iter)
+    signup("image-user", "pw")
+    headers = login("image-user", "pw")
+    url = "/api/images/files/diary-images/a1/x.png"
+
+    full = client.get(url, headers=headers)
+    assert full.status_code == 200
+    assert full.content == blob
+    assert full.headers["etag"] == '"abc123"'
+    assert full.headers["last-modified"] == "Thu, 01 Oct 2026 00:00:00 GMT"
+
+    partial = client.get(url, headers={**headers, "Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == blob[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(blob)}"
+
+    suffix = client.get(url, headers={**headers, "Range": "bytes=-5"})
+    assert suffix.content == blob[-5:]
+
+    unsatisfiable = client.get(url, headers={**headers, "Range": f"bytes={len(blob)}-"})
+    assert unsatisfiable.status_code == 416
+
+    reads.clear()
+    not_modified = client.get(url, headers={**headers, "If-None-Match": '"abc123"'})
+    assert not_modified.status_code == 304
+    assert reads == []
+
+    assert client.get("/api/images/files/diary-images/a1/missing.png", headers=headers).status_code == 404
+
+    stat_sizes.clear()
+    client.get(url, params={"size": 256}, headers=headers)
+    assert stat_sizes == [256]
+
+
+def test_read_endpoints_on_async_session(monkeypatch) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    import app.main as main_module
+
+    username = f"async-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "비동기"}, headers=headers).json()
+    client.post(
+        "/api/entries/generate",
+        json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": "비동기 읽기"},
+        headers=headers,
+    )
+
+    async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+    monkeypatch.setattr(main_module, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+    monkeypatch.setattr(main_module, "AUTH_MODE", "db")
+
+    assert client.get("/api/auth/me", headers=headers).json()["username"] == username
+    assert [p["id"] for p in client.get(f"/api/personas?account_id={username}", headers=headers).json()] == [persona["id"]]
+    assert [d["id"] for d in client.get(f"/api/diaries?account_id={username}", headers=headers).json()["items"]] == [
+        diary["id"]
+    ]
+    entries = client.get(f"/api/diaries/{diary['id']}/entries", headers=headers).json()["items"]
+    assert [e["draft"] for e in entries] == ["[담백] 비동기 읽기"]
+
+
+def test_import_is_side_effect_free() -> None:
+    # DB에 닿지 않고, 무거운 LLM 스택도 불러오지 않아야 한다.
+    code = (
+        "import sys, app.main; "
+        "assert 'langchain_openai' not in sys.modules; "
+        "assert 'langgraph.graph' not in sys.modules; "
+        "assert 'openai' not in sys.modules; "
+        "assert 'numpy' not in sys.modules"
+    )
+    env = {**os.environ, "DATABASE_URL": "postgresql+psycopg://u:p@127.0.0.1:1/none"}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_db_queries_are_counted_per_request() -> None:
+    from prometheus_client import REGISTRY
+
+    username = f"metrics-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    labels = {"handler": "/api/diaries"}
+    before = REGISTRY.get_sample_value("echodiary_request_db_queries_count", labels) or 0.0
+
+    response = client.post("/api/diaries", json={"account_id": username, "title": "메트릭"}, headers=headers)
+
+    assert response.status_code == 200
+    assert REGISTRY.get_sample_value("echodiary_request_db_queries_count", labels) == before + 1
+    assert REGISTRY.get_sample_value("echodiary_request_db_queries_sum", labels) > 0
+    assert "echodiary_llm_request_seconds" in client.get("/metrics").text
+
+
+def test_pool_checkout_is_timed_through_public_connect() -> None:
+    from prometheus_client import REGISTRY
+
+    from sqlalchemy import select
+
+    from app.database import SessionLocal, TimedQueuePool, engine
+
+    assert isinstance(engine.pool, TimedQueuePool)
+    before = REGISTRY.get_sample_value("echodiary_db_pool_checkout_wait_seconds_count") or 0.0
+
+    with SessionLocal() as db:
+        db.execute(select(1))
+
+    # 세션이 연결을 얻는 경로가 바뀌어 Pool.connect()를 거치지 않으면 이 값이 그대로다.
+    assert REGISTRY.get_sample_value("echodiary_db_pool_checkout_wait_seconds_count") == before + 1
+
+
+def test_generate_returns_429_with_retry_after_over_user_rate(monkeypatch) -> None:
+    from app.limits import generation_admission
+
+    monkeypatch.setattr(generation_admission, "burst", 1)
+    username = f"limited-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "제한"}, headers=headers).json()
+    request = {"diary_id": diary["id"], "persona_id": persona["id"], "input_text": "연속 요청"}
+
+    first = client.post("/api/entries/generate", json=request, headers=headers)
+    second = client.post("/api/entries/generate/stream", json=request, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert second.json()["reason"] == "user_rate"
+
+
+def test_admin_changes_llm_routing_at_runtime() -> None:
+    admin_headers = login("admin", "admin")
+    username = f"routing-user-{uuid4()}"
+    signup(username, "pw")
+    user_headers = login(username, "pw")
+
+    assert client.get("/api/admin/llm-routing", headers=user_headers).status_code == 403
+
+    update = {"routes": {"text-small": [{"provider": "gemini", "model": "gemini-2.5-flash"}, {"provider": "openai", "model": "gpt-4.1-mini"}]}}
+    updated = client.put("/api/admin/llm-routing", json=update, headers=admin_headers)
+    assert updated.status_code == 200
+    body = updated.json()
+    assert [route["provider"] for route in body["routes"]["text-small"]] == ["gemini", "openai"]
+    assert body["routes"]["image"][0]["model"] == "gpt-image-1"
+
+    invalid = client.put(
+        "/api/admin/llm-routing", json={"routes": {"text-small": [{"provider": "claude", "model": "x"}]}}, headers=admin_headers
+    )
+    assert invalid.status_code == 422
+
+    history = client.get("/api/admin/llm-routing/history", headers=admin_headers).json()
+    assert history[0]["version"] == body["version"]
+
+    reset = client.delete("/api/admin/llm-routing", headers=admin_headers).json()
+    assert reset["routes"]["text-small"][0]["provider"] == "openai"
+
+    restored = client.post(f"/api/admin/llm-routing/{body['version']}/restore", headers=admin_headers).json()
+    assert restored["routes"]["text-small"][0]["provider"] == "gemini"
+    client.delete("/api/admin/llm-routing", headers=admin_headers)
+
+
+def test_search_entries_by_korean_keyword() -> None:
+    username = f"search-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "검색 일기"}, headers=headers).json()
+
+    entry_ids = []
+    for text in ["한강에서 산책하고 커피를 마셨다", "회사에서 회의가 길어졌다", "주말에 Walking 모임"]:
+        generated = client.post(
+            "/api/entries/generate",
+            json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": text},
+            headers=headers,
+        ).json()
+        entry_ids.append(generated["id"])
+    client.post(f"/api/entries/{entry_ids[1]}/save", json={"draft": "저녁에는 친구와 산책했다"}, headers=headers)
+
+    def search(q: str, account_id: str = username) -> list[str]:
+        response = client.get("/api/search/entries", params={"account_id": account_id, "q": q}, headers=headers)
+        assert response.status_code == 200
+        return [item["id"] for item in response.json()["items"]]
+
+    assert search("산책") == [entry_ids[1], entry_ids[0]]
+    assert search("커피 한강") == [entry_ids[0]]
+    assert search("친구") == [entry_ids[1]]
+    assert search("수영") == []
+    assert search("walk") == [entry_ids[2]]
+    assert search("산책", account_id=f"other-{uuid4()}") == []
+    assert client.get("/api/search/entries", params={"account_id": username, "q": "!!"}, headers=headers).status_code == 400
+
+
+def test_similar_entries_use_saved_entries_of_the_account() -> None:
+    username = f"similar-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "비슷한 날"}, headers=headers).json()
+
+    saved = []
+    for text in ["한강에서 산책하고 커피를 마셨다", "회사에서 회의가 길어졌다", "저녁에 한강 산책을 또 했다"]:
+        entry = client.post(
+            "/api/entries/generate",
+            json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": text},
+            headers=headers,
+        ).json()
+        client.post(f"/api/entries/{entry['id']}/save", json={"draft": text}, headers=headers)
+        saved.append(entry["id"])
+
+    def similar(**params) -> list[str]:
+        response = client.get("/api/search/similar", params={"account_id": username, **params}, headers=headers)
+        assert response.status_code == 200
+        return [item["id"] for item in response.json()["items"]]
+
+    assert similar(entry_id=saved[0], limit=1) == [saved[2]]
+    assert set(similar(text="한강 산책", limit=2)) == {saved[0], saved[2]}
+    assert similar(text="한강 산책", account_id=f"other-{uuid4()}") == []
+    assert client.get("/api/search/similar", params={"account_id": username}, headers=headers).status_code == 400
+
+
+def test_generation_is_grounded_on_similar_saved_entries(monkeypatch) -> None:
+    import app.main as main_module
+
+    received: list[list[str] | None] = []
+
+    async def fake_generate(*, tone: str, source: str, memories: list[str] | None = None) -> str:
+        received.append(memories)
+        return f"참고 초안 {len(received)}"
+
+    monkeypatch.setattr(main_module, "agenerate_diary_draft", fake_generate)
+    monkeypatch.setattr(main_module, "LLM_GROUNDING_ENTRIES", 2)
+    username = f"grounding-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "참고"}, headers=headers).json()
+    payload = {"diary_id": diary["id"], "persona_id": persona["id"], "input_text": "한강 산책"}
+
+    first = client.post("/api/entries/generate", json=payload, headers=headers).json()
+    client.post(f"/api/entries/{first['id']}/save", json={"draft": "한강에서 산책을 오래 했다"}, headers=headers)
+    client.post("/api/entries/generate", json={**payload, "input_text": "오늘도 한강 산책"}, headers=headers)
+
+    assert received == [[], ["한강에서 산책을 오래 했다"]]
+
+
+def test_activity_rollup_tracks_generate_and_save() -> None:
+    from app.activity import rebuild_activity
+    from app.database import SessionLocal
+
+    username = f"activity-user-{uuid4()}"
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "기록"}, headers=headers).json()
+    entry_ids = [
+        client.post(
+            "/api/entries/generate",
+            json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": f"활동 {index}"},
+            headers=headers,
+        ).json()["id"]
+        for index in range(3)
+    ]
+    client.post(f"/api/entries/{entry_ids[0]}/save", json={"draft": "저장"}, headers=headers)
+    client.post(f"/api/entries/{entry_ids[0]}/save", json={"draft": "다시 저장"}, headers=headers)
+
+    def stats() -> dict:
+        response = client.get("/api/stats/activity", params={"account_id": username}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    incremental = stats()
+    assert incremental["current_streak"] == 1
+    assert incremental["heatmap"][0]["entries"] == 3
+    assert incremental["heatmap"][0]["saved"] == 1
+    assert incremental["heatmap"][0]["drafts"] == 2
+
+    with SessionLocal() as db:
+        rebuild_activity(db)
+    assert stats() == incremental
+
+
+def _export_fixture(username: str) -> tuple[dict[str, str], dict, dict, str]:
+    signup(username, "pw")
+    headers = login(username, "pw")
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": username, "name": "기본", "tone": "담백", "description": "desc"},
+        headers=headers,
+    ).json()
+    diary = client.post("/api/diaries", json={"account_id": username, "title": "기록"}, headers=headers).json()
+    entry_id = client.post(
+        "/api/entries/generate",
+        json={"diary_id": diary["id"], "persona_id": persona["id"], "input_text": "내보내기"},
+        headers=headers,
+    ).json()["id"]
+    return headers, persona, diary, entry_id
+
+
+def test_export_streams_account_records_as_ndjson() -> None:
+    username = f"export-user-{uuid4()}"
+    headers, persona, diary, entry_id = _export_fixture(username)
+    _export_fixture(f"export-other-{uuid4()}")
+
+    response = client.get("/api/export", params={"account_id": username}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in response.headers["content-disposition"]
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[0]["type"] == "export"
+    assert records[0]["account_id"] == username
+    assert [(record["type"], record.get("id")) for record in records[1:]] == [
+        ("persona", persona["id"]),
+        ("diary", diary["id"]),
+        ("entry", entry_id),
+    ]
+    assert records[-1]["input_text"] == "내보내기"
+
+    assert client.get("/api/export", params={"account_id": username, "format": "tar"}, headers=headers).status_code == 422
+
+
+def test_export_zip_includes_minio_images(monkeypatch) -> None:
+    import io
+    import zipfile
+
+    import app.export as export_module
+    from app.database import SessionLocal
+    from app.models import Entry
+
+    username = f"export-zip-{uuid4()}"
+    headers, _persona, _diary, entry_id = _export_fixture(username)
+    with SessionLocal() as db:
+        db.get(Entry, entry_id).image_url = "entries/present.webp"
+        db.commit()
+    missing_id = client.post(
+        "/api/entries/generate",
+        json={"diary_id": _diary["id"], "persona_id": _persona["id"], "input_text": "이미지 없음"},
+        headers=headers,
+    ).json()["id"]
+    with SessionLocal() as db:
+        db.get(Entry, missing_id).image_url = "entries/missing.webp"
+        db.commit()
+
+    def fake_stat(*, image_ref: str, size: int | None = None):
+        if "missing" in image_ref:
+            return None
+        return {"object_name": image_ref, "size": 6, "etag": "e", "last_modified": None, "content_type": "image/webp"}
+
+    monkeypatch.setattr(export_module, "stat_image_in_minio", fake_stat)
+    monkeypatch.setattr(export_module, "iter_image_from_minio", lambda *, image_ref: iter([b"abc", b"def"]))
+
+    response = client.get("/api/export", params={"account_id": username, "format": "zip"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        assert archive.read(f"images/entries/{entry_id}.webp") == b"abcdef"
+        assert f"images/entries/{missing_id}.webp" not in archive.namelist()
+        records = [json.loads(line) for line in archive.read("archive.ndjson").decode("utf-8").splitlines()]
+    exported = {record["id"]: record for record in records if record["type"] == "entry"}
+    assert exported[entry_id]["image_path"] == f"images/entries/{entry_id}.webp"
+
+
+def test_import_round_trips_export_and_reports_row_errors() -> None:
+    source = f"import-source-{uuid4()}"
+    headers, _persona, _diary, entry_id = _export_fixture(source)
+    client.post(f"/api/entries/{entry_id}/save", json={"draft": "가져온 산책 기록"}, headers=headers)
+    exported = client.get("/api/export", params={"account_id": source}, headers=headers).text
+    body = exported + "not json\n" + json.dumps({"type": "entry", "diary_id": "nope", "draft": "x"}) + "\n"
+
+    target = f"import-target-{uuid4()}"
+    response = client.post(
+        "/api/import", params={"account_id": target}, content=body.encode("utf-8"), headers=headers
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == {"persona": 1, "diary": 1, "diary_persona": 0, "entry": 1}
+    assert result["failed"] == 2
+    assert [error["line"] for error in result["errors"]] == [5, 6]
+    assert result["errors"][1]["error"].startswith("unknown diary_id")
+
+    records = [
+        json.loads(line)
+        for line in client.get("/api/export", params={"account_id": target}, headers=headers).text.splitlines()
+    ]
+    persona, diary, entry = records[1:]
+    assert persona["id"] != _persona["id"] and diary["id"] != _diary["id"]
+    assert entry["diary_id"] == diary["id"] and entry["persona_id"] == persona["id"]
+    assert entry["draft"] == "가져온 산책 기록" and entry["status"] == "saved"
+
+    search = client.get("/api/search/entries", params={"account_id": target, "q": "산책"}, headers=headers).json()
+    assert [item["id"] for item in search["items"]] == [entry["id"]]
+    activity = client.get("/api/stats/activity", params={"account_id": target}, headers=headers).json()
+    assert activity["total_entries"] == 1 and activity["total_saved"] == 1
+
+
+def test_import_csv_uses_default_diary_and_persona() -> None:
+    username = f"import-csv-{uuid4()}"
+    headers, persona, diary, _entry_id = _export_fixture(username)
+    body = (
+        "draft,input_text,created_at,status\n"
+        '"첫 줄\n둘째 줄",메모,2024-01-02T09:00:00+09:00,\n'
+        ",빈 본문,,\n"
+        "초안,,2024-01-03,draft\n"
+    )
+
+    response = client.post(
+        "/api/import",
+        params={"account_id": username, "format": "csv", "diary_id": diary["id"], "persona_id": persona["id"]},
+        content=body.encode("utf-8"),
+        headers=headers,
+    )
+
+    result = response.json()
+    assert result["imported"]["entry"] == 2
+    assert result["failed"] == 1
+    assert result["errors"][0]["line"] == 4 and "draft" in result["errors"][0]["error"]
+    activity = client.get(
+        "/api/stats/activity", params={"account_id": username, "days": 3660}, headers=headers
+    ).json()
+    assert {cell["date"]: cell["saved"] for cell in activity["heatmap"] if cell["date"] < "2025"} == {
+        "2024-01-02": 1,
+        "2024-01-03": 0,
+    }
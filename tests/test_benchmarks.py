@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from benchmarks.fake_llm import create_app
+from benchmarks.load_test import percentile, summarize
+
+
+def test_fake_llm_speaks_openai_protocol() -> None:
+    http_client = TestClient(create_app(latency_ms=0, token_delay_ms=0, tokens=3))
+    sdk = OpenAI(api_key="sk-test", base_url="http://testserver/v1", http_client=http_client)
+    messages = [{"role": "user", "content": "산책 커피"}]
+
+    completion = sdk.chat.completions.create(model="fake", messages=messages)
+    streamed = "".join(
+        chunk.choices[0].delta.content or ""
+        for chunk in sdk.chat.completions.create(model="fake", messages=messages, stream=True)
+    )
+
+    assert completion.choices[0].message.content == "산책 커피 산책"
+    assert streamed.strip() == "산책 커피 산책"
+    assert sdk.images.generate(model="fake", prompt="x").data[0].b64_json
+
+
+def test_summary_reports_percentiles_and_error_rate() -> None:
+    samples = {"generate": [(i / 1000, i != 100) for i in range(1, 101)]}
+
+    report = summarize(samples, elapsed=2.0)
+
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert report["requests"] == 100
+    assert report["error_rate"] == 0.01
+    assert report["rps"] == 50.0
+    assert report["endpoints"]["generate"]["p95_ms"] == 95.0
+    assert report["endpoints"]["generate"]["p99_ms"] == 99.0
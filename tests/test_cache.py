@@ -0,0 +1,76 @@
+from app.cache import DraftCache, LRUCache, draft_cache_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_draft_cache_key_normalizes_whitespace_and_tracks_prompt_inputs() -> None:
+    base = draft_cache_key(source="오늘  산책\n했다 ", tone="담백", model="m", prompt_version="v1")
+
+    assert base == draft_cache_key(source="오늘 산책 했다", tone="담백", model="m", prompt_version="v1")
+    assert base != draft_cache_key(source="오늘 산책 했다", tone="발랄", model="m", prompt_version="v1")
+    assert base != draft_cache_key(source="오늘 산책 했다", tone="담백", model="m2", prompt_version="v1")
+    assert base != draft_cache_key(source="오늘 산책 했다", tone="담백", model="m", prompt_version="v2")
+
+
+def test_lru_cache_expires_entries_after_ttl() -> None:
+    clock = FakeClock()
+    cache = LRUCache(max_bytes=1024, ttl_seconds=10, clock=clock)
+    cache.set("k", "v")
+
+    clock.now = 9
+    assert cache.get("k") == "v"
+    clock.now = 10
+    assert cache.get("k") is None
+    assert cache.size_bytes == 0
+
+
+def test_lru_cache_evicts_least_recently_used_by_size() -> None:
+    cache = LRUCache(max_bytes=10, ttl_seconds=60)
+    cache.set("a", "1111")
+    cache.set("b", "2222")
+    cache.get("a")
+    cache.set("c", "3333")
+
+    assert cache.get("a") == "1111"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3333"
+    assert cache.size_bytes <= 10
+
+
+def test_db_draft_cache_prunes_expired_rows_on_write(tmp_path) -> None:
+    from datetime import UTC, datetime, timedelta
+
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+
+    from app.models import DraftCacheEntry
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    DraftCacheEntry.__table__.create(engine)
+    clock = FakeClock()
+    cache = DraftCache(memory=LRUCache(max_bytes=1024, ttl_seconds=60), use_db=True, clock=clock)
+    stale = datetime.now(UTC) - timedelta(seconds=120)
+
+    with Session(engine) as db:
+        db.add(DraftCacheEntry(key="old", draft="지난 초안", created_at=stale))
+        db.commit()
+        cache.set(db, "new", "새 초안")
+        db.commit()
+        assert set(db.scalars(select(DraftCacheEntry.key))) == {"new"}
+
+        # 간격 안의 쓰기는 지우지 않는다.
+        db.add(DraftCacheEntry(key="old", draft="지난 초안", created_at=stale))
+        cache.set(db, "newer", "더 새 초안")
+        db.commit()
+        assert set(db.scalars(select(DraftCacheEntry.key))) == {"old", "new", "newer"}
+
+        clock.now += 300
+        cache.set(db, "newest", "가장 새 초안")
+        db.commit()
+        assert set(db.scalars(select(DraftCacheEntry.key))) == {"new", "newer", "newest"}
@@ -0,0 +1,141 @@
+import os
+import time
+from uuid import uuid4
+
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+os.environ["ECHODIARY_DISABLE_LLM"] = "true"
+
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.jobs import ImageJobRunner
+from app.bootstrap import bootstrap_database
+from app.main import app
+from app.models import ImageStatus, Persona
+
+bootstrap_database()
+client = TestClient(app)
+
+
+def auth_headers() -> dict[str, str]:
+    username = f"job-user-{uuid4()}"
+    client.post("/api/auth/signup", json={"username": username, "password": "pw"})
+    token = client.post("/api/auth/login", json={"username": username, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_persona(headers: dict[str, str]) -> str:
+    persona = client.post(
+        "/api/personas",
+        json={"account_id": "job-account", "name": "기본", "tone": "담백", "description": "산책하는 사람"},
+        headers=headers,
+    ).json()
+    return persona["id"]
+
+
+def persona_image(persona_id: str) -> tuple[str | None, ImageStatus]:
+    with SessionLocal() as db:
+        persona = db.get(Persona, persona_id)
+        return persona.image_url, persona.image_status
+
+
+def test_enqueue_is_idempotent_and_job_succeeds_with_stub() -> None:
+    headers = auth_headers()
+    persona_id = create_persona(headers)
+
+    first = client.post("/api/images/jobs", json={"kind": "persona", "target_id": persona_id}, headers=headers)
+    second = client.post("/api/images/jobs", json={"kind": "persona", "target_id": persona_id}, headers=headers)
+    assert first.status_code == 202
+    assert first.json()["status"] == "queued"
+    assert second.json()["id"] == first.json()["id"]
+
+    prompts: list[str] = []
+    runner = ImageJobRunner(
+        generate_image=lambda text: prompts.append(text) or b"png",
+        store_image=lambda image, account_id: f"diary-images/{account_id}/stub.png",
+    )
+    runner.run_pending()
+
+    job = client.get(f"/api/images/jobs/{first.json()['id']}", headers=headers).json()
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 1
+    assert prompts == ["기본 (담백): 산책하는 사람"]
+    assert persona_image(persona_id) == ("diary-images/job-account/stub.png", ImageStatus.SUCCESS)
+
+
+def test_failed_job_retries_then_marks_target_failed() -> None:
+    headers = auth_headers()
+    persona_id = create_persona(headers)
+    job_id = client.post(
+        "/api/images/jobs", json={"kind": "persona", "target_id": persona_id}, headers=headers
+    ).json()["id"]
+
+    runner = ImageJobRunner(backoff_seconds=0, generate_image=lambda _text: None, store_image=lambda *_: "unused")
+    runner.run_pending()
+
+    job = client.get(f"/api/images/jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "failed"
+    assert job["attempts"] == job["max_attempts"]
+    assert job["last_error"] == "image generation returned no data"
+    assert persona_image(persona_id)[1] == ImageStatus.FAILED
+
+    retried = client.post("/api/images/jobs", json={"kind": "persona", "target_id": persona_id}, headers=headers)
+    assert retried.json()["id"] == job_id
+    assert retried.json()["status"] == "queued"
+
+
+def test_expired_lease_requeues_only_while_attempts_remain() -> None:
+    headers = auth_headers()
+    persona_id = create_persona(headers)
+    job_id = client.post(
+        "/api/images/jobs", json={"kind": "persona", "target_id": persona_id}, headers=headers
+    ).json()["id"]
+
+    # 워커가 실행 도중 죽어 RUNNING으로 남는 상황을 흉내 낸다(lease_seconds=0이면 곧바로 만료).
+    runner = ImageJobRunner(lease_seconds=0, generate_image=lambda _text: b"png", store_image=lambda *_: "unused")
+    for attempt in range(1, 4):
+        assert job_id in runner._claim_due(100)
+        assert client.get(f"/api/images/jobs/{job_id}", headers=headers).json()["attempts"] == attempt
+
+    assert job_id not in runner._claim_due(100)
+    job = client.get(f"/api/images/jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "failed"
+    assert job["last_error"] == "lease expired"
+    assert persona_image(persona_id)[1] == ImageStatus.FAILED
+
+
+def test_worker_pool_processes_jobs_in_background() -> None:
+    headers = auth_headers()
+    job_ids = [
+        client.post(
+            "/api/images/jobs", json={"kind": "persona", "target_id": create_persona(headers)}, headers=headers
+        ).json()["id"]
+        for _ in range(3)
+    ]
+
+    runner = ImageJobRunner(
+        concurrency=2,
+        poll_seconds=0.01,
+        generate_image=lambda _text: b"png",
+        store_image=lambda _image, _account_id: "stub.png",
+    )
+    runner.start()
+    try:
+        deadline = time.monotonic() + 5
+        statuses: list[str] = []
+        while time.monotonic() < deadline:
+            statuses = [client.get(f"/api/images/jobs/{job_id}", headers=headers).json()["status"] for job_id in job_ids]
+            if all(status == "succeeded" for status in statuses):
+                break
+            time.sleep(0.02)
+    finally:
+        runner.stop()
+
+    assert statuses == ["succeeded"] * 3
+
+
+def test_unknown_target_returns_404() -> None:
+    response = client.post(
+        "/api/images/jobs", json={"kind": "entry", "target_id": str(uuid4())}, headers=auth_headers()
+    )
+    assert response.status_code == 404
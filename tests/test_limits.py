@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+
+import pytest
+from sqlalchemy import select
+
+from app.bootstrap import bootstrap_database
+from app.limits import AdmissionController, AdmissionRejected, DatabaseTokenBucketBackend, MemoryTokenBucketBackend
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize("backend_type", ["memory", "db"])
+def test_token_bucket_refills_at_rate(backend_type: str) -> None:
+    clock = FakeClock()
+    if backend_type == "db":
+        bootstrap_database()
+        backend = DatabaseTokenBucketBackend(clock=clock)
+    else:
+        backend = MemoryTokenBucketBackend(clock=clock)
+    key = f"test:{backend_type}:{os.getpid()}:{id(clock)}"
+
+    assert backend.take(key, rate=0.5, burst=2) == 0
+    assert backend.take(key, rate=0.5, burst=2) == 0
+    assert backend.take(key, rate=0.5, burst=2) == pytest.approx(2.0)
+
+    clock.now += 2
+    assert backend.take(key, rate=0.5, burst=2) == 0
+    assert backend.take(key, rate=0.5, burst=2) == pytest.approx(2.0)
+
+
+def test_db_bucket_keeps_retrying_insert_races_then_rejects(monkeypatch) -> None:
+    from sqlalchemy.exc import IntegrityError
+
+    bootstrap_database()
+    backend = DatabaseTokenBucketBackend(clock=FakeClock())
+    attempts: list[str] = []
+
+    def conflicting_take(key: str, **_kwargs) -> float:
+        attempts.append(key)
+        raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+    monkeypatch.setattr(backend, "_take", conflicting_take)
+
+    assert backend.take("race:u1", rate=0.5, burst=2) == pytest.approx(2.0)
+    assert len(attempts) == 3
+
+
+def test_db_buckets_idle_past_refill_window_are_pruned() -> None:
+    from app.database import SessionLocal
+    from app.models import RateLimitBucket
+
+    bootstrap_database()
+    clock = FakeClock()
+    backend = DatabaseTokenBucketBackend(clock=clock)
+    prefix = f"prune_{os.getpid()}_{id(clock)}"
+    backend.take(f"{prefix}:idle", rate=1.0, burst=5)
+    backend.take(f"other_{prefix}:idle", rate=1.0, burst=5)
+
+    clock.now += 400  # burst/rate(5초)와 정리 간격을 모두 넘긴다.
+    backend.take(f"{prefix}:active", rate=1.0, burst=5)
+
+    with SessionLocal() as db:
+        keys = set(db.scalars(select(RateLimitBucket.key).where(RateLimitBucket.key.contains(prefix))))
+    assert keys == {f"{prefix}:active", f"other_{prefix}:idle"}
+
+
+def test_user_rate_rejection_carries_retry_after() -> None:
+    limiter = AdmissionController(
+        "test_rate", backend=MemoryTokenBucketBackend(clock=FakeClock()), rate_per_minute=6, burst=1
+    )
+    limiter.check_rate("u1")
+    limiter.check_rate("u2")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check_rate("u1")
+
+    assert rejected.value.reason == "user_rate"
+    assert rejected.value.retry_after_header == "10"
+
+
+def test_slots_queue_then_fail_fast_when_full() -> None:
+    limiter = AdmissionController(
+        "test_slots",
+        backend=MemoryTokenBucketBackend(),
+        rate_per_minute=0,
+        burst=0,
+        max_concurrency=1,
+        max_queue=1,
+        queue_timeout=0.05,
+    )
+
+    async def scenario() -> list[str]:
+        release = asyncio.Event()
+        outcomes: list[str] = []
+
+        async def hold() -> None:
+            async with limiter.slot():
+                await release.wait()
+
+        async def attempt() -> None:
+            try:
+                async with limiter.slot():
+                    outcomes.append("ran")
+            except AdmissionRejected as exc:
+                outcomes.append(exc.reason)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(attempt())
+        await asyncio.sleep(0)
+        await attempt()
+        await queued
+        release.set()
+        await holder
+        await attempt()
+        return outcomes
+
+    assert asyncio.run(scenario()) == ["queue_full", "queue_timeout", "ran"]
+    assert limiter.stats()["in_flight"] == 0
@@ -0,0 +1,120 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app import llm
+from app.resilience import CircuitBreaker
+
+
+def test_async_draft_uses_fallback_when_llm_disabled(monkeypatch) -> None:
+    monkeypatch.setenv("ECHODIARY_DISABLE_LLM", "true")
+
+    draft = asyncio.run(llm.agenerate_diary_draft(tone="담백", source="오늘 산책했다"))
+
+    assert draft == "[담백] 오늘 산책했다"
+    assert llm.generate_diary_draft(tone="담백", source="오늘 산책했다") == draft
+
+
+def test_sync_draft_goes_through_async_route_loop(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ECHODIARY_DISABLE_LLM", "false")
+
+    class AsyncOnly:
+        async def ainvoke(self, _messages):
+            from langchain_core.messages import AIMessage
+
+            return AIMessage(content="동기 호출도 같은 경로.")
+
+    monkeypatch.setattr(llm, "_get_chat_model", lambda *_args: AsyncOnly())
+
+    assert llm.generate_diary_draft(tone="담백", source="산책") == "동기 호출도 같은 경로."
+
+
+def test_chat_model_is_shared_per_configuration() -> None:
+    first = llm._get_chat_model("gpt-4.1-mini", "sk-test")
+    second = llm._get_chat_model("gpt-4.1-mini", "sk-test")
+    other = llm._get_chat_model("gpt-4.1", "sk-test")
+
+    assert first is second
+    assert first is not other
+
+
+def test_stream_relays_compose_tokens(monkeypatch) -> None:
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ECHODIARY_DISABLE_LLM", "false")
+    fake = GenericFakeChatModel(messages=iter([AIMessage(content="오늘은 비가 왔다. 우산을 챙겼다.")]))
+    monkeypatch.setattr(llm, "_get_chat_model", lambda *_args: fake)
+
+    async def collect() -> list[tuple[str, str]]:
+        return [event async for event in llm.astream_diary_draft(tone="담백", source="비")]
+
+    events = asyncio.run(collect())
+    tokens = [text for kind, text in events if kind == "token"]
+
+    assert len(tokens) > 1
+    assert events[-1] == ("draft", "오늘은 비가 왔다. 우산을 챙겼다.")
+    assert "".join(tokens) == events[-1][1]
+
+
+def _sample(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_llm_metrics_record_tokens_and_failures(monkeypatch) -> None:
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ECHODIARY_DISABLE_LLM", "false")
+    monkeypatch.setenv("OPENAI_MODEL", "metrics-model")
+    reply = AIMessage(content="산책을 했다.", usage_metadata={"input_tokens": 12, "output_tokens": 5, "total_tokens": 17})
+    monkeypatch.setattr(llm, "_get_chat_model", lambda *_args: GenericFakeChatModel(messages=iter([reply])))
+    model = {"model": "metrics-model"}
+    before_input = _sample("echodiary_llm_tokens_total", {**model, "kind": "input"})
+    before_success = _sample("echodiary_llm_request_seconds_count", {**model, "outcome": "success"})
+
+    assert asyncio.run(llm.agenerate_diary_draft(tone="담백", source="산책")) == "산책을 했다."
+    assert _sample("echodiary_llm_tokens_total", {**model, "kind": "input"}) == before_input + 12
+    assert _sample("echodiary_llm_request_seconds_count", {**model, "outcome": "success"}) == before_success + 1
+
+    class TimingOut:
+        async def ainvoke(self, _messages):
+            raise TimeoutError
+
+    monkeypatch.setattr(llm, "_get_chat_model", lambda *_args: TimingOut())
+    before_timeouts = _sample("echodiary_llm_errors_total", {**model, "reason": "timeout"})
+    before_fallbacks = _sample("echodiary_llm_fallbacks_total", {**model, "reason": "timeout"})
+
+    assert asyncio.run(llm.agenerate_diary_draft(tone="담백", source="산책")) == "[담백] 산책"
+    assert _sample("echodiary_llm_errors_total", {**model, "reason": "timeout"}) == before_timeouts + 1
+    assert _sample("echodiary_llm_fallbacks_total", {**model, "reason": "timeout"}) == before_fallbacks + 1
+
+
+def test_open_breaker_falls_back_without_calling_upstream(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ECHODIARY_DISABLE_LLM", "false")
+    monkeypatch.setenv("OPENAI_MODEL", "breaker-model")
+    monkeypatch.setattr(CircuitBreaker, "allow", lambda _self: False)
+
+    def unexpected(*_args):
+        raise AssertionError("upstream must not be called while the breaker is open")
+
+    monkeypatch.setattr(llm, "_get_chat_model", unexpected)
+    labels = {"model": "breaker-model", "reason": "circuit_open"}
+    before = _sample("echodiary_llm_fallbacks_total", labels)
+
+    assert asyncio.run(llm.agenerate_diary_draft(tone="담백", source="정전")) == "[담백] 정전"
+    assert _sample("echodiary_llm_fallbacks_total", labels) == before + 1
+
+
+def test_prompt_includes_recalled_entries_only_when_present() -> None:
+    state = {"tone": "담백", "source": "산책", "memories": ["어제도 한강을 걸었다."], "draft": ""}
+
+    grounded = llm._build_messages(state)[-1].content
+    plain = llm._build_messages({**state, "memories": []})[-1].content
+
+    assert "어제도 한강을 걸었다." in grounded
+    assert "지난 일기" not in plain
@@ -0,0 +1,145 @@
+from app import media
+
+
+def configure_minio(monkeypatch, endpoint: str = "localhost:9000") -> None:
+    monkeypatch.setenv("MINIO_ENDPOINT", endpoint)
+    monkeypatch.setenv("MINIO_ACCESS_KEY", "access")
+    monkeypatch.setenv("MINIO_SECRET_KEY", "secret")
+    monkeypatch.setenv("MINIO_BUCKET", "echodiary-test")
+
+
+def test_minio_client_is_reused_until_config_changes(monkeypatch) -> None:
+    configure_minio(monkeypatch)
+    first, bucket, _secure = media._get_minio_client()
+    second, _bucket, _secure = media._get_minio_client()
+
+    configure_minio(monkeypatch, endpoint="minio:9000")
+    rebuilt, _bucket, _secure = media._get_minio_client()
+
+    assert bucket == "echodiary-test"
+    assert first is second
+    assert rebuilt is not first
+
+
+def test_bucket_existence_is_checked_once_per_bucket(monkeypatch) -> None:
+    configure_minio(monkeypatch, endpoint=f"bucket-check-{id(monkeypatch)}:9000")
+    client, _bucket, _secure = media._get_minio_client()
+    checks: list[str] = []
+    uploads: list[str] = []
+    monkeypatch.setattr(client, "bucket_exists", lambda bucket: checks.append(bucket) or True)
+    monkeypatch.setattr(client, "put_object", lambda bucket, name, **_kwargs: uploads.append(name))
+
+    assert media.bootstrap_minio() is True
+    media.upload_image_to_minio(image_bytes=b"png", account_id="a1")
+    media.upload_image_to_minio(image_bytes=b"png", account_id="a1")
+
+    assert checks == ["echodiary-test"]
+    assert len(uploads) == 2
+
+
+def test_presigned_url_is_reused_within_expiry_bucket(monkeypatch) -> None:
+    configure_minio(monkeypatch, endpoint=f"presign-{id(monkeypatch)}:9000")
+    client, _bucket, _secure = media._get_minio_client()
+    signed_at: list[int] = []
+
+    def fake_presign(bucket, object_name, *, expires, request_date):
+        signed_at.append(int(request_date.timestamp()))
+        return f"http://minio/{bucket}/{object_name}?date={signed_at[-1]}&expires={int(expires.total_seconds())}"
+
+    monkeypatch.setattr(client, "presigned_get_object", fake_presign)
+    now = 1_200_000.0  # 300초 만료 - 60초 margin = 240초 구간의 시작점
+    monkeypatch.setattr(media, "_clock", lambda: now)
+
+    first = media.create_presigned_image_url(image_ref="diary-images/a1/x.png", expires_seconds=300)
+    now += 200
+    second = media.create_presigned_image_url(image_ref="diary-images/a1/x.png", expires_seconds=300)
+    now += 100
+    third = media.create_presigned_image_url(image_ref="diary-images/a1/x.png", expires_seconds=300)
+
+    assert first == second
+    assert third != first
+    assert len(signed_at) == 2
+    # 재사용 중인 URL도 반환 시점 기준 최소 safety margin 이상 유효해야 한다.
+    assert signed_at[0] + 300 - 1_200_200 >= media.PRESIGNED_URL_SAFETY_MARGIN_SECONDS
+
+
+def png_bytes(width: int, height: int) -> bytes:
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 120, 40, 255)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_variant_names_sit_next_to_the_original() -> None:
+    original = "diary-images/a1/2026/10/18/abc.png"
+
+    assert media.variant_object_name(original, 256, "webp") == "diary-images/a1/2026/10/18/abc@256.webp"
+    assert media._resolve_object_name(original, None) == original
+    assert media._resolve_object_name(original, 200) == media.variant_object_name(original, 256)
+    assert media._resolve_object_name(original, 10_000) == original
+
+
+def test_render_image_variants_bounds_the_long_edge() -> None:
+    import io
+
+    from PIL import Image
+
+    variants = media.render_image_variants(png_bytes(1536, 1024), [256, 768], "webp", 80)
+
+    with Image.open(io.BytesIO(variants[256])) as small:
+        assert small.format == "WEBP"
+        assert small.size == (256, 171)
+    with Image.open(io.BytesIO(variants[768])) as medium:
+        assert max(medium.size) == 768
+
+
+def test_upload_stores_variants_rendered_in_process_pool(monkeypatch) -> None:
+    configure_minio(monkeypatch, endpoint=f"variants-{id(monkeypatch)}:9000")
+    client, _bucket, _secure = media._get_minio_client()
+    stored: dict[str, str] = {}
+    monkeypatch.setattr(client, "bucket_exists", lambda _bucket: True)
+    monkeypatch.setattr(
+        client, "put_object", lambda _bucket, name, *, data, length, content_type: stored.update({name: content_type})
+    )
+
+    object_name = media.upload_image_to_minio(image_bytes=png_bytes(1024, 1024), account_id="a1")
+    media.shutdown_variant_pool()
+
+    assert stored == {
+        object_name: "image/png",
+        media.variant_object_name(object_name, 256): "image/webp",
+        media.variant_object_name(object_name, 768): "image/webp",
+    }
+
+
+def test_variant_pool_does_not_fork_the_server_process() -> None:
+    pool = media._get_variant_pool()
+    try:
+        assert pool._mp_context.get_start_method() == "forkserver"
+    finally:
+        media.shutdown_variant_pool()
+
+
+def test_presigned_variant_falls_back_to_original_when_missing(monkeypatch) -> None:
+    from types import SimpleNamespace
+
+    configure_minio(monkeypatch, endpoint=f"presign-variant-{id(monkeypatch)}:9000")
+    client, _bucket, _secure = media._get_minio_client()
+    existing = {"diary-images/a1/new.png", "diary-images/a1/new@256.webp", "diary-images/a1/old.png"}
+
+    def fake_stat(_bucket, object_name):
+        if object_name not in existing:
+            raise FileNotFoundError(object_name)
+        return SimpleNamespace(size=1, etag="e", last_modified=None, content_type="image/png")
+
+    monkeypatch.setattr(client, "stat_object", fake_stat)
+    monkeypatch.setattr(
+        client, "presigned_get_object", lambda bucket, object_name, **_kwargs: f"http://minio/{bucket}/{object_name}"
+    )
+
+    assert media.create_presigned_image_url(image_ref="diary-images/a1/new.png", size=200).endswith("new@256.webp")
+    assert media.create_presigned_image_url(image_ref="diary-images/a1/old.png", size=200).endswith("/old.png")
+    assert media.create_presigned_image_url(image_ref="diary-images/a1/old.png").endswith("/old.png")
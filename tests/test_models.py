@@ -22,3 +22,71 @@ def test_entry_input_check_constraint_exists() -> None:
     check_sqltexts = [str(c.sqltext) for c in table.constraints if c.__class__.__name__ == "CheckConstraint"]
 
     assert any("input_keywords" in text and "input_text" in text for text in check_sqltexts)
+
+
+def test_listing_composite_indexes_exist() -> None:
+    def index_columns(table_name: str) -> list[list[str]]:
+        return [[col.name for col in index.columns] for index in Base.metadata.tables[table_name].indexes]
+
+    assert ["diary_id", "created_at", "id"] in index_columns("entries")
+    assert ["account_id", "created_at", "id"] in index_columns("diaries")
+
+
+def test_upgrade_schema_adds_missing_indexes_to_existing_tables(tmp_path) -> None:
+    from sqlalchemy import create_engine, inspect, text
+
+    from app.bootstrap import upgrade_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_diaries_account_created_id"))
+        conn.execute(text("DROP INDEX ix_entries_diary_created_id"))
+
+    for _ in range(2):
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+
+    inspector = inspect(engine)
+    assert "ix_diaries_account_created_id" in {index["name"] for index in inspector.get_indexes("diaries")}
+    assert "ix_entries_diary_created_id" in {index["name"] for index in inspector.get_indexes("entries")}
+
+
+def test_upgrade_schema_adds_entry_image_columns(tmp_path) -> None:
+    from sqlalchemy import create_engine, inspect, text
+
+    from app.bootstrap import upgrade_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE entries DROP COLUMN image_status"))
+        conn.execute(text("ALTER TABLE entries DROP COLUMN image_url"))
+
+    for _ in range(2):
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("entries")}
+    assert {"image_url", "image_status"} <= columns
+
+
+def test_upgrade_schema_adds_user_token_version(tmp_path) -> None:
+    from sqlalchemy import create_engine, inspect, text
+
+    from app.bootstrap import upgrade_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN token_version"))
+        conn.execute(text("INSERT INTO users (id, username, password, role, created_at) VALUES ('u1', 'old', 'pw', 'USER', '2024-01-01')"))
+
+    for _ in range(2):
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+
+    column = next(column for column in inspect(engine).get_columns("users") if column["name"] == "token_version")
+    assert not column["nullable"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT token_version FROM users WHERE id = 'u1'")).scalar_one() == 0
@@ -0,0 +1,121 @@
+import asyncio
+import os
+
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app import llm
+from app.bootstrap import bootstrap_database
+from app.models import LLMProvider, ModelType
+from app.resilience import HALF_OPEN
+from app.providers import LLMRouter, Route, default_routes, dump_routes, parse_routes, save_routing
+
+OPENAI = Route(LLMProvider.OPENAI, "gpt-4.1-mini")
+GEMINI = Route(LLMProvider.GEMINI, "gemini-2.5-flash")
+
+
+def _both_configured(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-openai")
+    monkeypatch.setenv("GEMINI_API_KEY", "gm-gemini")
+    monkeypatch.setenv("ECHODIARY_DISABLE_LLM", "false")
+    monkeypatch.delenv("OPENAI_MODEL", raising=False)
+    monkeypatch.delenv("LLM_PROVIDER", raising=False)
+
+
+def test_routes_round_trip_and_default_order(monkeypatch) -> None:
+    monkeypatch.setenv("LLM_PROVIDER", "gemini")
+    routes = default_routes()
+
+    assert [route.provider for route in routes[ModelType.TEXT_SMALL]] == [LLMProvider.GEMINI, LLMProvider.OPENAI]
+    assert parse_routes(dump_routes(routes)) == routes
+
+
+def test_candidates_prefer_fast_healthy_routes(monkeypatch) -> None:
+    _both_configured(monkeypatch)
+    bootstrap_database()
+    router = LLMRouter()
+
+    assert router.candidates(ModelType.TEXT_SMALL) == [OPENAI, GEMINI]
+
+    for _ in range(5):
+        router.health(ModelType.TEXT_SMALL, OPENAI).record(success=True, duration=1.0)
+        router.health(ModelType.TEXT_SMALL, GEMINI).record(success=True, duration=0.5)
+    assert router.candidates(ModelType.TEXT_SMALL) == [GEMINI, OPENAI]
+
+    for _ in range(3):
+        router.health(ModelType.TEXT_SMALL, GEMINI).record(success=False, duration=0.5)
+    assert router.candidates(ModelType.TEXT_SMALL) == [OPENAI, GEMINI]
+
+    monkeypatch.delenv("GEMINI_API_KEY")
+    assert router.candidates(ModelType.TEXT_SMALL) == [OPENAI]
+
+
+def test_health_of_removed_routes_is_dropped(monkeypatch) -> None:
+    from app.database import SessionLocal
+
+    _both_configured(monkeypatch)
+    bootstrap_database()
+    router = LLMRouter()
+    assert router.candidates(ModelType.TEXT_SMALL) == [OPENAI, GEMINI]
+    assert (ModelType.TEXT_SMALL, OPENAI) in router._health
+
+    with SessionLocal() as db:
+        save_routing(db, {**default_routes(), ModelType.TEXT_SMALL: [GEMINI]}, created_by=None)
+        try:
+            router.invalidate()
+            assert router.candidates(ModelType.TEXT_SMALL) == [GEMINI]
+            assert (ModelType.TEXT_SMALL, OPENAI) not in router._health
+            assert (ModelType.TEXT_SMALL, GEMINI) in router._health
+        finally:
+            save_routing(db, None, created_by=None)
+
+
+def test_draft_fails_over_to_next_provider(monkeypatch) -> None:
+    _both_configured(monkeypatch)
+
+    class Failing:
+        async def ainvoke(self, _messages):
+            raise RuntimeError("upstream 500")
+
+    def chat_model(model: str, api_key: str, base_url: str | None = None):
+        if model == OPENAI.model:
+            return Failing()
+        assert api_key == "gm-gemini" and "generativelanguage" in base_url
+        return GenericFakeChatModel(messages=iter([AIMessage(content="제미니가 쓴 일기.")]))
+
+    monkeypatch.setattr(llm, "_get_chat_model", chat_model)
+    monkeypatch.setattr(llm, "llm_router", LLMRouter())
+    monkeypatch.setattr(llm, "_get_draft_graph", llm._get_draft_graph.__wrapped__)
+
+    assert asyncio.run(llm.agenerate_diary_draft(tone="담백", source="비")) == "제미니가 쓴 일기."
+    assert llm.llm_router.health(ModelType.TEXT_SMALL, OPENAI).error_rate == 1.0
+
+
+def test_cancelled_half_open_probe_releases_the_slot(monkeypatch) -> None:
+    _both_configured(monkeypatch)
+    monkeypatch.delenv("GEMINI_API_KEY")
+    started = asyncio.Event()
+
+    class Hanging:
+        async def ainvoke(self, _messages):
+            started.set()
+            await asyncio.Event().wait()
+
+    monkeypatch.setattr(llm, "_get_chat_model", lambda *_args, **_kwargs: Hanging())
+    monkeypatch.setattr(llm, "llm_router", LLMRouter())
+    monkeypatch.setattr(llm, "_get_draft_graph", llm._get_draft_graph.__wrapped__)
+    breaker = llm.llm_router.health(ModelType.TEXT_SMALL, OPENAI).breaker
+    breaker._transition(HALF_OPEN)
+
+    async def cancel_probe() -> None:
+        task = asyncio.create_task(llm.agenerate_diary_draft(tone="담백", source="비"))
+        await started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_probe())
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
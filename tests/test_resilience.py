@@ -0,0 +1,103 @@
+import asyncio
+
+from app.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyWindow, hedged
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_on_errors_and_closes_after_probe() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("test_errors", failure_rate=0.5, window=4, min_calls=4, open_seconds=10, clock=clock)
+
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success=success, duration=0.1)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # probe는 한 번에 하나만
+
+    breaker.record(success=False, duration=0.1)
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record(success=True, duration=0.1)
+    assert breaker.state == CLOSED
+
+
+def test_released_probe_frees_the_half_open_slot() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("test_release", failure_rate=0.5, window=4, min_calls=4, open_seconds=10, clock=clock)
+    for _ in range(4):
+        breaker.record(success=False, duration=0.1)
+
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # 취소된 probe는 성공도 실패도 아니다. 슬롯만 비워 다음 요청이 probe가 된다.
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_breaker_opens_on_slow_calls() -> None:
+    breaker = CircuitBreaker("test_slow", slow_call_seconds=1, slow_call_rate=0.5, window=4, min_calls=4)
+
+    for duration in (0.1, 2.0, 3.0, 0.2):
+        breaker.record(success=True, duration=duration)
+
+    assert breaker.state == OPEN
+
+
+def test_latency_window_percentile() -> None:
+    window = LatencyWindow(size=100)
+    for i in range(1, 101):
+        window.add(i / 100)
+
+    assert window.percentile(95) == 0.95
+    assert LatencyWindow().percentile(95) is None
+
+
+def test_hedged_call_returns_first_success_and_cancels_the_other() -> None:
+    cancelled: list[int] = []
+
+    async def scenario() -> str:
+        calls = 0
+
+        async def call() -> str:
+            nonlocal calls
+            calls += 1
+            index = calls
+            try:
+                # 첫 호출은 느리고 헤지 호출은 빠르다.
+                await asyncio.sleep(1.0 if index == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(index)
+                raise
+            return f"call-{index}"
+
+        result = await hedged("test", call, delay=0.02)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "call-2"
+    assert cancelled == [1]
+
+
+def test_hedged_call_without_delay_is_a_plain_await() -> None:
+    async def call() -> str:
+        return "ok"
+
+    assert asyncio.run(hedged("test", call, delay=None)) == "ok"
@@ -0,0 +1,12 @@
+from app.search import query_terms, search_terms
+
+
+def test_korean_text_is_indexed_as_syllable_bigrams() -> None:
+    terms = search_terms("오늘 산책하고 커피2잔", "Walking_in the park!").split()
+
+    assert terms == ["오늘", "산책", "책하", "하고", "커피", "2", "잔", "walking", "in", "the", "park"]
+
+
+def test_query_terms_use_prefix_match_for_short_and_latin_tokens() -> None:
+    assert query_terms("산책 산책 walk 커") == [("산책", False), ("walk", True), ("커", True)]
+    assert query_terms("!! __") == []
@@ -0,0 +1,12 @@
+from app.serve import prepare_multiprocess_dir
+
+
+def test_prepare_multiprocess_dir_drops_stale_metric_files(tmp_path) -> None:
+    metrics_dir = tmp_path / "prometheus"
+    metrics_dir.mkdir()
+    (metrics_dir / "counter_123.db").write_bytes(b"stale")
+
+    prepared = prepare_multiprocess_dir(str(metrics_dir))
+
+    assert prepared == str(metrics_dir)
+    assert list(metrics_dir.iterdir()) == []
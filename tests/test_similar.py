@@ -0,0 +1,72 @@
+import numpy as np
+
+from app.similar import EmbeddingIndex, HashingEmbedder
+
+
+def test_hashing_embedder_is_deterministic_and_normalized() -> None:
+    embedder = HashingEmbedder(dim=64)
+
+    first = embedder.embed(["한강에서 산책했다", ""])
+    second = embedder.embed(["한강에서 산책했다"])
+
+    assert first.dtype == np.float32
+    assert np.allclose(first[0], second[0])
+    assert abs(float(np.linalg.norm(first[0])) - 1.0) < 1e-5
+    assert not first[1].any()
+
+
+def test_index_appends_overwrites_and_ranks_by_cosine(tmp_path) -> None:
+    index = EmbeddingIndex(tmp_path, HashingEmbedder(dim=128))
+    index.upsert("acc", "walk", "한강에서 산책하고 커피를 마셨다")
+    index.upsert("acc", "work", "회사에서 회의가 길어졌다")
+    index.upsert("other", "other-walk", "한강에서 산책하고 커피를 마셨다")
+
+    assert [entry_id for entry_id, _ in index.search("acc", index.embed("한강 산책"), limit=2)] == ["walk", "work"]
+    assert index.search("acc", index.embed("한강 산책"), limit=5, exclude={"walk"})[0][0] == "work"
+
+    # 같은 항목을 다시 저장하면 행을 추가하지 않고 덮어쓴다.
+    index.upsert("acc", "work", "한강 산책 모임이 있었다")
+    vectors_path, _ids_path = index._paths("acc")
+    assert vectors_path.stat().st_size == 2 * 128 * 4
+    assert np.allclose(index.vector("acc", "work"), index.embed("한강 산책 모임이 있었다"))
+
+
+def test_index_recovers_from_interrupted_append_and_rebuilds(tmp_path) -> None:
+    index = EmbeddingIndex(tmp_path, HashingEmbedder(dim=32))
+    index.upsert("acc", "a", "산책")
+    vectors_path, ids_path = index._paths("acc")
+    # 벡터만 쓰고 id를 쓰기 전에 끊긴 상태
+    with vectors_path.open("ab") as handle:
+        handle.write(np.ones(32, dtype=np.float32).tobytes())
+
+    assert [entry_id for entry_id, _ in index.search("acc", index.embed("산책"), limit=5)] == ["a"]
+    index.upsert("acc", "b", "커피")
+    assert np.allclose(index.vector("acc", "b"), index.embed("커피"))
+
+    index.rebuild("acc", [("c", "회의")])
+    assert ids_path.read_text().split() == ["c"]
+    assert index.search("acc", index.embed("회의"), limit=5)[0][0] == "c"
+
+
+def test_extend_appends_new_entries_under_one_lock(tmp_path) -> None:
+    index = EmbeddingIndex(tmp_path, HashingEmbedder(dim=64))
+    index.upsert("acc", "walk", "한강에서 산책했다")
+
+    added = index.extend("acc", [("walk", "중복"), ("work", "회사에서 회의"), ("cafe", "카페에서 커피")])
+
+    assert added == 2
+    assert index.vector("acc", "walk") is not None
+    assert index.search("acc", index.embed("카페 커피"), limit=1)[0][0] == "cafe"
+    assert index._paths("acc")[0].stat().st_size == 3 * 64 * 4
+
+
+def test_open_account_indexes_are_bounded(tmp_path) -> None:
+    index = EmbeddingIndex(tmp_path, HashingEmbedder(dim=16), max_accounts=2)
+    for account_id in ("a", "b", "c"):
+        index.upsert(account_id, f"{account_id}-1", "산책")
+        index.search(account_id, index.embed("산책"), limit=1)
+    index.search("b", index.embed("산책"), limit=1)
+    index.search("a", index.embed("산책"), limit=1)
+
+    assert list(index._cache) == ["b", "a"]
+    assert index.search("c", index.embed("산책"), limit=1)[0][0] == "c-1"
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_calls_with_same_key_share_one_result() -> None:
+    flights = SingleFlight("test")
+    calls = 0
+
+    async def work() -> str:
+        nonlocal calls
+        calls += 1
+        call_id = calls
+        await asyncio.sleep(0.01)
+        return f"result-{call_id}"
+
+    async def run() -> list[str]:
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(5)), flights.do("other", work))
+
+    results = asyncio.run(run())
+
+    assert calls == 2
+    assert len(set(results[:5])) == 1
+    assert results[5] != results[0]
+    assert flights.in_flight() == 0
+
+
+def test_errors_propagate_to_every_waiter() -> None:
+    flights = SingleFlight("test")
+
+    async def work() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run() -> list[object]:
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_waiter_timeout_does_not_cancel_shared_call() -> None:
+    flights = SingleFlight("test")
+
+    async def work() -> str:
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run() -> str:
+        impatient = asyncio.ensure_future(flights.do("k", work, timeout=0.01))
+        patient = asyncio.ensure_future(flights.do("k", work))
+        with pytest.raises(TimeoutError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()) == "done"
@@ -362,7 +362,7 @@ function MainPage({ authHeaders, username, role }) {
       }
 
       const diaryListRes = await fetch(`${API_BASE}/api/diaries?account_id=${accountId}`, { headers: authHeaders });
-      const diaries = diaryListRes.ok ? await diaryListRes.json() : [];
+      const diaries = diaryListRes.ok ? (await diaryListRes.json()).items : [];
 
       let currentDiary = diaries[0];
       if (!currentDiary) {
@@ -396,19 +396,44 @@ function MainPage({ authHeaders, username, role }) {
     }
     setStatus({ type: "warn", text: "초안을 생성 중입니다..." });
 
-    const res = await fetch(`${API_BASE}/api/entries/generate`, {
+    const res = await fetch(`${API_BASE}/api/entries/generate/stream`, {
       method: "POST",
       headers: { "Content-Type": "application/json", ...authHeaders },
       body: JSON.stringify({ diary_id: diaryId, persona_id: personaId, input_text: `[${nowDateLabel()}] ${inputText}` }),
     });
-    const data = await res.json();
     if (!res.ok) {
+      const data = await res.json();
       setStatus({ type: "error", text: data.detail || "초안 생성 실패" });
       return;
     }
-    setEntryId(data.id);
-    setDraft(data.draft || "");
-    setStatus({ type: "ok", text: "초안 생성이 완료됐습니다. 문장을 다듬고 저장하세요." });
+
+    // SSE(token → fallback? → done) 이벤트를 읽으면서 초안을 바로 보여준다.
+    setDraft("");
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const blocks = buffer.split("\n\n");
+      buffer = blocks.pop();
+      for (const block of blocks) {
+        const event = block.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || "{}");
+        if (event === "token") {
+          setDraft((prev) => prev + data.text);
+        } else if (event === "fallback") {
+          setDraft(data.draft);
+        } else if (event === "done") {
+          setEntryId(data.id);
+          setDraft(data.draft || "");
+          setStatus({ type: "ok", text: "초안 생성이 완료됐습니다. 문장을 다듬고 저장하세요." });
+        } else if (event === "error") {
+          setStatus({ type: "error", text: data.detail || "초안 생성 실패" });
+        }
+      }
+    }
   };
 
   const saveDraft = async () => {
@@ -461,32 +486,42 @@ function MainPage({ authHeaders, username, role }) {
 
 function DiaryArchivePage({ authHeaders, username }) {
   const [entries, setEntries] = useState([]);
+  const [diaryId, setDiaryId] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
   const [status, setStatus] = useState("불러오는 중...");
 
+  const loadEntries = async (targetDiaryId, cursor) => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const entriesRes = await fetch(`${API_BASE}/api/diaries/${targetDiaryId}/entries${query}`, { headers: authHeaders });
+    if (!entriesRes.ok) {
+      setStatus("저장된 일기 조회에 실패했습니다.");
+      return;
+    }
+    const page = await entriesRes.json();
+    const savedEntries = page.items.filter((e) => e.status === "saved");
+    setEntries((prev) => (cursor ? [...prev, ...savedEntries] : savedEntries));
+    if (!cursor) {
+      setStatus(savedEntries.length ? "" : "저장된 일기가 없습니다.");
+    }
+    setNextCursor(page.next_cursor);
+  };
+
   useEffect(() => {
     const load = async () => {
-      const diariesRes = await fetch(`${API_BASE}/api/diaries?account_id=${username}`, { headers: authHeaders });
+      const diariesRes = await fetch(`${API_BASE}/api/diaries?account_id=${username}&limit=1`, { headers: authHeaders });
       if (!diariesRes.ok) {
         setStatus("일기장을 불러오지 못했습니다.");
         return;
       }
-      const diaries = await diariesRes.json();
+      const diaries = (await diariesRes.json()).items;
       if (!diaries.length) {
         setEntries([]);
         setStatus("저장된 일기가 없습니다.");
         return;
       }
 
-      const firstDiaryId = diaries[0].id;
-      const entriesRes = await fetch(`${API_BASE}/api/diaries/${firstDiaryId}/entries`, { headers: authHeaders });
-      if (!entriesRes.ok) {
-        setStatus("저장된 일기 조회에 실패했습니다.");
-        return;
-      }
-      const allEntries = await entriesRes.json();
-      const savedEntries = allEntries.filter((e) => e.status === "saved");
-      setEntries(savedEntries);
-      setStatus(savedEntries.length ? "" : "저장된 일기가 없습니다.");
+      setDiaryId(diaries[0].id);
+      await loadEntries(diaries[0].id, null);
     };
     load();
   }, [authHeaders, username]);
@@ -502,6 +537,9 @@ function DiaryArchivePage({ authHeaders, username }) {
           <div className="entry-text">{entry.draft}</div>
         </article>
       ))}
+      {nextCursor && (
+        <button className="btn" onClick={() => loadEntries(diaryId, nextCursor)}>더 보기</button>
+      )}
     </section>
   );
 }